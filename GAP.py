@@ -10,6 +10,7 @@ from System import GAPipeline
 # Define the available platform modules
 available_plat_modules = {
     "Google": "GooglePlatform",
+    "Local": "LocalPlatform",
     "Hardac": "SlurmPlatform",
 }
 
@@ -115,6 +116,57 @@ def configure_argparser(argparser_obj):
                               required=True,
                               help="Absolute path to the final output directory.")
 
+    # Run journal
+    argparser_obj.add_argument("--journal",
+                               action='store',
+                               type=str,
+                               dest="journal_file",
+                               required=False,
+                               default=None,
+                               help="Path to run journal where completed tasks are recorded. "
+                                    "Default: <PIPELINE_NAME>.journal in the current directory.")
+
+    # Call cache dir
+    argparser_obj.add_argument("--call_cache",
+                               action='store',
+                               type=str,
+                               dest="call_cache_dir",
+                               required=False,
+                               default=None,
+                               help="Directory where task outputs are cached across runs. "
+                                    "Tasks identical to a cached task are skipped and re-use the cached output.")
+
+    # Dry run
+    argparser_obj.add_argument("--dry_run",
+                               action='store_true',
+                               dest="dry_run",
+                               required=False,
+                               help="Print where each task gets its input arguments from without running the pipeline.")
+
+    # Fuse linear chains of tasks
+    argparser_obj.add_argument("--fuse_tasks",
+                               action='store_true',
+                               dest="fuse_tasks",
+                               required=False,
+                               help="Run chains of tasks where each task only feeds the next one as a single task "
+                                    "on one processor.")
+
+    # Resume previous run
+    argparser_obj.add_argument("--resume",
+                               action='store_true',
+                               dest="resume",
+                               required=False,
+                               help="Resume a previous run of the pipeline. "
+                                    "Tasks recorded as complete in the run journal are not re-run.")
+
+    # Overwrite journal of previous run
+    argparser_obj.add_argument("--force",
+                               action='store_true',
+                               dest="overwrite_journal",
+                               required=False,
+                               help="Start a new run even if the run journal of a previous run exists. "
+                                    "The previous journal is overwritten.")
+
 def configure_logging(verbosity):
     # Setting the format of the logs
     FORMAT = "[%(asctime)s] %(levelname)s: %(message)s"
@@ -175,6 +227,11 @@ def main():
     # Configuring the importing locations
     configure_import_paths()
 
+    # Journal completed tasks so that failed runs can be resumed
+    journal_file = args.journal_file
+    if journal_file is None:
+        journal_file = os.path.join(os.getcwd(), "%s.journal" % args.pipeline_name)
+
     # Create pipeline object
     pipeline = GAPipeline(pipeline_id=args.pipeline_name,
                           graph_config=args.graph_config,
@@ -182,7 +239,18 @@ def main():
                           sample_data_config=args.sample_set_config,
                           platform_config=args.platform_config,
                           platform_module=args.platform_module,
-                          final_output_dir=args.final_output_dir)
+                          final_output_dir=args.final_output_dir,
+                          journal_file=journal_file,
+                          resume=args.resume,
+                          overwrite_journal=args.overwrite_journal,
+                          call_cache_dir=args.call_cache_dir,
+                          fuse_tasks=args.fuse_tasks)
+
+    # Show where tasks will get their input without running anything
+    if args.dry_run:
+        pipeline.load(dry_run=True)
+        print pipeline.dry_run()
+        return
 
     # Initialize variables
     err     = True
@@ -1,4 +1,5 @@
 import abc
+import copy
 import logging
 import os
 
@@ -30,6 +31,11 @@ class Module(object):
         # Module output file directory
         self.output_dir = "/tmp/"
 
+        # Flag specifying whether command output is parsed line by line as it's produced
+        # Streaming modules receive each line through process_cmd_output_line() and only the last lines of output
+        # are passed to process_cmd_output(), so large outputs never need to be held in memory
+        self.stream_cmd_output = False
+
     @abc.abstractmethod
     def define_input(self):
         pass
@@ -99,6 +105,20 @@ class Module(object):
         # Example: Module that determines how many lines are in a file
         pass
 
+    def parses_cmd_output(self):
+        # Return True if module sets any of its output from the output of its command
+        return self.stream_cmd_output or \
+               self.__class__.process_cmd_output.__func__ is not Module.process_cmd_output.__func__
+
+    def start_cmd_output(self):
+        # Function to be overriden by streaming modules to reset any state parsed from command output
+        # Called before each attempt at running the command
+        pass
+
+    def process_cmd_output_line(self, line, is_stderr):
+        # Function to be overriden by streaming modules to parse a single line of command output as it's produced
+        pass
+
     def generate_unique_file_name(self, extension=".dat", output_dir=None):
 
         # Generate file basename
@@ -124,6 +144,15 @@ class Module(object):
     def set_ID(self, new_id):
         self.module_id = new_id
 
+    def clone(self, new_id):
+        # Return copy of module that can be run independently of the original
+        # Only argument values and output change when a module is run so everything else is shared
+        module = copy.copy(self)
+        module.set_ID(new_id)
+        module.arguments = dict([(key, copy.copy(arg)) for key, arg in self.arguments.iteritems()])
+        module.output = copy.deepcopy(self.output)
+        return module
+
     def get_input_types(self):
         return self.input_keys
 
@@ -175,6 +204,10 @@ class Module(object):
             raise RuntimeError("Attempt to set undeclared output type for module!")
         self.output[key] = value
 
+    def restore_output(self, output):
+        # Replace module output with output saved from a previous run
+        self.output = output
+
     def get_output_dir(self):
         return self.output_dir
 
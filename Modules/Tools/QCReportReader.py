@@ -129,6 +129,10 @@ class _QCReportReader(Module):
     def __init__(self, module_id, is_docker=False):
         super(_QCReportReader, self).__init__(module_id, is_docker)
 
+        # Collect report lines as they're output
+        self.stream_cmd_output = True
+        self.report_lines = list()
+
     def define_input(self):
         self.add_argument("qc_report",      is_required=True)
         self.add_argument("sample_name",    is_required=True)
@@ -140,6 +144,18 @@ class _QCReportReader(Module):
         qc_report       = self.get_argument("qc_report")
         return "cat %s !LOG2!" % qc_report
 
+    def start_cmd_output(self):
+        # Holds lines of the qc report
+        self.report_lines = list()
+
+    def process_cmd_output_line(self, line, is_stderr):
+        if not is_stderr:
+            self.report_lines.append(line)
+
+    def get_qc_report(self):
+        # Return QCReport parsed from the command output
+        return parse_qc_report("".join(self.report_lines))
+
 
 class GetNumReadsFastQC(_QCReportReader):
 
@@ -156,7 +172,7 @@ class GetNumReadsFastQC(_QCReportReader):
 
     def process_cmd_output(self, out, err):
         # Parse numreads from FastQC sections of QCReport
-        qc_report = parse_qc_report(out)
+        qc_report = self.get_qc_report()
         sample_name     = self.get_argument("sample_name")
         filter_by_note  = self.get_argument("filter_by_note")
 
@@ -197,7 +213,7 @@ class GetNumReadsTrimmomatic(_QCReportReader):
 
     def process_cmd_output(self, out, err):
         # Parse numreads from FastQC sections of QCReport
-        qc_report = parse_qc_report(out)
+        qc_report = self.get_qc_report()
         sample_name     = self.get_argument("sample_name")
 
         # Try to parse num_reads from QCReport
@@ -401,6 +401,10 @@ class GetVCFChroms(Module):
         super(GetVCFChroms, self).__init__(module_id, is_docker)
         self.output_keys = ["chrom_list"]
 
+        # Parse chromosomes as they're output
+        self.stream_cmd_output = True
+        self.chrom_list = list()
+
     def define_input(self):
         self.add_argument("vcf",        is_required=True)
         self.add_argument("nr_cpus",    is_required=True, default_value=1)
@@ -415,16 +419,18 @@ class GetVCFChroms(Module):
         cmd = 'cat {0} | grep -v "#" | cut -f1 | sort | uniq'.format(vcf)
         return cmd
 
-    def process_cmd_output(self, out, err):
+    def start_cmd_output(self):
         #holds the chromosome list
-        chrom_list = list()
+        self.chrom_list = list()
 
-        #iterate throgh the output generated by the command in define command
-        for line in out.split("\n"):
-            # Skip empty lines
-            if len(line) > 0:
-                chrom_list.append(line)
-        self.set_output("chrom_list", out)
+    def process_cmd_output_line(self, line, is_stderr):
+        # Skip empty lines
+        line = line.rstrip("\n")
+        if not is_stderr and len(line) > 0:
+            self.chrom_list.append(line)
+
+    def process_cmd_output(self, out, err):
+        self.set_output("chrom_list", self.chrom_list)
 
 
 class GetRefChroms(Module):
@@ -432,6 +438,10 @@ class GetRefChroms(Module):
         super(GetRefChroms, self).__init__(module_id, is_docker)
         self.output_keys = ["chrom_list"]
 
+        # Parse chromosomes as they're output
+        self.stream_cmd_output = True
+        self.chrom_list = list()
+
     def define_input(self):
         self.add_argument("ref_idx",    is_required=True, is_resource=True)
         self.add_argument("nr_cpus",    is_required=True, default_value=1)
@@ -446,15 +456,16 @@ class GetRefChroms(Module):
         cmd = "cut -f1 {0}".format(ref_idx)
         return cmd
 
-    def process_cmd_output(self, out, err):
+    def start_cmd_output(self):
         #holds the chromosome list
-        chrom_list = list()
+        self.chrom_list = list()
 
-        #iterate throgh the output generated by the command in define command
-        for line in out.split("\n"):
-            # Skip empty lines
-            if len(line) > 0:
-                chrom_list.append(line)
+    def process_cmd_output_line(self, line, is_stderr):
+        # Skip empty lines
+        line = line.rstrip("\n")
+        if not is_stderr and len(line) > 0:
+            self.chrom_list.append(line)
 
-        logging.info("Chrom List: %s" % ",".join(chrom_list))
-        self.set_output("chrom_list", chrom_list)
+    def process_cmd_output(self, out, err):
+        logging.info("Chrom List: %s" % ",".join(self.chrom_list))
+        self.set_output("chrom_list", self.chrom_list)
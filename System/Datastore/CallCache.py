@@ -0,0 +1,183 @@
+import os
+import copy
+import json
+import hashlib
+import logging
+import tempfile
+
+from GAPFile import GAPFile
+from RunJournal import RunJournal
+
+class CallCache(object):
+    # Cache of task outputs shared across pipeline runs
+    # Tasks are keyed by module class, resolved arguments, input file identities and docker image digest
+    # Identical tasks in later runs re-use the cached output instead of being re-run
+    # Files are identified by path, size and version so files re-written in place don't give stale hits
+
+    # Arguments that only affect how a task is run and not what it produces
+    IGNORED_ARGS = ["nr_cpus", "mem"]
+
+    def __init__(self, cache_dir):
+
+        # Directory on the machine running GAP where cache entries are stored
+        self.cache_dir = os.path.abspath(cache_dir)
+
+        # Storage helper used to look up the size and version of input and cached output files
+        self.storage_helper = None
+
+        # Cached output files copied into the current run indexed by the path of their copy
+        # Copies are identified by the file they were copied from so tasks using them can still be found in the cache
+        self.__copied_from = {}
+
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def set_storage_helper(self, storage_helper):
+        self.storage_helper = storage_helper
+
+    def get_key(self, task, docker_image=None):
+        # Return key identifying the work done by a task whose input args have been set
+        module = task.get_module()
+        arg_values = dict([(arg_name, arg.get_value()) for arg_name, arg in module.get_arguments().iteritems()
+                           if arg_name not in self.IGNORED_ARGS])
+
+        # Look up versions of all input files at once
+        input_files = [self.__copied_from.get(x.get_transferrable_path(), x) for x in self.__get_output_files(arg_values.values())]
+        file_stats = self.__get_file_stats(input_files, job_name="cache_key_%s" % task.get_ID())
+
+        args = {}
+        for arg_name, arg_value in arg_values.iteritems():
+            args[arg_name] = self.__get_identity(arg_value, file_stats, self.__copied_from)
+
+        call = {"module"    : "%s.%s" % (module.__class__.__module__, module.__class__.__name__),
+                "args"      : args,
+                "docker"    : None if docker_image is None else [docker_image.get_image_name(), docker_image.get_digest()]}
+
+        return hashlib.sha1(json.dumps(call, sort_keys=True)).hexdigest()
+
+    def lookup(self, key, task_id):
+        # Return cached module output for a key. Return None if there's no usable entry.
+        entry_file = self.__get_entry_file(key)
+        if not os.path.isfile(entry_file):
+            return None
+
+        try:
+            with open(entry_file, "r") as entry:
+                entry_data  = json.load(entry)
+                output      = RunJournal.deserialize(entry_data["output"])
+                cached_stats= entry_data["files"]
+        except (IOError, ValueError, KeyError):
+            logging.warning("(%s) Ignoring unreadable call cache entry: %s" % (task_id, entry_file))
+            return None
+
+        # Cached output can only be used if all output files still exist and haven't been re-written since
+        output_files = self.__get_output_files(output)
+        file_stats = self.__get_file_stats(output_files, job_name="check_cached_%s" % task_id)
+        for output_file in output_files:
+            path = output_file.get_transferrable_path()
+            if file_stats.get(path, None) is None:
+                logging.info("(%s) Call cache entry no longer valid. Output file not found: %s" % (task_id, output_file.get_path()))
+                return None
+            if list(file_stats[path]) != cached_stats.get(path, None):
+                logging.info("(%s) Call cache entry no longer valid. Output file changed: %s" % (task_id, output_file.get_path()))
+                return None
+
+        return output
+
+    def copy_output(self, output, workspace, final_output_types, task_id):
+        # Copy or link cached output files into the output dirs of the current run and update their paths
+        # Output dirs of the run that produced them can be removed or re-written by later runs
+        dest_dirs = {}
+        for output_file in self.__get_output_files(output):
+            if output_file.get_type() in final_output_types:
+                dest_dirs[output_file] = workspace.get_output_dir()
+            else:
+                dest_dirs[output_file] = workspace.get_tmp_output_dir()
+
+        # Nothing to copy if cached output was produced in the same output dir (e.g. pipeline re-run in place)
+        for output_file, dest_dir in dest_dirs.items():
+            if os.path.dirname(output_file.get_transferrable_path().rstrip("/")) == dest_dir.rstrip("/"):
+                dest_dirs.pop(output_file)
+
+        # Files going to the same dir from the same storage are copied with a single command
+        batches = {}
+        for output_file, dest_dir in dest_dirs.iteritems():
+            batches.setdefault((dest_dir, output_file.get_protocol()), []).append(output_file.get_transferrable_path())
+
+        for i, ((dest_dir, protocol), src_paths) in enumerate(batches.iteritems()):
+            logging.debug("(%s) Copying %d cached output files to current run: %s" % (task_id, len(src_paths), dest_dir))
+            self.storage_helper.mkdir(dest_dir, job_name="cache_mkdir_%s_%d" % (task_id, i+1), wait=True)
+            self.storage_helper.cp_batch(src_paths, dest_dir, job_name="cache_copy_%s_%d" % (task_id, i+1), wait=True)
+
+        for output_file, dest_dir in dest_dirs.iteritems():
+            cached_file = copy.copy(output_file)
+            output_file.update_path(new_dir=dest_dir)
+            self.__copied_from[output_file.get_transferrable_path()] = cached_file
+
+    def store(self, key, task):
+        # Save output of successfully completed task along with the size and version of its output files
+        output = task.get_module().get_output()
+        file_stats = self.__get_file_stats(self.__get_output_files(output), job_name="cache_store_%s" % task.get_ID())
+        if None in file_stats.values():
+            logging.warning("(%s) Output not cached. Unable to find all output files!" % task.get_ID())
+            return
+
+        entry = {"task_id"  : task.get_ID(),
+                 "output"   : RunJournal.serialize(output),
+                 "files"    : dict([(path, list(stats)) for path, stats in file_stats.iteritems()])}
+
+        # Write to temp file first so concurrent lookups never see a partial entry
+        fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as entry_file:
+                json.dump(entry, entry_file)
+            os.rename(tmp_file, self.__get_entry_file(key))
+        except:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    def __get_entry_file(self, key):
+        return os.path.join(self.cache_dir, "%s.json" % key)
+
+    def __get_file_stats(self, files, job_name):
+        # Return {transferrable path: (size, version)} of files. Files that don't exist have stats of None.
+        paths = [gap_file.get_transferrable_path() for gap_file in files]
+        if self.storage_helper is None:
+            return dict.fromkeys(paths)
+        return self.storage_helper.get_file_stats(paths, job_name=job_name)
+
+    @staticmethod
+    def __get_identity(value, file_stats, copied_from):
+        # Return serializable value identifying an argument
+        # Files are identified by their location, size and version
+        # Copies of cached output are identified by the cached file they were copied from
+        if isinstance(value, GAPFile):
+            value = copied_from.get(value.get_transferrable_path(), value)
+            stats = file_stats.get(value.get_transferrable_path(), None)
+            return {"path"      : value.get_transferrable_path(),
+                    "size"      : value.get_size(),
+                    "version"   : None if stats is None else stats[1]}
+        elif isinstance(value, dict):
+            return dict([(str(key), CallCache.__get_identity(val, file_stats, copied_from)) for key, val in value.iteritems()])
+        elif isinstance(value, (list, tuple)):
+            return [CallCache.__get_identity(val, file_stats, copied_from) for val in value]
+        elif value is None or isinstance(value, (basestring, int, long, float, bool)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def __get_output_files(value):
+        # Return list of all GAPFiles in module output
+        if isinstance(value, GAPFile):
+            return [value]
+        elif isinstance(value, dict):
+            values = value.values()
+        elif isinstance(value, list):
+            values = value
+        else:
+            return []
+        output_files = []
+        for val in values:
+            output_files.extend(CallCache.__get_output_files(val))
+        return output_files
@@ -1,8 +1,10 @@
 import copy
 import os
 import logging
+from collections import OrderedDict
 
 from GAPFile import GAPFile
+from GAPFileView import GAPFileView
 from System.Platform import Platform
 
 class PrematureTaskInputSetError(Exception):
@@ -18,21 +20,26 @@ class Datastore(object):
         self.platform = platform
 
         # Base directories for task execution (wrk) and output storage (output)
-        self.__base_wrk_dir = self.platform.wrk_dir
-        self.__base_output_dir = self.platform.final_output_dir
+        # Dry runs have no platform and never run tasks
+        self.__base_wrk_dir = None if self.platform is None else self.platform.wrk_dir
+        self.__base_output_dir = None if self.platform is None else self.platform.final_output_dir
 
     def set_task_input_args(self, task_id):
         # Set input arguments for a task module
 
         # Throw error if task inputs aren't ready to be set
-        if not self.graph.parents_complete(task_id):
+        # Fused tasks get their input from output defined by the task before them in the chain
+        if not self.graph.parents_complete(task_id) and not self.graph.get_tasks(task_id).is_fused():
             logging.error("Cannot set arguments for task '%s' before upstream tasks have completed!" % task_id)
             raise PrematureTaskInputSetError("Cannot set task arguments before a task dependencies have completed!")
 
+        # Resolve where each argument comes from in a single pass over task inputs
+        arg_index = self.get_task_arg_index(task_id)
+
         task_module = self.graph.get_tasks(task_id).module
         for input_type, input_arg in task_module.get_arguments().iteritems():
             logging.debug("(%s) Setting arg: %s" % (task_id, input_type))
-            val = self.__get_task_arg(task_id, input_type, is_resource=input_arg.is_resource())
+            val = self.__get_task_arg(arg_index, input_type)
             if val is None:
                 val = input_arg.get_default_value()
             task_module.set_argument(input_type, val)
@@ -48,6 +55,49 @@ class Datastore(object):
         task_module.set_argument("nr_cpus", nr_cpus)
         task_module.set_argument("mem", mem)
 
+    def get_task_arg_index(self, task_id, dry_run=False):
+        # Return dict mapping each task input key to the input source providing it and the values provided
+        # Input source is None if no input source provides the key
+        # In dry runs, output of unfinished parent tasks is represented by '<parent_id>.<output_key>'
+        task = self.graph.get_tasks(task_id)
+        task_args = task.get_module().get_arguments()
+        config_input = task.get_graph_config_args()
+
+        # Index values provided by each input source once per task
+        parent_args = self.__index_parent_args(task_id, dry_run=dry_run)
+        docker_args = self.__index_docker_args(task, task_args.keys())
+        res_kit_args = self.__index_resources(self.resource_kit.get_resources(), config_input, task_args.keys())
+        sample_args = self.__index_sample_args(task, task_args.keys())
+
+        arg_index = OrderedDict()
+        for arg_type, arg in task_args.iteritems():
+            # Priority of checking for argument
+            if not arg.is_resource():
+                input_order = ["parent_input", "docker_input", "resource_input", "sample_input", "config_input"]
+
+            # Special case when argument MUST be a resource type. In this case we can only get the arg from the RK.
+            else:
+                input_order = ["docker_input", "resource_input"]
+
+            arg_index[arg_type] = (None, [])
+            for input_type in input_order:
+                if input_type == "parent_input":
+                    args = parent_args.get(arg_type, [])
+                elif input_type == "docker_input":
+                    args = docker_args.get(arg_type, [])
+                elif input_type == "resource_input":
+                    args = res_kit_args.get(arg_type, [])
+                elif input_type == "sample_input":
+                    args = sample_args.get(arg_type, [])
+                else:
+                    args = [] if arg_type not in config_input else config_input[arg_type]
+
+                if len(args) > 0:
+                    arg_index[arg_type] = (input_type, args)
+                    break
+
+        return arg_index
+
     def get_task_workspace(self, task_id=None):
         # Use task information to generate unique directories for input/output files
 
@@ -123,146 +173,98 @@ class Datastore(object):
         # Return actual copies so that module paths get updated as they are transferred
         return output_files
 
-    def __get_task_arg(self, task_id, arg_type, is_resource=False):
+    def __get_task_arg(self, arg_index, arg_type):
         # Return the object that best satisfies the arg_type for a task
+        input_type, possible_args = arg_index[arg_type]
 
-        # Get all objects visible to task that match the arg_type
-        possible_args = self.__gather_args(task_id, arg_type)
+        # List of values matching type
+        if len(possible_args) > 1:
+            final_arg = possible_args
 
-        # Select the object using precedence rules
-        final_arg = self.__select_arg(possible_args, is_resource=is_resource)
+        # Single value matching type
+        elif len(possible_args) > 0:
+            final_arg = possible_args[0]
 
-        # Make deep copy of argument so internal datastore values can't be touched
-        final_arg = copy.deepcopy(final_arg) if final_arg is not None else final_arg
-
-        return final_arg
-
-    def __select_arg(self, avail_args, is_resource=False):
-        # Priority of checking for argument
-        if not is_resource:
-            input_order = ["parent_input", "docker_input", "resource_input", "sample_input", "config_input"]
-
-        # Special case when argument MUST be a resource type. In this case we can only get the arg from the RK.
         else:
-            input_order = ["docker_input", "resource_input"]
-
-        # Search the key in each input type
-        for input_type in input_order:
-            # List of values matching type
-            if len(avail_args[input_type]) > 1:
-                return avail_args[input_type]
-            # Single value matching type
-            if len(avail_args[input_type]) > 0:
-                return avail_args[input_type][0]
-        return None
-
-    def __gather_args(self, task_id, arg_type):
-        # Gather possible inputs to a task matching arg_type
-        possible = {}
-
-        # Get args from parent tasks
-        possible["parent_input"] = self.__gather_parent_args(task_id, arg_type)
-
-        # Get args from docker requested by task
-        possible["docker_input"] = self.__gather_docker_args(task_id, arg_type)
-
-        # Get args from resource kit
-        possible["resource_input"] = self.__gather_res_kit_args(task_id, arg_type)
-
-        # Get args from sample data
-        possible["sample_input"] = self.__gather_sample_args(task_id, arg_type)
-
-        # Get args from config input
-        config_input = self.graph.get_tasks(task_id).get_graph_config_args()
-        possible["config_input"] = [] if arg_type not in config_input else config_input[arg_type]
-
-        return possible
-
-    def __gather_parent_args(self, task_id, arg_type):
-        # Get args of specified type inherited from parent tasks
-        args = []
+            return None
+
+        # Give task a view of argument so internal datastore values can't be touched
+        return self.__get_arg_view(final_arg)
+
+    @staticmethod
+    def __get_arg_view(arg):
+        # Return copy of argument that can be safely modified by a task
+        # Files are wrapped in copy-on-write views so they're only copied if the task changes them
+        if isinstance(arg, GAPFile):
+            return GAPFileView(arg)
+        elif isinstance(arg, list):
+            return [Datastore.__get_arg_view(val) for val in arg]
+        elif isinstance(arg, dict):
+            return arg.__class__([(key, Datastore.__get_arg_view(val)) for key, val in arg.iteritems()])
+        elif arg is None or isinstance(arg, (basestring, int, long, float, bool)):
+            return arg
+        return copy.deepcopy(arg)
+
+    def __index_parent_args(self, task_id, dry_run=False):
+        # Return dict of args inherited from parent tasks indexed by arg type
+        args = {}
         curr_task = self.graph.get_tasks(task_id)
         for parent_id in self.graph.get_parents(task_id):
             parent = self.graph.get_tasks(parent_id)
+
+            # Use declared output keys if parent hasn't been run yet
+            if dry_run and not parent.is_complete():
+                for output_type in parent.get_output_keys() or []:
+                    args.setdefault(output_type, []).append("%s.%s" % (parent_id, output_type))
+                continue
+
             if parent.is_splitter_task():
                 # Limit output to partition visible to task
                 split_id = curr_task.get_split_id()
                 output = parent.module.get_output(split_id=split_id)
             else:
                 output = parent.module.get_output()
-            if arg_type in output:
-                args.append(output[arg_type])
+            for output_type, output_val in output.iteritems():
+                args.setdefault(output_type, []).append(output_val)
         return args
 
-    def __gather_sample_args(self, task_id, arg_type):
-        # Get args of specified type from sample data
-        args = []
-        # Get list of samples visible to current task
-        curr_task = self.graph.get_tasks(task_id)
-        visible_samples = curr_task.get_visible_samples()
-        if self.sample_data.has_data_type(arg_type):
-
-            # Restrict sample sheet access to visible samples if necessary
-            if visible_samples is not None:
-                args = self.sample_data.get_data(arg_type, samples=visible_samples)
-
-            # Return variables from all samples
-            else:
-                args = self.sample_data.get_data(arg_type)
-
-        # Coerce to list if not one already
-        if not isinstance(args, list):
-            args = [args]
-
+    def __index_sample_args(self, task, arg_types):
+        # Return dict of sample data visible to task indexed by data type
+        # Sample data is subset once per set of visible samples
+        data = self.sample_data.get_data(samples=task.get_visible_samples())
+        args = {}
+        for arg_type in arg_types:
+            if arg_type in data:
+                # Coerce to list if not one already
+                args[arg_type] = data[arg_type] if isinstance(data[arg_type], list) else [data[arg_type]]
         return args
 
-    def __gather_res_kit_args(self, task_id, arg_type):
-
-        args = []
-
-        if self.resource_kit.has_resource_type(arg_type):
+    def __index_docker_args(self, task, arg_types):
+        # Return dict of resources on task's docker image indexed by resource type
+        docker_image_id = task.get_docker_image_id()
+        if docker_image_id is None or not self.resource_kit.has_docker_image(docker_image_id):
+            return {}
+        docker_image = self.resource_kit.get_docker_images(docker_image_id)
+        return self.__index_resources(docker_image.get_resources(), task.get_graph_config_args(), arg_types)
+
+    @staticmethod
+    def __index_resources(resources, config_input, arg_types):
+        # Return dict of resources indexed by resource type
+        # Resource named in the task's config input is used if there is one, otherwise the only resource of the type
+        args = {}
+        for arg_type in arg_types:
+            if arg_type not in resources:
+                continue
 
             # Search to see if the argument key appears in the config input
-            config_input = self.graph.get_tasks(task_id).get_graph_config_args()
             if arg_type in config_input:
-                # Obtain the resource name
                 res_name = config_input[arg_type]
-
-                if res_name in self.resource_kit.get_resources(arg_type):
-
-                    # Get the resource object with name "res_name" from resource input data
-                    args = [self.resource_kit.get_resources(arg_type)[res_name]]
+                if res_name in resources[arg_type]:
+                    args[arg_type] = [resources[arg_type][res_name]]
 
             # If not in config input, should only be one resource of type "arg_key"
             else:
-                # There should be only one resource of type "arg_key"
-                args = [self.resource_kit.get_resources(arg_type).values()[0]]
-
-        return args
-
-    def __gather_docker_args(self, task_id, arg_type):
-
-        args = []
-        docker_image_id = self.graph.get_tasks(task_id).get_docker_image_id()
-
-        if docker_image_id is not None and self.resource_kit.has_docker_image(docker_image_id):
-            docker_image = self.resource_kit.get_docker_images(docker_image_id)
-            if docker_image.has_resource_type(arg_type):
-
-                # Search to see if the argument key appears in the config input
-                config_input = self.graph.get_tasks(task_id).get_graph_config_args()
-                if arg_type in config_input:
-
-                    res_name = config_input[arg_type]
-
-                    if res_name in docker_image.get_resources(arg_type):
-                        # Get the resource object with name "res_name" from docker input data
-                        args = [docker_image.get_resources(arg_type)[res_name]]
-
-                # If not in config input, should only be one resource of type "arg_key" in docker
-                else:
-                    args = [docker_image.get_resources(arg_type).values()[0]]
-
+                args[arg_type] = [resources[arg_type].values()[0]]
         return args
 
     def __reformat_nr_cpus(self, nr_cpus):
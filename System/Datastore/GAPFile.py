@@ -5,22 +5,34 @@ class GAPFileMetadataError(Exception):
     # Base class for exception related to trying to access unavailable file metadata
     pass
 
-class GAPFile:
+class GAPFile(object):
     # Hold GAP-Related file information
+    # Slots are used as sample sheets and split outputs can create tens of thousands of files
+
+    __slots__ = ["file_id", "type", "containing_dir", "size",
+                 "__path", "__is_prefix", "__metadata", "__flag_bits", "__other_flags", "__filename", "__protocol"]
+
+    # Bits used to store commonly used flags
+    FLAG_BITS = {"docker"               : 1,
+                 "validated"            : 2,
+                 "missing"              : 4,
+                 "validation_failed"    : 8}
+
     def __init__(self, file_id,  file_type, path, **kwargs):
 
         # File Id
         self.file_id = file_id
 
         # Object type e.g. 'samtools', 'ref'
-        self.type = file_type
+        # Interned as there are only a few different file types shared by many files
+        self.type = intern(file_type) if isinstance(file_type, str) else file_type
+
+        # Check to make sure value is string (Path)
+        assert isinstance(path, basestring), "GAPFile value must be string! Recieved '%s' of type '%s'" % (path, type(path))
 
         # Object data
         self.path = path
 
-        # Check to make sure value is string (Path)
-        assert isinstance(self.path, basestring), "GAPFile value must be string! Recieved '%s' of type '%s'" % (path, type(path))
-
         # Path to a containing directory where resource is found
         self.containing_dir = kwargs.pop("containing_dir", None)
 
@@ -34,15 +46,43 @@ class GAPFile:
         # Standardize aspects of the resource path provided
         self.__standardize()
 
-        # Metadata associated with an object
-        self.metadata = kwargs
+        # Metadata associated with an object (None until file has metadata)
+        self.__metadata = kwargs if len(kwargs) > 0 else None
+
+        # Flags. Common flags are stored as bits. Any other flags are kept in a list.
+        self.__flag_bits    = 0
+        self.__other_flags  = None
+
+    def __copy__(self):
+        # Return copy of file that can be modified without changing the original
+        gap_file = GAPFile.__new__(GAPFile)
+        gap_file.file_id                = self.file_id
+        gap_file.type                   = self.type
+        gap_file.path                   = self.path
+        gap_file.containing_dir         = self.containing_dir
+        gap_file.size                   = self.size
+        gap_file.__is_prefix            = self.__is_prefix
+        gap_file.__metadata             = None if self.__metadata is None else dict(self.__metadata)
+        gap_file.__flag_bits            = self.__flag_bits
+        gap_file.__other_flags          = None if self.__other_flags is None else list(self.__other_flags)
+        return gap_file
 
-        # Flags
-        self.flags = []
+    @property
+    def path(self):
+        return self.__path
+
+    @path.setter
+    def path(self, new_path):
+        # Reset values derived from path
+        self.__path     = new_path
+        self.__filename = None
+        self.__protocol = None
 
     @property
     def filename(self):
-        return self.path.rstrip("/").split("/")[-1]
+        if self.__filename is None:
+            self.__filename = self.__path.rstrip("/").split("/")[-1]
+        return self.__filename
 
     @property
     def containing_dir_name(self):
@@ -52,9 +92,20 @@ class GAPFile:
 
     @property
     def protocol(self):
-        if ":" not in self.path:
-            return "Local"
-        return self.path.split(":")[0]
+        if self.__protocol is None:
+            self.__protocol = "Local" if ":" not in self.__path else self.__path.split(":")[0]
+        return self.__protocol
+
+    @property
+    def metadata(self):
+        return {} if self.__metadata is None else self.__metadata
+
+    @property
+    def flags(self):
+        flags = [flag_type for flag_type, flag_bit in self.FLAG_BITS.iteritems() if self.__flag_bits & flag_bit]
+        if self.__other_flags is not None:
+            flags.extend(self.__other_flags)
+        return flags
 
     def get_file_id(self):
         return self.file_id
@@ -103,27 +154,37 @@ class GAPFile:
         self.size = file_size
 
     def flag(self, flag_type):
-        if flag_type not in self.flags:
-            self.flags.append(flag_type)
+        if flag_type in self.FLAG_BITS:
+            self.__flag_bits |= self.FLAG_BITS[flag_type]
+        elif self.__other_flags is None:
+            self.__other_flags = [flag_type]
+        elif flag_type not in self.__other_flags:
+            self.__other_flags.append(flag_type)
 
     def unflag(self, flag_type):
-        if self.is_flagged(flag_type):
-            self.flags.remove(flag_type)
+        if flag_type in self.FLAG_BITS:
+            self.__flag_bits &= ~self.FLAG_BITS[flag_type]
+        elif self.is_flagged(flag_type):
+            self.__other_flags.remove(flag_type)
 
     def is_flagged(self, flag_type):
-        return flag_type in self.flags
+        if flag_type in self.FLAG_BITS:
+            return bool(self.__flag_bits & self.FLAG_BITS[flag_type])
+        return self.__other_flags is not None and flag_type in self.__other_flags
 
     def has_metadata_type(self, meta_type):
-        return meta_type in self.metadata
+        return self.__metadata is not None and meta_type in self.__metadata
 
     def get_metadata(self, meta_type):
-        if not meta_type in self.metadata:
+        if not self.has_metadata_type(meta_type):
             logging.error("GAPObject '%s' of type '%s' doesn't have metadata of type '%s'" % (self.file_id, self.type, meta_type))
             raise GAPFileMetadataError("GAPObject does not have metadata of type '%s'" % meta_type)
-        return self.metadata[meta_type]
+        return self.__metadata[meta_type]
 
     def set_metadata(self, meta_type, val):
-        self.metadata[meta_type] = val
+        if self.__metadata is None:
+            self.__metadata = {}
+        self.__metadata[meta_type] = val
 
     def set_path(self, new_path):
         self.path = new_path
@@ -156,6 +217,32 @@ class GAPFile:
             # Remove wildcard character from path is path is prefix
             self.path = self.path.replace("*", "")
 
+    def to_dict(self):
+        # Serializable representation used to save file info between pipeline runs
+        return {"file_id"           : self.file_id,
+                "type"              : self.type,
+                "path"              : self.path,
+                "containing_dir"    : self.containing_dir,
+                "is_prefix"         : self.__is_prefix,
+                "size"              : self.size,
+                "metadata"          : self.metadata,
+                "flags"             : self.flags}
+
+    @staticmethod
+    def from_dict(file_data):
+        # Re-create file from a representation produced by to_dict()
+        path = file_data["path"] + "*" if file_data["is_prefix"] else file_data["path"]
+        kwargs = dict((str(key), val) for key, val in file_data["metadata"].iteritems())
+        gap_file = GAPFile(file_data["file_id"],
+                           file_data["type"],
+                           path,
+                           containing_dir=file_data["containing_dir"],
+                           file_size=file_data["size"],
+                           **kwargs)
+        for flag_type in file_data["flags"]:
+            gap_file.flag(flag_type)
+        return gap_file
+
     def __str__(self):
         return self.path
 
@@ -0,0 +1,104 @@
+import copy
+
+from GAPFile import GAPFile
+
+class GAPFileView(GAPFile):
+    # GAPFile that shares its data with a GAPFile owned by the datastore
+    # Reads go through to the shared file. The first change (e.g. update_path) replaces the shared file with a copy
+    # so the datastore's file is never modified and only files whose paths change are copied.
+
+    __slots__ = ["__file", "__copied"]
+
+    def __init__(self, gap_file):
+        self.__file     = gap_file
+        self.__copied   = False
+
+    def __getattr__(self, name):
+        # View doesn't hold any file data itself so all file attributes come from the underlying file
+        if name.startswith("_GAPFileView__"):
+            raise AttributeError(name)
+        return getattr(self.__file, name)
+
+    def __copy__(self):
+        return copy.copy(self.__file)
+
+    def get_file_id(self):
+        return self.__file.get_file_id()
+
+    def get_path(self):
+        return self.__file.get_path()
+
+    def get_type(self):
+        return self.__file.get_type()
+
+    def get_transferrable_path(self):
+        return self.__file.get_transferrable_path()
+
+    def get_containing_dir(self):
+        return self.__file.get_containing_dir()
+
+    def get_size(self):
+        return self.__file.get_size()
+
+    def get_protocol(self):
+        return self.__file.get_protocol()
+
+    def is_prefix(self):
+        return self.__file.is_prefix()
+
+    def is_remote(self):
+        return self.__file.is_remote()
+
+    def size_known(self):
+        return self.__file.size_known()
+
+    def is_flagged(self, flag_type):
+        return self.__file.is_flagged(flag_type)
+
+    def has_metadata_type(self, meta_type):
+        return self.__file.has_metadata_type(meta_type)
+
+    def get_metadata(self, meta_type):
+        return self.__file.get_metadata(meta_type)
+
+    def is_copied(self):
+        return self.__copied
+
+    def set_size(self, file_size):
+        self.__copy_on_write()
+        self.__file.set_size(file_size)
+
+    def flag(self, flag_type):
+        self.__copy_on_write()
+        self.__file.flag(flag_type)
+
+    def unflag(self, flag_type):
+        self.__copy_on_write()
+        self.__file.unflag(flag_type)
+
+    def set_metadata(self, meta_type, val):
+        self.__copy_on_write()
+        self.__file.set_metadata(meta_type, val)
+
+    def set_path(self, new_path):
+        self.__copy_on_write()
+        self.__file.set_path(new_path)
+
+    def update_path(self, new_dir):
+        self.__copy_on_write()
+        self.__file.update_path(new_dir)
+
+    def to_dict(self):
+        return self.__file.to_dict()
+
+    def debug_string(self):
+        return self.__file.debug_string()
+
+    def __str__(self):
+        return str(self.__file)
+
+    def __copy_on_write(self):
+        # Replace shared file with a private copy before view is modified
+        if not self.__copied:
+            self.__file     = copy.copy(self.__file)
+            self.__copied   = True
@@ -78,6 +78,7 @@ class DockerImage:
         self.resources  = self.__init_resource_files()
         self.resources  = self.__organize_by_type()
         self.size = 0
+        self.digest = None
         self.flags = []
 
     def __init_resource_files(self):
@@ -121,6 +122,12 @@ class DockerImage:
     def set_size(self, image_size):
         self.size = image_size
 
+    def get_digest(self):
+        return self.digest
+
+    def set_digest(self, image_digest):
+        self.digest = image_digest
+
     def flag(self, flag_type):
         if flag_type not in self.flags:
             self.flags.append(flag_type)
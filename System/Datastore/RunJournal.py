@@ -0,0 +1,119 @@
+import os
+import json
+import logging
+from collections import OrderedDict
+
+from GAPFile import GAPFile
+
+class RunJournal(object):
+    # Append-only record of the tasks completed during a pipeline run
+    # Each line holds the id and output of one completed task in the order tasks were completed
+    # Replaying the journal in order re-creates the split graph and task outputs of a previous run
+
+    def __init__(self, journal_file, pipeline_id):
+
+        # Path to journal file on the machine running GAP
+        self.journal_file   = os.path.abspath(journal_file)
+
+        # Id of pipeline run being journaled
+        self.pipeline_id    = pipeline_id
+
+        # Open journal file handle
+        self.__journal      = None
+
+    def get_journal_file(self):
+        return self.journal_file
+
+    def exists(self):
+        # Return True if journal file was left by a previous run
+        return os.path.isfile(self.journal_file)
+
+    def load(self):
+        # Return list of (task_id, module output) for each task completed in a previous run
+        if not os.path.isfile(self.journal_file):
+            logging.error("Cannot resume pipeline! Run journal not found: %s" % self.journal_file)
+            raise IOError("Run journal not found!")
+
+        entries = []
+        with open(self.journal_file, "r") as journal:
+            for line_num, line in enumerate(journal):
+                line = line.strip()
+                if line == "":
+                    continue
+                try:
+                    record = json.loads(line, object_pairs_hook=OrderedDict)
+                except ValueError:
+                    # Last record may be truncated if GAP was killed while writing it
+                    logging.warning("Ignoring unreadable record on line %d of run journal: %s" % (line_num+1, self.journal_file))
+                    continue
+
+                # First record identifies the pipeline run
+                if line_num == 0:
+                    if record.get("pipeline_id") != self.pipeline_id:
+                        logging.error("Cannot resume pipeline '%s' from journal of pipeline '%s'!" % (self.pipeline_id,
+                                                                                                      record.get("pipeline_id")))
+                        raise RuntimeError("Run journal belongs to a different pipeline!")
+                    continue
+
+                entries.append((str(record["task_id"]), self.deserialize(record["output"])))
+        return entries
+
+    def start(self, entries=None):
+        # Create new journal containing any tasks restored from a previous run
+        # Journal is re-written so tasks that couldn't be restored aren't carried forward
+        self.close()
+        journal_dir = os.path.dirname(self.journal_file)
+        if not os.path.isdir(journal_dir):
+            os.makedirs(journal_dir)
+
+        self.__journal = open(self.journal_file, "w")
+        self.__write({"pipeline_id": self.pipeline_id})
+        if entries is not None:
+            for task_id, output in entries:
+                self.__write({"task_id": task_id, "output": self.serialize(output)})
+        self.__sync()
+
+    def record_task(self, task):
+        # Append task output to journal as soon as task has been completed
+        if self.__journal is None:
+            return
+        self.__write({"task_id": task.get_ID(), "output": self.serialize(task.get_module().get_output())})
+        self.__sync()
+
+    def close(self):
+        if self.__journal is not None:
+            self.__sync()
+            self.__journal.close()
+            self.__journal = None
+
+    def __write(self, record):
+        self.__journal.write(json.dumps(record) + "\n")
+
+    def __sync(self):
+        # Make sure records are on disk in case GAP is killed
+        self.__journal.flush()
+        os.fsync(self.__journal.fileno())
+
+    @staticmethod
+    def serialize(value):
+        # Convert module output to JSON-serializable object
+        if isinstance(value, GAPFile):
+            return {"__gap_file__": value.to_dict()}
+        elif isinstance(value, dict):
+            return OrderedDict([(key, RunJournal.serialize(val)) for key, val in value.iteritems()])
+        elif isinstance(value, (list, tuple)):
+            return [RunJournal.serialize(val) for val in value]
+        return value
+
+    @staticmethod
+    def deserialize(value):
+        # Convert JSON object back to module output
+        if isinstance(value, dict):
+            if "__gap_file__" in value:
+                return GAPFile.from_dict(value["__gap_file__"])
+            return OrderedDict([(str(key), RunJournal.deserialize(val)) for key, val in value.iteritems()])
+        elif isinstance(value, list):
+            return [RunJournal.deserialize(val) for val in value]
+        elif isinstance(value, unicode):
+            return value.encode("utf-8")
+        return value
@@ -57,6 +57,12 @@ class SampleSet (object):
         # Sample order
         self.sample_names = [sample.name for sample in self.samples]
 
+        # Position of each sample in sample order
+        self.__sample_index = dict([(sample_name, index) for index, sample_name in enumerate(self.sample_names)])
+
+        # Sample data subset by sample. Cached as sample data never changes and many tasks see the same samples.
+        self.__sample_subsets = {}
+
         # Organize global and sample-level metadata by data type
         self.data   = self.__organize_data_by_type()
 
@@ -89,7 +95,7 @@ class SampleSet (object):
             return self.data
 
         # Subset by sample
-        data = self.data if samples is None else self.__subset_by_sample(self.data, samples)
+        data = self.data if samples is None else self.__get_sample_subset(samples)
 
         if data_type is None:
             return data
@@ -127,6 +133,13 @@ class SampleSet (object):
         # Single data type
         return {data_types : data[data_types]}
 
+    def __get_sample_subset(self, samples):
+        # Return sample data subset by sample
+        key = samples if isinstance(samples, basestring) else tuple(samples)
+        if key not in self.__sample_subsets:
+            self.__sample_subsets[key] = self.__subset_by_sample(self.data, samples)
+        return self.__sample_subsets[key]
+
     def __subset_by_sample(self, data, samples):
         # Subset data to include only certain samples
 
@@ -134,7 +147,7 @@ class SampleSet (object):
         if isinstance(samples, basestring):
             samples = [samples]
 
-        sample_indices = [self.sample_names.index(sample) for sample in samples]
+        sample_indices = [self.__sample_index[sample] for sample in samples]
         new_data = {}
         for data_type in data:
             if len(samples) > 1:
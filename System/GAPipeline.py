@@ -12,6 +12,9 @@ from System.Validators import InputValidator
 from System.Validators import SampleValidator
 from System.Platform import StorageHelper, DockerHelper
 from System.Datastore import Datastore
+from System.Datastore import GAPFile
+from System.Datastore import RunJournal
+from System.Datastore import CallCache
 from System.Graph import Scheduler
 
 class GAPipeline(object):
@@ -22,7 +25,12 @@ class GAPipeline(object):
                  sample_data_config,
                  platform_config,
                  platform_module,
-                 final_output_dir):
+                 final_output_dir,
+                 journal_file=None,
+                 resume=False,
+                 overwrite_journal=False,
+                 call_cache_dir=None,
+                 fuse_tasks=False):
 
         # GAP run id
         self.pipeline_id    = pipeline_id
@@ -41,6 +49,21 @@ class GAPipeline(object):
 
         # Obtain pipeline name and append to final output dir
 
+        # Path to journal where completed tasks are recorded
+        self.__journal_file         = journal_file
+
+        # Whether to skip tasks completed by a previous run recorded in the journal
+        self.__resume               = resume
+
+        # Whether a journal left by a previous run is overwritten when the pipeline isn't resumed
+        self.__overwrite_journal    = overwrite_journal
+
+        # Directory where task outputs are cached across runs
+        self.__call_cache_dir       = call_cache_dir
+
+        # Whether linear chains of tasks are fused and run as a single task
+        self.__fuse_tasks           = fuse_tasks
+
         self.graph          = None
         self.resource_kit   = None
         self.sample_data    = None
@@ -52,12 +75,18 @@ class GAPipeline(object):
         # Task scheduler for running jobs
         self.scheduler = None
 
+        # Journal of completed tasks
+        self.journal = None
+
+        # Cache of task outputs from previous runs
+        self.call_cache = None
+
         # Helper processor for handling platform operations
         self.helper_processor   = None
         self.storage_helper     = None
         self.docker_helper      = None
 
-    def load(self):
+    def load(self, dry_run=False):
 
         # Load resource kit
         self.resource_kit = ResourceKit(self.__res_kit_config)
@@ -68,14 +97,38 @@ class GAPipeline(object):
         # Load the graph
         self.graph = Graph(self.__graph_config)
 
+        # Dry runs only show where tasks get their input so the platform isn't created (e.g. no cloud authentication)
+        if dry_run:
+            self.datastore = Datastore(self.graph, self.resource_kit, self.sample_data, None)
+            return
+
+        # Load run journal
+        if self.__journal_file is not None:
+            self.journal = RunJournal(self.__journal_file, self.pipeline_id)
+
+            # Progress of a previous run is never lost unless it's resumed or explicitly overwritten
+            if self.journal.exists() and not (self.__resume or self.__overwrite_journal):
+                logging.error("Run journal of a previous run already exists: %s. "
+                              "Use --resume to resume the previous run or --force to overwrite its journal."
+                              % self.journal.get_journal_file())
+                raise IOError("Run journal already exists!")
+
+        elif self.__resume:
+            logging.error("Cannot resume pipeline without a run journal!")
+            raise RuntimeError("Cannot resume pipeline without a run journal!")
+
         # Load platform
         plat_module     = importlib.import_module(self.__plat_module)
         plat_class      = plat_module.__dict__[self.__plat_module]
         self.platform   = plat_class(self.pipeline_id, self.__platform_config, self.__final_output_dir)
 
+        # Load call cache
+        if self.__call_cache_dir is not None:
+            self.call_cache = CallCache(self.__call_cache_dir)
+
         # Create datastore and scheduler
         self.datastore = Datastore(self.graph, self.resource_kit, self.sample_data, self.platform)
-        self.scheduler = Scheduler(self.graph, self.datastore, self.platform)
+        self.scheduler = Scheduler(self.graph, self.datastore, self.platform, journal=self.journal, call_cache=self.call_cache)
 
     def validate(self):
 
@@ -109,6 +162,10 @@ class GAPipeline(object):
         self.storage_helper     = StorageHelper(self.helper_processor)
         self.docker_helper      = DockerHelper(self.helper_processor)
 
+        # Cached outputs are checked using the helper processor
+        if self.call_cache is not None:
+            self.call_cache.set_storage_helper(self.storage_helper)
+
         # Validate all pipeline inputs can be found on platform
         input_validator = InputValidator(self.resource_kit, self.sample_data, self.storage_helper, self.docker_helper)
         has_errors = input_validator.validate() or has_errors
@@ -125,11 +182,24 @@ class GAPipeline(object):
         logging.info("GAP run validated! Beginning pipeline execution.")
 
     def run(self, rm_tmp_output_on_success=True):
+        # Mark tasks completed by a previous run as complete and start a new run journal
+        if self.journal is not None:
+            restored = self.__restore_progress() if self.__resume else []
+            self.journal.start(restored)
+
+        # Fuse chains of tasks that haven't been completed by a previous run
+        # Tasks streaming input from their parent are always fused so they can run at the same time
+        self.graph.fuse_linear_chains(streams_only=not self.__fuse_tasks)
+
         # Run until all tasks are complete
         self.scheduler.run()
 
         # Remove temporary output on success
-        if rm_tmp_output_on_success:
+        # Intermediate output is kept when a call cache is used as cached tasks in later runs re-use it
+        if rm_tmp_output_on_success and self.call_cache is not None:
+            logging.info("Keeping tmp output directory for call cache: %s" %
+                         self.datastore.get_task_workspace().get_tmp_output_dir())
+        elif rm_tmp_output_on_success:
             workspace = self.datastore.get_task_workspace()
             try:
                 self.storage_helper.rm(path=workspace.get_tmp_output_dir(), job_name="rm_tmp_output", wait=True)
@@ -138,8 +208,33 @@ class GAPipeline(object):
                 if e.message != "":
                     logging.error("Received the following err message:\n%s" % e.message)
 
+    def dry_run(self):
+        # Return string showing where each task in the graph will get its input arguments without running anything
+        to_ret = ""
+        for task_id in self.graph.get_topological_order():
+            task = self.graph.get_tasks(task_id)
+            to_ret += "[%s]\n" % task_id
+            for arg_type, (input_type, args) in self.datastore.get_task_arg_index(task_id, dry_run=True).iteritems():
+                if input_type is None:
+                    arg = task.get_module().get_arguments()[arg_type]
+                    source = "missing" if arg.is_mandatory() and arg.get_default_value() is None else "default"
+                    to_ret += "\t%s\t= %s (%s)\n" % (arg_type, arg.get_default_value(), source)
+                    continue
+                values = args if isinstance(args, list) else [args]
+                to_ret += "\t%s\t= %s (%s)\n" % (arg_type, ", ".join([str(value) for value in values]), input_type)
+        return to_ret
+
     def save_progress(self):
-        pass
+        # Make sure all completed tasks have been written to the run journal
+        if self.journal is None:
+            return
+        try:
+            self.journal.close()
+            logging.info("Pipeline progress saved to run journal: %s" % self.journal.get_journal_file())
+        except BaseException, e:
+            logging.error("Unable to save pipeline progress to run journal: %s" % self.journal.get_journal_file())
+            if e.message != "":
+                logging.error("Received the following message:\n%s" % e.message)
 
     def publish_report(self, err=False, err_msg=None):
         # Create and publish GAP pipeline report
@@ -167,6 +262,64 @@ class GAPipeline(object):
         if self.platform is not None:
             self.platform.clean_up()
 
+    def __restore_progress(self):
+        # Replay tasks completed by a previous run in the order they were completed
+        # Splitters are re-split so that split tasks downstream can be restored as well
+        # Returns list of (task_id, output) for tasks that were restored
+        restored = []
+        journal = self.journal.load()
+
+        # Check which output files of journaled tasks still exist all at once
+        output_paths = []
+        for task_id, output in journal:
+            output_paths.extend([output_file.get_transferrable_path() for output_file in self.__get_output_files(output)])
+        file_sizes = self.storage_helper.get_file_sizes(output_paths, job_name="check_journal_outputs")
+
+        for task_id, output in journal:
+
+            # Skip tasks that don't exist because a splitter upstream wasn't restored
+            if task_id not in self.graph.get_tasks():
+                logging.debug("Unable to restore task '%s'. Task not in pipeline graph." % task_id)
+                continue
+
+            # Only restore tasks whose parents have been restored
+            task = self.graph.get_tasks(task_id)
+            parents = [self.graph.get_tasks(parent_id) for parent_id in self.graph.get_parents(task_id)]
+            if task.is_complete() or task.is_deprecated() or not all([parent.is_complete() for parent in parents]):
+                logging.debug("Unable to restore task '%s'. Upstream tasks not restored." % task_id)
+                continue
+
+            # Only restore tasks whose output files still exist
+            task.get_module().restore_output(output)
+            missing = [output_file for output_file in self.__get_output_files(output)
+                       if file_sizes[output_file.get_transferrable_path()] is None]
+            if len(missing) > 0:
+                logging.warning("Unable to restore task '%s'. Output file not found: %s" % (task_id, missing[0].get_path()))
+                task.get_module().restore_output(OrderedDict() if task.is_splitter_task() else {})
+                continue
+
+            # Re-create split graph downstream of splitter
+            if task.is_splitter_task():
+                self.graph.split_graph(task_id)
+
+            task.set_complete(True)
+            restored.append((task_id, output))
+            logging.info("Restored task '%s' from previous run." % task_id)
+
+        logging.info("Restored %d completed tasks from run journal: %s" % (len(restored), self.journal.get_journal_file()))
+        return restored
+
+    @staticmethod
+    def __get_output_files(output):
+        # Return output files of a journaled task. Splitter output holds the output of each split.
+        output_vals = []
+        for output_val in output.values():
+            if isinstance(output_val, dict):
+                output_vals.extend(output_val.values())
+            else:
+                output_vals.append(output_val)
+        return [output_val for output_val in output_vals if isinstance(output_val, GAPFile)]
+
     def __make_pipeline_report(self, err, err_msg):
 
         # Create a pipeline report that summarizes features of pipeline
@@ -192,7 +345,9 @@ class GAPipeline(object):
                 cost        = task_worker.get_cost()
                 start_time  = task_worker.get_start_time()
                 cmd         = task_worker.get_cmd()
-                task_data   = {"parent_task" : task_name.split(".")[0]}
+                task_data   = {"parent_task" : task_name.split(".")[0],
+                               "cache_hit" : task_worker.is_cache_hit(),
+                               "fused_tasks" : task.get_fused_tasks()}
                 report.register_task(task_name=task_name,
                                      start_time=start_time,
                                      run_time=run_time,
@@ -200,15 +355,17 @@ class GAPipeline(object):
                                      cmd=cmd,
                                      task_data=task_data)
 
-                # Register data about task output files
-                if task.is_complete():
-                    output_files = self.datastore.get_task_output_files(task_id=task_name)
+                # Register data about output files of task and tasks fused into it
+                for run_task in [task] + [self.graph.get_tasks(x) for x in task.get_fused_tasks()]:
+                    if not run_task.is_complete():
+                        continue
+                    output_files = self.datastore.get_task_output_files(task_id=run_task.get_ID())
                     for output_file in output_files:
                         file_type       = output_file.get_type()
                         file_path       = output_file.get_path()
-                        is_final_output = file_type in task.get_final_output_keys()
+                        is_final_output = file_type in run_task.get_final_output_keys()
                         file_size       = output_file.get_size()
-                        report.register_output_file(task_name, file_type, file_path, file_size, is_final_output)
+                        report.register_output_file(run_task.get_ID(), file_type, file_path, file_size, is_final_output)
 
         return report
 
@@ -19,6 +19,15 @@ class Graph(object):
         # Check validity of adjacency list
         self.__check_adjacency_list()
 
+        # Index parents/children of each task as ordered sets so edge lookups don't require scanning the graph
+        self.children = OrderedDict()
+        self.__index_edges()
+
+        # Position of each task in a topological ordering of the graph
+        # Kept up to date as tasks/edges are added so the graph never needs to be re-sorted
+        self.__topo_rank = {}
+        self.__next_rank = 0
+
         # Check for cycles
         self.__check_cycles()
 
@@ -30,7 +39,12 @@ class Graph(object):
 
         # Add new new to nodelist
         self.tasks[task.get_ID()] = task
-        self.adj_list[task.get_ID()] = []
+        self.adj_list[task.get_ID()] = OrderedDict()
+        self.children[task.get_ID()] = OrderedDict()
+
+        # New task has no edges so it can go at the end of the topological order
+        self.__topo_rank[task.get_ID()] = self.__next_rank
+        self.__next_rank += 1
 
     def remove_task(self, task_id):
         # Remove node and all edges from Graph
@@ -40,12 +54,13 @@ class Graph(object):
 
         # Remove node from vertice list
         self.tasks.pop(task_id)
-        self.adj_list.pop(task_id)
+        self.__topo_rank.pop(task_id)
 
         # Remove all references to node in adjacency list
-        for adj_list in self.adj_list.itervalues():
-            if task_id in adj_list:
-                adj_list.remove(task_id)
+        for parent_id in self.adj_list.pop(task_id):
+            self.children[parent_id].pop(task_id)
+        for child_id in self.children.pop(task_id):
+            self.adj_list[child_id].pop(task_id)
 
     def add_dependency(self, child_task_id, parent_task_id):
         # Adds dependency where dep_nod_id must wait until ind_node_id is finished
@@ -56,8 +71,16 @@ class Graph(object):
             logging.error("Unable to add dependency to graph! Unknown task: %s!" % parent_task_id)
             raise RuntimeError("Attempt to add edge between non-existant tasks!")
 
+        # Nothing to do if dependency already exists
+        if parent_task_id in self.adj_list[child_task_id]:
+            return
+
+        # Move tasks in topological order so parent comes before child. Raises error if edge creates a cycle.
+        self.__reorder(child_task_id, parent_task_id)
+
         # Add dependency
-        self.adj_list[child_task_id].append(parent_task_id)
+        self.adj_list[child_task_id][parent_task_id] = None
+        self.children[parent_task_id][child_task_id] = None
 
     def get_tasks(self, task_id=None):
         if task_id is None:
@@ -71,17 +94,17 @@ class Graph(object):
         if task_id not in self.tasks:
             logging.error("Cannot list children for non-existant task: %s" % task_id)
             raise RuntimeError("Graph Error: Attempt to get children from nonexistant task!")
-        dependents = []
-        for task, edges in self.adj_list.iteritems():
-            if task_id in edges:
-                dependents.append(task)
-        return dependents
+        return self.children[task_id].keys()
 
     def get_parents(self, task_id):
         if task_id not in self.tasks:
             logging.error("Cannot list parent tasks for non-existant task: %s" % task_id)
             raise RuntimeError("Graph Error: Attempt to get parents from nonexistant task!")
-        return [x for x in self.adj_list[task_id]]
+        return self.adj_list[task_id].keys()
+
+    def get_topological_order(self):
+        # Return task ids ordered so that every task comes after all of its parents
+        return sorted(self.tasks.keys(), key=lambda task_id: self.__topo_rank[task_id])
 
     def is_complete(self):
         return len(self.get_unfinished_tasks()) < 1
@@ -91,10 +114,78 @@ class Graph(object):
         parents = self.get_parents(task_id)
         return len(parents) == len([x for x in parents if self.get_tasks(x).is_complete()])
 
+    def fuse_linear_chains(self, streams_only=False):
+        # Fuse chains of tasks where each task's output is only needed by the next task in the chain
+        # The first task of a chain runs every task in the chain on one processor as a single command
+        # If streams_only is set, only tasks streaming input from their parent are fused
+        # Returns list of fused chains
+        chains = OrderedDict()
+        chain_heads = {}
+        downstream_of_splitter = set()
+        for task_id in self.get_topological_order():
+            task = self.tasks[task_id]
+            parents = self.get_parents(task_id)
+
+            # Tasks downstream of a splitter are replaced at runtime by split tasks so they can't be fused ahead of time
+            if task.is_splitter_task() or len([x for x in parents if x in downstream_of_splitter
+                                               or self.tasks[x].is_splitter_task()]) > 0:
+                downstream_of_splitter.add(task_id)
+                fused = False
+
+            # Extend chain ending at parent with current task
+            elif len(parents) == 1 and (task.streams_input() or not streams_only) \
+                    and self.__can_fuse(parents[0], task_id):
+                head_id = chain_heads.get(parents[0], parents[0])
+                chains.setdefault(head_id, [head_id]).append(task_id)
+                chain_heads[task_id] = head_id
+                fused = True
+
+            else:
+                fused = False
+
+            # Input can only be streamed between tasks running at the same time on the same processor
+            if task.streams_input() and not fused:
+                logging.warning("Task '%s' can't be run alongside its parent so its input won't be streamed!" % task_id)
+
+        for head_id, chain in chains.iteritems():
+            self.tasks[head_id].fuse(chain[1:])
+            for task_id in chain[1:]:
+                self.tasks[task_id].set_fused_into(head_id)
+            logging.info("Fused tasks into a single task: %s" % ", ".join(chain))
+        return chains.values()
+
+    def __can_fuse(self, parent_id, task_id):
+        # Determine if task can be run as part of the same command as its only parent
+        parent = self.tasks[parent_id]
+        task = self.tasks[task_id]
+        if parent.is_complete() or task.is_complete() or parent.is_deprecated() or task.is_deprecated():
+            return False
+
+        # Parent output can't go anywhere other than task
+        if len(self.get_children(parent_id)) != 1:
+            return False
+
+        # Mergers are excluded as they can be re-wired by splitters upstream
+        if parent.can_accept_multi_input() or task.can_accept_multi_input():
+            return False
+
+        # Commands are run together so both tasks need to run in the same docker image
+        if parent.get_docker_image_id() != task.get_docker_image_id():
+            return False
+
+        # Only the output of the last command in a chain is returned so only the last task can parse it
+        return not parent.get_module().parses_cmd_output()
+
     def split_graph(self, splitter_task_id):
         # Recursively split tasks downstream of 'head_task' until a closing merge is reached
+        # Graph is transformed in a single batch and validated once after all splits have been created
         child_tasks = self.get_children(splitter_task_id)
         splitter_task = self.tasks[splitter_task_id]
+
+        # Split tasks created and tasks deprecated by current split
+        split_task_ids  = set()
+        deprecated      = OrderedDict()
+
         for split_id in splitter_task.module.get_output():
             # Create new graph partition for each new split
             split = splitter_task.module.get_output(split_id=split_id)
@@ -102,11 +193,12 @@ class Graph(object):
             # If no visible samples declared, split nodes inherit visible samples from splitter task
             visible_samples = split["visible_samples"] if split["visible_samples"] is not None else splitter_task.get_visible_samples()
             for child_task in child_tasks:
-                child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples)
+                child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples,
+                                                    split_task_ids=split_task_ids, deprecated=deprecated)
                 self.add_dependency(child_split, splitter_task_id)
 
         # Loop through deprecated tasks and give upstream dependencies for parent tasks that weren't in splitter's subtree
-        for task in self.__deprecated_tasks:
+        for task in deprecated:
             # Get parents of deprecated task
             parents = self.get_parents(task)
             for parent in parents:
@@ -114,8 +206,7 @@ class Graph(object):
                 # Add that dependency for all a tasks's newly created daughter splits
                 if not self.tasks[parent].is_deprecated() and parent != splitter_task_id:
                     for clone_task_id in self.tasks[task].get_clones():
-                        if parent not in self.get_parents(clone_task_id):
-                            self.add_dependency(clone_task_id, parent)
+                        self.add_dependency(clone_task_id, parent)
 
             # Remove deprecated task from graph completely
             #self.remove_task(task)
@@ -123,13 +214,12 @@ class Graph(object):
             # Set deprecated task to complete so it doesn't get run
             self.tasks[task].set_complete(is_complete=True)
 
-            # Make sure graph structure is still valid
-            self.__check_adjacency_list()
-            self.__check_cycles()
-
-    @property
-    def __deprecated_tasks(self):
-        return [task.get_ID() for task in self.tasks.values() if task.is_deprecated()]
+        # Make sure structure of altered part of graph is still valid
+        # Cycles are caught as each dependency is added
+        affected = set([splitter_task_id]) | split_task_ids
+        for task in split_task_ids:
+            affected.update(self.get_children(task))
+        self.__check_adjacency_list(runtime=True, task_ids=affected)
 
     def __generate_graph(self):
 
@@ -143,9 +233,23 @@ class Graph(object):
 
         return tasks, adj_list
 
-    def __check_adjacency_list(self, runtime=False):
+    def __index_edges(self):
+        # Convert parent lists to ordered sets and build reverse index of children
+        for task_id in self.tasks:
+            self.children[task_id] = OrderedDict()
+        for task_id in self.tasks:
+            parents = self.adj_list[task_id]
+            self.adj_list[task_id] = OrderedDict()
+            for parent_id in parents:
+                self.adj_list[task_id][parent_id] = None
+                self.children[parent_id][task_id] = None
+
+    def __check_adjacency_list(self, runtime=False, task_ids=None):
+        # Check input tasks of every task in the graph or of only the tasks in task_ids
         errors = False
-        for task, adj_tasks in self.adj_list.iteritems():
+        task_ids = self.adj_list.keys() if task_ids is None else task_ids
+        for task in task_ids:
+            adj_tasks = self.adj_list[task]
 
             # Enforce uniqueness of task inputs. Duplicate entries are probably a mistake so better to just throw error
             if len(adj_tasks) != len(set(adj_tasks)):
@@ -168,8 +272,11 @@ class Graph(object):
             else:
                 raise RuntimeError("Runtime graph alteration resulted in invalid graph!")
 
-    def __split_subgraph(self, task_id, splitter_task_id, split_id, visible_samples, level=1, split_task_ids=[]):
+    def __split_subgraph(self, task_id, splitter_task_id, split_id, visible_samples, level=1, split_task_ids=None, deprecated=None):
         # Recursively split subgraph that depends on 'task'
+        # Ids of created split tasks are added to split_task_ids and ids of tasks that were split are added to deprecated
+        split_task_ids  = set() if split_task_ids is None else split_task_ids
+        deprecated      = OrderedDict() if deprecated is None else deprecated
 
         task = self.tasks[task_id]
 
@@ -192,6 +299,7 @@ class Graph(object):
         # Can happen if two tasks in split subtree have same child
         if split_task.get_ID() in split_task_ids:
             task.deprecate()
+            deprecated[task_id] = None
             return split_task.get_ID()
 
         # Add newly created task to existing graph and clone parental dependencies
@@ -199,15 +307,17 @@ class Graph(object):
 
         # Mark original task as deprecated so it can be discarded
         task.deprecate()
+        deprecated[task_id] = None
 
         # Add new task ID to list of ids in current split
-        split_task_ids.append(split_task.get_ID())
+        split_task_ids.add(split_task.get_ID())
 
         # Create dependencies between current task and splits created for each child task
         child_tasks = self.get_children(task_id)
         for child_task in child_tasks:
             # Split each child subgraph
-            child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples, level, split_task_ids)
+            child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples, level,
+                                                split_task_ids, deprecated)
             # Connect task to split child subgraph
             self.add_dependency(child_split, split_task.get_ID())
 
@@ -215,45 +325,71 @@ class Graph(object):
         return split_task.get_ID()
 
     def __check_cycles(self, runtime=False):
-        # Taken with modification from https://www.geeksforgeeks.org/detect-cycle-in-a-graph/
-        cycle = False
-        visited = []
-        recStack = []
-        for task_id in self.tasks.keys():
-            if task_id not in visited:
-                if self.__is_cycle(task_id, visited, recStack):
-                    cycle = True
-        if cycle:
+        # Topologically sort graph (Kahn's algorithm). Any tasks that can't be sorted are part of a cycle.
+        num_parents = dict([(task_id, len(self.adj_list[task_id])) for task_id in self.tasks])
+        ready = [task_id for task_id in self.tasks if num_parents[task_id] == 0]
+        topo_order = []
+        while len(ready) > 0:
+            task_id = ready.pop()
+            topo_order.append(task_id)
+            for child_id in self.children[task_id]:
+                num_parents[child_id] -= 1
+                if num_parents[child_id] == 0:
+                    ready.append(child_id)
+
+        if len(topo_order) != len(self.tasks):
+            cycle_tasks = [task_id for task_id in self.tasks if num_parents[task_id] > 0]
+            logging.error("Incorrect pipeline graph: Cycle detected that includes one or more of the following tasks: %s" % ", ".join(cycle_tasks))
             if not runtime:
                 raise IOError("Incorrect pipeline graph: Cycle detected!")
             else:
                 raise RuntimeError("Runtime graph alteration resulted in invalid graph: Cycle detected!")
 
-    def __is_cycle(self, task_id, visited, recStack):
-
-        # Mark current task as visited
-        visited.append(task_id)
-        # Add current task to current recursion stack
-        recStack.append(task_id)
-
-        # Check if any subgraph of current task contains a cycle
-        neighbors = self.get_children(task_id)
-        for neighbor_id in neighbors:
-            if neighbor_id not in visited:
-                if self.__is_cycle(neighbor_id, visited, recStack):
-                    return True
-            elif neighbor_id in recStack:
-                logging.error("Incorrect pipeline graph: Cycle detected that includes task '%s'!" % task_id)
-                return True
-
-        # Pop current task from recursion stack
-        recStack.remove(task_id)
-        return False
+        # Reset topological order
+        self.__topo_rank = dict([(task_id, rank) for rank, task_id in enumerate(topo_order)])
+        self.__next_rank = len(topo_order)
+
+    def __reorder(self, child_task_id, parent_task_id):
+        # Update topological order to account for a new edge (Pearce-Kelly dynamic topological sort)
+        # Only tasks ranked between the child and the parent need to be moved
+        lower_bound = self.__topo_rank[child_task_id]
+        upper_bound = self.__topo_rank[parent_task_id]
+        if upper_bound < lower_bound:
+            # Parent already comes before child
+            return
+
+        # Tasks downstream of child that are ranked before parent. Cycle if parent is one of them.
+        downstream = self.__get_affected_tasks(child_task_id, self.children, lambda rank: rank <= upper_bound)
+        if parent_task_id in downstream:
+            logging.error("Graph Error: Adding dependency of '%s' on '%s' would create a cycle!" % (child_task_id, parent_task_id))
+            raise RuntimeError("Runtime graph alteration resulted in invalid graph: Cycle detected!")
+
+        # Tasks upstream of parent that are ranked after child
+        upstream = self.__get_affected_tasks(parent_task_id, self.adj_list, lambda rank: rank >= lower_bound)
+
+        # Re-use ranks of affected tasks, placing upstream tasks ahead of downstream tasks
+        sort_key = lambda task_id: self.__topo_rank[task_id]
+        affected = sorted(upstream, key=sort_key) + sorted(downstream, key=sort_key)
+        ranks = sorted([self.__topo_rank[task_id] for task_id in affected])
+        for task_id, rank in zip(affected, ranks):
+            self.__topo_rank[task_id] = rank
+
+    def __get_affected_tasks(self, start_task_id, edges, in_bounds):
+        # Return set of tasks reachable from a task through edges whose topological rank is in bounds
+        visited = set([start_task_id])
+        to_visit = [start_task_id]
+        while len(to_visit) > 0:
+            task_id = to_visit.pop()
+            for next_task_id in edges[task_id]:
+                if next_task_id not in visited and in_bounds(self.__topo_rank[next_task_id]):
+                    visited.add(next_task_id)
+                    to_visit.append(next_task_id)
+        return visited
 
     def __str__(self):
         to_ret = ""
         for task_id, task in self.tasks.iteritems():
-            to_ret += "%s\n" % task.get_task_string(input_from=self.adj_list[task_id])
+            to_ret += "%s\n" % task.get_task_string(input_from=self.get_parents(task_id))
         return to_ret
 
 
@@ -1,7 +1,7 @@
 import logging
 import os
 
-from System.Platform import StorageHelper, DockerHelper, Processor
+from System.Platform import StorageHelper, DockerHelper, Processor, TransferManager, TransferQueue
 
 class ModuleExecutor(object):
 
@@ -13,7 +13,17 @@ class ModuleExecutor(object):
         self.docker_helper  = DockerHelper(self.processor)
         self.docker_image   = docker_image
 
-    def load_input(self, inputs):
+        # Jobs that create the workspace. Always re-run if the processor is reset.
+        self.workspace_jobs = []
+
+        # Number of output files saved so far. Used to create unique job names.
+        self.output_count   = 0
+
+        # Output dirs created for tasks fused into the executor's task
+        self.output_dirs    = []
+
+    def load_input(self, inputs, local_dir=None):
+        # Inputs under local_dir are already on the processor and are linked so they're left in place
 
         if self.processor.get_status() is Processor.OFF:
             # Create processor if it's off
@@ -30,33 +40,18 @@ class ModuleExecutor(object):
         if self.docker_image is not None:
             docker_image_name = self.docker_image.get_image_name().split("/")[0]
             docker_image_name = docker_image_name.replace(":","_")
-            job_name = "docker_pull_%s" % docker_image_name
+            job_name = "docker_pull_%s_%s" % (docker_image_name, self.task_id)
             self.docker_helper.pull(self.docker_image.get_image_name(), job_name=job_name)
             job_names.append(job_name)
 
         # Load input files
         # Inputs: list containing remote files, local files, and docker images
-        seen = []
-        count = 1
-        for task_input in inputs:
-
-            # Case: Transfer file into wrk directory if its not already there
-            if task_input.get_transferrable_path() not in seen:
-
-                # Transfer file to workspace directory
-                src_path = task_input.get_transferrable_path()
-                job_name = "load_input_%s_%s_%s" % (self.task_id, task_input.get_type(), count)
-                logging.debug("Input path: %s, transfer path: %s" %(task_input.get_path(), src_path))
-                self.storage_helper.mv(src_path=src_path,
-                                       dest_path=self.workspace.get_wrk_dir(),
-                                       job_name=job_name)
-
-                # Add transfer path to list of remote paths that have been transferred to local workspace
-                seen.append(src_path)
-                count += 1
-                job_names.append(job_name)
+        # Duplicate files are only transferred once and small files are transferred together
+        transfer_manager = TransferManager(self.task_id, self.processor)
+        transfer_manager.stage(inputs, dest_dir=self.workspace.get_wrk_dir(), local_dir=local_dir)
 
-            # Update path after transferring to wrk directory
+        # Update paths after transferring to wrk directory
+        for task_input in inputs:
             task_input.update_path(new_dir=self.workspace.get_wrk_dir())
             logging.debug("Updated path: %s" % task_input.get_path())
 
@@ -66,66 +61,144 @@ class ModuleExecutor(object):
 
         # Recursively give every permission to all files we just added
         logging.info("(%s) Final workspace perm. update for task '%s'..." % (self.processor.name, self.task_id))
-        self.__grant_workspace_perms(job_name="grant_final_wrkspace_perms")
+        self.__grant_workspace_perms(job_name="grant_final_wrkspace_perms_%s" % self.task_id)
+
+        # Inputs don't need to be staged again if the processor is reset with its disk intact
+        self.__checkpoint("inputs_staged")
 
-    def run(self, cmd):
+    def run(self, cmd, output_parser=None, read_output=False):
         # Job name
         job_name = self.task_id
         # Get name of docker image where command should be run (if any)
         docker_image_name = None if self.docker_image is None else self.docker_image.get_image_name()
         # Begin running job and return stdout, stderr after job has finished running
-        self.processor.run(job_name, cmd, docker_image=docker_image_name)
-        return self.processor.wait_process(job_name)
+        # Output is handed to the parser line by line if one is given
+        self.processor.run(job_name, cmd, docker_image=docker_image_name, output_parser=output_parser)
+        out, err = self.processor.wait_process(job_name)
+
+        # Full output is only read back from disk if it's parsed once the command has finished
+        if read_output:
+            out, err = self.processor.read_output(job_name)
 
-    def save_output(self, outputs, final_output_types):
+        # Command doesn't need to be re-run if the processor is reset with its disk intact
+        self.__checkpoint("cmd_complete")
+        return out, err
+
+    def save_output(self, outputs, final_output_types, local_outputs=None, workspace=None, mark_durable=True, wait=True):
         # Return output files to workspace output dir
+        # Local outputs are left in the working directory for the next task run on the processor
+        # Output of tasks fused into the executor's task is saved to the workspace of the task that produced it
+        # Returns futures of output transfers. If wait is False, transfers are left running in the background
+        # and the caller marks the task's jobs as durable once they're done.
 
         # Get workspace places for output files
-        final_output_dir = self.workspace.get_output_dir()
-        tmp_output_dir = self.workspace.get_tmp_output_dir()
-        count = 1
-        job_names = []
+        workspace = self.workspace if workspace is None else workspace
+        final_output_dir = workspace.get_output_dir()
+        tmp_output_dir = workspace.get_tmp_output_dir()
+        local_outputs = [] if local_outputs is None else local_outputs
+        upload_queue = TransferQueue.get_queue(self.processor)
+        transfers = []
+
+        # Output dirs of the executor's own workspace were created along with its working directory
+        if workspace is not self.workspace:
+            self.__create_output_dirs([final_output_dir, tmp_output_dir])
+
+        # Calculate size of all output files at once
+        job_name = "get_size_%s_%s" % (self.task_id, self.output_count+1)
+        file_sizes = self.storage_helper.get_file_sizes([x.get_path() for x in outputs], job_name=job_name)
 
         for output_file in outputs:
             if output_file.get_type() in final_output_types:
                 dest_dir = final_output_dir
             else:
                 dest_dir = tmp_output_dir
-
-            # Calculate output file size
-            job_name = "get_size_%s_%s_%s" % (self.task_id, output_file.get_type(), count)
-            file_size = self.storage_helper.get_file_size(output_file.get_path(), job_name=job_name)
+            self.output_count += 1
+
+            # Output file must exist to be saved
+            file_size = file_sizes[output_file.get_path()]
+            if file_size is None:
+                logging.error("(%s) Output file of type '%s' not found: %s" %
+                              (self.task_id, output_file.get_type(), output_file.get_path()))
+                raise RuntimeError("Output file of task '%s' not found!" % self.task_id)
             output_file.set_size(file_size)
 
+            # Keep output on processor
+            if output_file in local_outputs:
+                logging.debug("(%s) Keeping output on processor: %s" % (self.task_id, output_file.get_path()))
+                continue
+
             # Transfer to correct output directory
-            job_name = "save_output_%s_%s_%s" % (self.task_id, output_file.get_type(), count)
+            job_name = "save_output_%s_%s_%s" % (self.task_id, output_file.get_type(), self.output_count)
             curr_path = output_file.get_transferrable_path()
-            self.storage_helper.mv(curr_path, dest_dir, job_name=job_name)
 
             # Update path of output file to reflect new location
-            job_names.append(job_name)
             output_file.update_path(new_dir=dest_dir)
-            count += 1
+            transfers.append(upload_queue.submit(job_name,
+                                                 lambda job_name, src=curr_path, dest=dest_dir:
+                                                     self.storage_helper.mv(src, dest, job_name=job_name),
+                                                 output_file.get_transferrable_path()))
+
+        if not wait:
+            return transfers
+
+        # Wait for transfers to complete
+        self.wait_transfers(transfers)
+
+        if mark_durable and len(local_outputs) == 0:
+            self.mark_durable()
+        return transfers
+
+    def mark_durable(self):
+        # Outputs are now in the workspace output dirs so nothing run so far needs to be re-run if processor is reset
+        # Workspace is still re-created after a reset so logs can be written and returned
+        self.processor.mark_durable([proc_name for proc_name in self.processor.processes
+                                     if proc_name not in self.workspace_jobs])
+
+    @staticmethod
+    def wait_transfers(transfers):
+        # Wait for all transfers to finish. Raise the first error once none of them are still running.
+        error = None
+        for transfer in transfers:
+            try:
+                transfer.wait()
+            except BaseException, e:
+                error = e if error is None else error
+        if error is not None:
+            raise error
+
+    def persist_output(self, outputs):
+        # Move output files kept on processor to the tmp output dir
+        tmp_output_dir = self.workspace.get_tmp_output_dir()
+        job_names = []
+        for count, output_file in enumerate(outputs):
+            job_name = "persist_output_%s_%s_%s" % (self.task_id, output_file.get_type(), count+1)
+            self.storage_helper.mv(output_file.get_transferrable_path(), tmp_output_dir, job_name=job_name)
+            output_file.update_path(new_dir=tmp_output_dir)
+            job_names.append(job_name)
 
         # Wait for transfers to complete
         for job_name in job_names:
             self.processor.wait_process(job_name)
 
-        # Wait for output files to finish transferring
-        self.processor.wait()
+    def remove_workspace(self, wrk_dir):
+        # Remove working directory left on processor by an earlier task
+        job_name = "rm_wrk_%s" % self.task_id
+        self.storage_helper.rm(wrk_dir, job_name=job_name, log=False, wait=True)
 
     def save_logs(self):
         # Move log files to final output log directory
         log_files = os.path.join(self.workspace.get_wrk_log_dir(), "*")
         final_log_dir = self.workspace.get_final_log_dir()
-        self.storage_helper.mv(log_files, final_log_dir, job_name="return_logs", log=False, wait=True)
+        self.storage_helper.mv(log_files, final_log_dir, job_name="return_logs_%s" % self.task_id, log=False, wait=True)
 
     def __create_workspace(self):
         # Create all directories specified in task workspace
 
         logging.info("(%s) Creating workspace for task '%s'..." % (self.processor.name, self.task_id))
         for dir_type, dir_obj in  self.workspace.get_workspace().iteritems():
-            self.storage_helper.mkdir(dir_obj, job_name="mkdir_%s" % dir_type, wait=True)
+            job_name = "mkdir_%s_%s" % (dir_type, self.task_id)
+            self.storage_helper.mkdir(dir_obj, job_name=job_name, wait=True)
+            self.workspace_jobs.append(job_name)
 
         # Set processor wrk, log directories
         self.processor.set_wrk_dir(self.workspace.get_wrk_dir())
@@ -133,11 +206,32 @@ class ModuleExecutor(object):
 
         # Give everyone all the permissions on working directory
         logging.info("(%s) Updating workspace permissions..." % self.processor.name)
-        self.__grant_workspace_perms(job_name="grant_initial_wrkspace_perms")
+        job_name = "grant_initial_wrkspace_perms_%s" % self.task_id
+        self.__grant_workspace_perms(job_name=job_name)
+        self.workspace_jobs.append(job_name)
 
         # Wait for all the above commands to complete
         logging.info("(%s) Successfully created workspace for task '%s'!" % (self.processor.name, self.task_id))
 
+    def __checkpoint(self, stage):
+        # Write marker to working directory recording that every process run so far has completed
+        # Workspace is still re-created after a reset so logs can be written and returned
+        marker_path = os.path.join(self.workspace.get_wrk_dir(), ".gap_%s_%s" % (stage, self.task_id))
+        job_name = "checkpoint_%s_%s" % (stage, self.task_id)
+        self.processor.run(job_name=job_name, cmd="touch %s" % marker_path)
+        self.processor.wait_process(job_name)
+        self.processor.add_checkpoint(marker_path, [proc_name for proc_name in self.processor.processes
+                                                    if proc_name not in self.workspace_jobs])
+
+    def __create_output_dirs(self, dir_paths):
+        # Create output directories outside of the executor's workspace
+        for dir_path in dir_paths:
+            if dir_path in self.output_dirs:
+                continue
+            self.output_dirs.append(dir_path)
+            job_name = "mkdir_output_%s_%d" % (self.task_id, len(self.output_dirs))
+            self.storage_helper.mkdir(dir_path, job_name=job_name, wait=True)
+
     def __grant_workspace_perms(self, job_name):
         cmd = "sudo chmod -R 777 %s" % self.workspace.get_wrk_dir()
         self.processor.run(job_name=job_name, cmd=cmd)
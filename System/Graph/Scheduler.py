@@ -1,20 +1,53 @@
 import logging
-import time
+import Queue
+import heapq
+import itertools
 
 from TaskWorker import TaskWorker
 
 class Scheduler(object):
 
-    def __init__(self, task_graph, datastore, platform):
+    # Max number of seconds to block while waiting for a task worker to finish
+    # Bounded so the main thread stays responsive to interrupts
+    COMPLETION_POLL_TIMEOUT = 1
+
+    def __init__(self, task_graph, datastore, platform, journal=None, call_cache=None):
 
         # Initialize pipeline definition variables
         self.task_graph     = task_graph
         self.datastore      = datastore
         self.platform       = platform
 
+        # Run journal where completed tasks are recorded so that failed runs can be resumed
+        self.journal        = journal
+
+        # Cache of task outputs from previous runs
+        self.call_cache     = call_cache
+
         # Initialize set of task workers
         self.task_workers = {}
 
+        # Queue where task workers post their task id as soon as they finish running
+        self.completion_queue = Queue.Queue()
+
+        # Number of unfinished parents for each task that hasn't been launched yet
+        self.__pending_parents = {}
+
+        # Tasks whose parents have all completed but which haven't been launched yet
+        # Heap ordered by task priority so most critical tasks are launched first
+        self.__ready_tasks = []
+        self.__ready_counter = itertools.count()
+
+        # Observed runtimes (total runtime, number of tasks) for each module class
+        # Used to weight task priorities by how long similar tasks have taken to run
+        self.__runtime_history = {}
+
+        # Priorities of ready and waiting tasks. Only re-computed after a task completes as nothing else changes them.
+        self.__priorities = None
+
+        # Number of task workers that have been launched but not yet finalized
+        self.__num_running = 0
+
     def get_task_workers(self):
         return self.task_workers
 
@@ -26,31 +59,145 @@ class Scheduler(object):
 
     def __run_tasks(self):
         # Execute tasks until are are completed or until error encountered
-        while not self.task_graph.is_complete():
 
-            # Check all tasks to see if they need anything updated
-            unfinished_tasks = self.task_graph.get_unfinished_tasks()
-            for task in unfinished_tasks:
+        # Determine which tasks are ready to run and which are waiting on parents
+        self.__index_pending_tasks()
 
-                # Task id
-                task_id = task.get_ID()
+        while len(self.__ready_tasks) > 0 or self.__num_running > 0:
 
-                # Check if task worker has been created for task
-                task_worker = None if task_id not in self.task_workers else self.task_workers[task_id]
+            # Start running tasks that are ready to run but aren't currently
+            self.__launch_ready_tasks()
 
-                # Finalize completed tasks
-                if task_worker is not None and task_worker.get_status() == TaskWorker.COMPLETE:
-                    self.__finalize_task_worker(task_worker)
-                    continue
+            # Block until a task worker reports that it has finished
+            task_id = self.__wait_for_completion()
+            if task_id is None:
+                continue
+
+            # Finalize completed task and schedule any children that are now ready to run
+            task_worker = self.task_workers[task_id]
+            if task_worker.get_status() == TaskWorker.COMPLETE:
+                self.__finalize_task_worker(task_worker)
+
+        # Nothing left to run or running. Graph must be complete otherwise no tasks can ever be run.
+        if not self.task_graph.is_complete():
+            unfinished = [task.get_ID() for task in self.task_graph.get_unfinished_tasks()]
+            logging.error("Scheduler stalled! The following tasks can never be run: %s" % ", ".join(unfinished))
+            raise RuntimeError("Scheduler stalled before all tasks completed!")
+
+    def __index_pending_tasks(self):
+        # Count the unfinished parents of every task that hasn't been launched yet
+        # Tasks with no unfinished parents are ready to be launched
+        self.__pending_parents = {}
+        self.__ready_tasks = []
+        for task in self.task_graph.get_unfinished_tasks():
+            task_id = task.get_ID()
+            # Fused tasks are run by the worker of the task they're fused into
+            if task_id in self.task_workers or task.is_deprecated() or task.is_fused():
+                continue
+
+            num_pending = len([parent_id for parent_id in self.task_graph.get_parents(task_id)
+                               if not self.task_graph.get_tasks(parent_id).is_complete()])
+
+            if num_pending == 0:
+                self.__ready_tasks.append(task_id)
+            else:
+                self.__pending_parents[task_id] = num_pending
+
+    def __release_children(self, task_id):
+        # Decrement the number of pending parents for each child of a newly completed task
+        for child_id in self.task_graph.get_children(task_id):
+            if child_id not in self.__pending_parents:
+                continue
+            self.__pending_parents[child_id] -= 1
+            if self.__pending_parents[child_id] <= 0:
+                self.__pending_parents.pop(child_id)
+                self.__ready_tasks.append(child_id)
+
+    def __launch_ready_tasks(self):
+
+        # Rank ready tasks and tasks still waiting on platform resources by their remaining critical path
+        # Tasks only become ready when a task completes so cached priorities cover every ready task
+        if self.__priorities is None:
+            self.__priorities = self.__compute_priorities()
+
+            # Update priorities of launched workers that are still waiting for platform resources
+            for task_id, task_worker in self.task_workers.iteritems():
+                if task_worker.get_status() == TaskWorker.IDLE and task_id in self.__priorities:
+                    task_worker.set_priority(self.__priorities[task_id])
+        priorities = self.__priorities
+
+        # Launch ready tasks in order of decreasing priority
+        ready_heap = []
+        for task_id in self.__ready_tasks:
+            heapq.heappush(ready_heap, (-priorities.get(task_id, 0), next(self.__ready_counter), task_id))
+        self.__ready_tasks = []
 
-                # Start running tasks that are ready to run but aren't currently
-                if task_worker is None and self.task_graph.parents_complete(task_id) and not task.is_deprecated():
-                    logging.info("Launching task: '%s'" % task_id)
-                    self.task_workers[task_id] = TaskWorker(task, self.datastore, self.platform)
-                    self.task_workers[task_id].start()
+        while len(ready_heap) > 0:
+            neg_priority, _, task_id = heapq.heappop(ready_heap)
+            task = self.task_graph.get_tasks(task_id)
 
-            # Sleeping for 5 seconds before checking again
-            time.sleep(5)
+            # Skip tasks that have been deprecated or finished since becoming ready
+            if task.is_deprecated() or task.is_complete() or task_id in self.task_workers:
+                continue
+
+            logging.info("Launching task: '%s' (priority: %s)" % (task_id, -neg_priority))
+            self.task_workers[task_id] = TaskWorker(task, self.datastore, self.platform,
+                                                    completion_queue=self.completion_queue,
+                                                    priority=-neg_priority,
+                                                    call_cache=self.call_cache)
+            self.task_workers[task_id].start()
+            self.__num_running += 1
+
+    def __compute_priorities(self):
+        # Return priorities of every unfinished task
+        # Priority is length of longest path from task to end of graph, weighted by expected task runtimes
+        # Tasks on the critical path get resources first so that total pipeline runtime is minimized
+        priorities = {}
+        default_runtime = self.__get_default_runtime()
+
+        # Children come after their parents in topological order so a task's children are weighted before the task
+        # Iterating instead of recursing keeps long chains of tasks from hitting the recursion limit
+        for task_id in reversed(self.task_graph.get_topological_order()):
+            task = self.task_graph.get_tasks(task_id)
+            if task.is_deprecated() or task.is_complete():
+                continue
+
+            # Finished and deprecated children have no weight
+            longest_child_path = 0
+            for child_id in self.task_graph.get_children(task_id):
+                longest_child_path = max(longest_child_path, priorities.get(child_id, 0))
+
+            priorities[task_id] = self.__get_expected_runtime(task, default_runtime) + longest_child_path
+        return priorities
+
+    def __get_expected_runtime(self, task, default_runtime):
+        # Return average runtime of finished tasks running the same module class
+        module_class = task.get_module().__class__.__name__
+        if module_class not in self.__runtime_history:
+            return default_runtime
+        total_runtime, num_tasks = self.__runtime_history[module_class]
+        return total_runtime / num_tasks
+
+    def __get_default_runtime(self):
+        # Expected runtime for modules that haven't been run yet is the average across known module classes
+        # Defaults to 1 so that priority falls back to the number of downstream tasks
+        if len(self.__runtime_history) == 0:
+            return 1.0
+        avg_runtimes = [total_runtime / num_tasks for total_runtime, num_tasks in self.__runtime_history.itervalues()]
+        return max(sum(avg_runtimes) / len(avg_runtimes), 1.0)
+
+    def __record_runtime(self, task_worker):
+        # Add runtime of finished task to runtime history of its module class
+        module_class = task_worker.get_task().get_module().__class__.__name__
+        total_runtime, num_tasks = self.__runtime_history.get(module_class, (0.0, 0))
+        self.__runtime_history[module_class] = (total_runtime + task_worker.get_runtime(), num_tasks + 1)
+
+    def __wait_for_completion(self):
+        # Return id of the next task worker to finish. Return None if none finished within timeout.
+        try:
+            return self.completion_queue.get(timeout=self.COMPLETION_POLL_TIMEOUT)
+        except Queue.Empty:
+            return None
 
     def __finalize_task_worker(self, task_worker):
 
@@ -60,6 +207,10 @@ class Scheduler(object):
 
         # Add to list of finalized task workers
         task_worker.set_status(TaskWorker.FINALIZED)
+        self.__num_running -= 1
+
+        # Completion changes remaining paths and expected runtimes so priorities need to be re-computed
+        self.__priorities = None
 
         # Checks for and raises any runtime errors that occurred while running task
         task_worker.finalize()
@@ -71,12 +222,30 @@ class Scheduler(object):
         # Actions on successful task completion
         elif task_worker.is_success():
             logging.info("Task '%s' finished successfully!" % task.get_ID())
-            # Split subgraph if task is a splitter
+            self.__record_runtime(task_worker)
+            completed_tasks = [task] + [self.task_graph.get_tasks(x) for x in task.get_fused_tasks()]
+
+            # Set task to complete if task worker completed successfully
             if task.is_splitter_task():
+                # Split subgraph if task is a splitter
                 self.task_graph.split_graph(task.get_ID())
+                task.set_complete(True)
 
-            # Set task to complete if task worker completed successfully
-            task.set_complete(True)
+                # Graph structure has changed so re-count pending parents from scratch
+                self.__index_pending_tasks()
+            else:
+                # Tasks fused into task were run by the same worker
+                for completed_task in completed_tasks:
+                    completed_task.set_complete(True)
+                    self.__release_children(completed_task.get_ID())
+
+            # Record completed tasks so they don't need to be re-run if pipeline is resumed
+            # Output left on a handed off processor won't exist when pipeline is resumed
+            if self.journal is not None:
+                if task_worker.is_handed_off():
+                    completed_tasks = completed_tasks[:-1]
+                for completed_task in completed_tasks:
+                    self.journal.record_task(completed_task)
 
     def __finalize(self):
 
@@ -87,29 +256,25 @@ class Scheduler(object):
         self.__cancel_unfinished_tasks()
 
         # Wait for all jobs to finish
-        done = False
-        while not done:
-            # Wait for all task workers to finish up cancelling
-            done = True
-            for task_id, task_worker in self.task_workers.iteritems():
-                if not task_worker.get_status() is TaskWorker.FINALIZED:
-                    # Indicate that not all tasks have been finalized
-                    done = False
-
-                # Finalize tasks that have finished running/cancelling
-                if task_worker.get_status() is TaskWorker.COMPLETE:
-                    try:
-                        self.__finalize_task_worker(task_worker)
-
-                    except BaseException, e:
-                        # Log error but don't raise exception as we want to finish finalizing all task workers
-                        if not task_worker.is_cancelled():
-                            logging.error("Task '%s' failed due to runtime error!" % task_id)
-                            if e.message != "":
-                                logging.error("Received the following message:\n%s" % e.message)
-
-            # Wait for a bit before checking again
-            time.sleep(5)
+        while self.__num_running > 0:
+
+            # Wait for the next task worker to finish running/cancelling
+            task_id = self.__wait_for_completion()
+            if task_id is None:
+                continue
+
+            # Finalize tasks that have finished running/cancelling
+            task_worker = self.task_workers[task_id]
+            if task_worker.get_status() is TaskWorker.COMPLETE:
+                try:
+                    self.__finalize_task_worker(task_worker)
+
+                except BaseException, e:
+                    # Log error but don't raise exception as we want to finish finalizing all task workers
+                    if not task_worker.is_cancelled():
+                        logging.error("Task '%s' failed due to runtime error!" % task_id)
+                        if e.message != "":
+                            logging.error("Received the following message:\n%s" % e.message)
 
     def __cancel_unfinished_tasks(self):
         # Cancel any still-running jobs
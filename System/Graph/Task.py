@@ -22,6 +22,12 @@ class Task(object):
         # Submodule name
         self.__submodule_name = kwargs.pop("submodule", None)
 
+        # Whether task's child should run on the same processor so intermediate files stay on its disk
+        self.__co_locate            = kwargs.pop("co_locate", False)
+
+        # Whether task reads input from its parent through named pipes while the parent is still running
+        self.__stream_input         = kwargs.pop("stream_input", False)
+
         # Get the config inputs
         self.__module_args          = kwargs.pop("args", [])
 
@@ -51,6 +57,12 @@ class Task(object):
         # Flag for whether task has been split/replaced and shouldn't be executed
         self.__deprecated = False
 
+        # Downstream tasks fused into task and run along with it as a single command
+        self.__fused_tasks = []
+
+        # Task that current task has been fused into
+        self.__fused_into = None
+
     def split(self, splitter_id, split_id, visible_samples):
         # Produce clone of current task but restrict visible output and sample info available to task
         # Visible output/sample partition defined by upstream splitting task
@@ -58,8 +70,9 @@ class Task(object):
         # Split_id is the name of the partition the newly created task will be able to access
         # visible_samples is list of samples visible to new split
 
-        # Create copy of current task and give new id
-        split_task = copy.deepcopy(self)
+        # Create shallow copy of current task and give new id
+        # Config args, final output keys, docker image, etc. are never modified so they're shared with the original task
+        split_task = copy.copy(self)
         new_id = "%s.%s" % (self.__task_id, split_id)
         split_task.__task_id = new_id
 
@@ -80,8 +93,8 @@ class Task(object):
         # Specify that new split task is the result of a split
         split_task.__is_split = True
 
-        # Give new module id to module
-        split_task.module.set_ID(new_id)
+        # Give split task its own copy of the module
+        split_task.module = self.module.clone(new_id)
 
         # Remove deprecated flag possibly inherited from parent
         split_task.__deprecated = False
@@ -120,6 +133,12 @@ class Task(object):
     def get_docker_image_id(self):
         return self.__docker_image
 
+    def is_co_locatable(self):
+        return self.__co_locate
+
+    def streams_input(self):
+        return self.__stream_input
+
     def set_complete(self, is_complete):
         self.complete = is_complete
 
@@ -147,6 +166,21 @@ class Task(object):
     def get_clones(self):
         return self.__clones
 
+    def fuse(self, task_ids):
+        self.__fused_tasks = task_ids
+
+    def get_fused_tasks(self):
+        return self.__fused_tasks
+
+    def set_fused_into(self, task_id):
+        self.__fused_into = task_id
+
+    def get_fused_into(self):
+        return self.__fused_into
+
+    def is_fused(self):
+        return self.__fused_into is not None
+
     def __load_module(self, module_name, is_docker, submodule=None):
 
         # Try importing the module
@@ -229,6 +263,9 @@ class Task(object):
 
         to_ret += "\tdeprecated\t= %s\n" % self.__deprecated
 
+        if len(self.__fused_tasks) > 0:
+            to_ret += "\tfused_tasks\t= %s\n" % ",".join(self.__fused_tasks)
+
         if len(self.__module_args) > 0:
             to_ret += "\t[[args]]\n"
             for key in self.__module_args:
@@ -1,7 +1,7 @@
 import threading
-import time
 import math
 import logging
+import time
 
 from System.Workers.Thread import Thread
 from ModuleExecutor import ModuleExecutor
@@ -16,7 +16,7 @@ class TaskWorker(Thread):
     CANCELLING      = 5
     FINALIZED       = 6
 
-    def __init__(self, task, datastore, platform):
+    def __init__(self, task, datastore, platform, completion_queue=None, priority=0, call_cache=None):
         # Class for executing task
 
         # Initialize new thread
@@ -52,6 +52,33 @@ class TaskWorker(Thread):
         # Command that was run to carry out task
         self.cmd = None
 
+        # Queue where task id is posted once worker has finished (used by scheduler to avoid polling)
+        self.completion_queue = completion_queue
+
+        # Scheduling priority. Higher priority tasks get platform resources first.
+        self.priority = priority
+
+        # Cache of task outputs from previous runs
+        self.call_cache = call_cache
+
+        # Whether task output was taken from the call cache instead of running the task
+        self.__cache_hit = False
+
+        # Runtime and cost accrued by processor before it was handed to task (non-zero for reused processors)
+        self.__proc_start_time      = None
+        self.__proc_runtime_offset  = 0
+        self.__proc_cost_offset     = 0
+
+        # Runtime and cost of task frozen when processor is returned to platform for reuse
+        self.__final_runtime        = None
+        self.__final_cost           = None
+
+        # Whether processor was handed off to task's child along with the outputs left on its disk
+        self.__handed_off           = False
+
+        # Output files of fused tasks that were streamed through named pipes and never written to disk
+        self.__streamed_outputs     = []
+
     def set_status(self, new_status):
         # Updates instance status with threading.lock() to prevent race conditions
         with self.status_lock:
@@ -66,61 +93,116 @@ class TaskWorker(Thread):
     def get_task(self):
         return self.task
 
+    def set_priority(self, priority):
+        with self.status_lock:
+            self.priority = priority
+        # Re-rank task's request if it's waiting for platform resources
+        self.platform.update_request_priority(self.task.get_ID(), priority)
+
+    def get_priority(self):
+        with self.status_lock:
+            return self.priority
+
     def get_runtime(self):
         if self.proc is None:
             return 0
+        elif self.__final_runtime is not None:
+            return self.__final_runtime
         else:
-            return self.proc.get_runtime()
+            return self.proc.get_runtime() - self.__proc_runtime_offset
 
     def get_cost(self):
         if self.proc is None:
             return 0
+        elif self.__final_cost is not None:
+            return self.__final_cost
         else:
-            return self.proc.compute_cost()
+            return self.proc.compute_cost() - self.__proc_cost_offset
 
     def get_start_time(self):
         if self.proc is None:
             return None
+        elif self.__proc_start_time is not None:
+            return self.__proc_start_time
         else:
             return self.proc.get_start_time()
 
     def get_cmd(self):
         return self.cmd
 
+    def is_cache_hit(self):
+        return self.__cache_hit
+
+    def is_handed_off(self):
+        return self.__handed_off
+
     def work(self):
         # Run task module command and save outputs
         try:
-            # Set the input arguments that will be passed to the task module
-            self.datastore.set_task_input_args(self.task.get_ID())
+            # Tasks run by worker. Tasks fused into the task are run along with it as a single command.
+            tasks = [self.task] + [self.datastore.graph.get_tasks(x) for x in self.task.get_fused_tasks()]
 
-            # Compute task resource requirements
-            cpus    = self.module.get_argument("nr_cpus")
-            mem     = self.module.get_argument("mem")
+            # Define unique workspace for task input/output
+            task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
+            logging.debug("(%s) Task workspace:\n%s" % (self.task.get_ID(), task_workspace.debug_string()))
+
+            # Set the input arguments that will be passed to the task modules and compute resource requirements
+            input_files, cpus, mem = self.__set_task_inputs(tasks, task_workspace)
 
             # Compute disk space requirements
             docker_image    = None
-            input_files     = self.datastore.get_task_input_files(self.task.get_ID())
             if self.task.get_docker_image_id() is not None:
                 docker_image    = self.datastore.get_docker_image(docker_id=self.task.get_docker_image_id())
             disk_space      = self.__compute_disk_requirements(input_files, docker_image)
             logging.debug("(%s) CPU: %s, Mem: %s, Disk space: %s" % (self.task.get_ID(), cpus, mem, disk_space))
 
-            # Wait for platform to have enough resources to run task
-            while not self.platform.can_make_processor(cpus, mem, disk_space) and not self.is_cancelled():
-                time.sleep(5)
+            # Re-use output of an identical task from a previous run if one exists
+            # Fused tasks aren't cached as their output is produced by several modules
+            cache_key = None
+            if self.call_cache is not None and len(tasks) == 1:
+                cache_key = self.call_cache.get_key(self.task, docker_image)
+                cached_output = self.call_cache.lookup(cache_key, self.task.get_ID())
+                if cached_output is not None:
+                    logging.info("(%s) Found output in call cache. Skipping task!" % self.task.get_ID())
+                    self.call_cache.copy_output(cached_output, task_workspace, self.task.get_final_output_keys(),
+                                                self.task.get_ID())
+                    self.module.restore_output(cached_output)
+                    self.__cache_hit = True
+                    self.platform.release_handoff(self.task.get_ID())
+                    with self.status_lock:
+                        self.__err = False
+                    return
+
+            # Run task on processor handed off by parent task if it's big enough and task has a command to run
+            handoff = None
+            if self.platform.has_handoff(self.task.get_ID()):
+                if self.__has_command(tasks):
+                    handoff = self.platform.claim_handoff(self.task.get_ID(), cpus, mem, disk_space)
+                if handoff is None:
+                    # Parent output needs to be saved to the workspace before task can load it from another processor
+                    self.platform.release_handoff(self.task.get_ID())
+                    input_files, cpus, mem = self.__set_task_inputs(tasks, task_workspace)
+
+            # Don't queue for resources if pipeline was cancelled while task was being set up
+            self.__check_cancelled()
+
+            # Wait for platform to reserve enough resources to run task
+            docker_image_name = None if docker_image is None else docker_image.get_image_name()
+            reserved = self.platform.request_resources(self.task.get_ID(), cpus, mem, disk_space,
+                                                       priority=self.get_priority(),
+                                                       docker_image=docker_image_name,
+                                                       parent_ids=self.datastore.graph.get_parents(self.task.get_ID()))
 
             # Quit if pipeline is cancelled
             self.__check_cancelled()
 
-            # Define unique workspace for task input/output
-            task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
-            logging.debug("(%s) Task workspace:\n%s" % (self.task.get_ID(), task_workspace.debug_string()))
-
-            # Specify that module output files should be placed in task's working directory
-            self.module.set_output_dir(task_workspace.get_wrk_dir())
+            # Quit if platform stopped admitting tasks
+            if not reserved:
+                logging.error("(%s) Platform locked before resources could be reserved for task!" % self.task.get_ID())
+                raise RuntimeError("Platform locked before task could be run!")
 
             # Run command on processor if there's one to run
-            if self.module.get_command() is not None:
+            if self.__has_command(tasks):
 
                 # Execute command if one exists
                 self.set_status(self.LOADING)
@@ -129,6 +211,12 @@ class TaskWorker(Thread):
                 self.proc = self.platform.get_processor(self.task.get_ID(), cpus, mem, disk_space)
                 logging.debug("(%s) Successfully acquired processor!" % self.task.get_ID())
 
+                # Don't charge task for time reused processor spent running earlier tasks
+                if self.proc.get_start_time() is not None:
+                    self.__proc_start_time      = time.time()
+                    self.__proc_runtime_offset  = self.proc.get_runtime()
+                    self.__proc_cost_offset     = self.proc.compute_cost()
+
                 # Check to see if pipeline has been cancelled
                 self.__check_cancelled()
 
@@ -141,28 +229,90 @@ class TaskWorker(Thread):
                 self.__check_cancelled()
 
                 # Load task inputs onto module executor
-                self.module_executor.load_input(input_files)
+                # Parent task's output is linked so it can still be saved if task fails before it's done loading
+                self.module_executor.load_input(input_files, local_dir=None if handoff is None else handoff.wrk_dir)
+
+                # Processor has been created so the resources it actually has are known
+                self.platform.update_reservation(self.task.get_ID())
+
+                # Parent task's working directory is no longer needed once its output has been loaded and saved
+                if handoff is not None:
+                    self.module_executor.wait_transfers(handoff.transfers)
+                    self.platform.complete_handoff(self.task.get_ID())
+                    self.module_executor.remove_workspace(handoff.wrk_dir)
 
                 # Check to see if pipeline has been cancelled
                 self.__check_cancelled()
 
                 # Update module's command to reflect changes to input paths
+                # Only the last task of a fused chain gets the command output
                 self.set_status(self.RUNNING)
-                self.cmd = self.module.update_command()
-                out, err = self.module_executor.run(self.cmd)
+                self.cmd = self.__update_command(tasks)
+                tail_module = tasks[-1].get_module()
+                output_parser = tail_module if tail_module.stream_cmd_output else None
+                read_output = output_parser is None and tail_module.parses_cmd_output()
+                out, err = self.module_executor.run(self.cmd, output_parser=output_parser, read_output=read_output)
 
                 # Check to see if pipeline has been cancelled
                 self.__check_cancelled()
 
                 # Post-process command output if necessary
-                self.module.process_cmd_output(out, err)
+                tail_module.process_cmd_output(out, err)
 
-                # Save output files in workspace output dirs (if any)
+                # Save output of fused tasks in their own workspace output dirs
+                # Output of all tasks is uploaded in the background at the same time
                 self.set_status(self.FINALIZING)
-                output_files        = self.datastore.get_task_output_files(self.task.get_ID())
-                final_output_types  = self.task.get_final_output_keys()
+                transfers = []
+                for task in tasks[:-1]:
+                    output_files = [x for x in self.datastore.get_task_output_files(task.get_ID())
+                                    if x not in self.__streamed_outputs]
+                    if len(output_files) > 0:
+                        transfers.extend(self.module_executor.save_output(output_files, task.get_final_output_keys(),
+                                                                          workspace=self.datastore.get_task_workspace(task.get_ID()),
+                                                                          mark_durable=False, wait=False))
+
+                # Save output files in workspace output dirs (if any)
+                output_files        = self.datastore.get_task_output_files(tasks[-1].get_ID())
+                final_output_types  = tasks[-1].get_final_output_keys()
+
+                # Leave intermediate output on processor if it can be handed off to the only task that needs it
+                handoff_child       = self.__get_handoff_child(tasks[-1])
+                local_outputs       = []
+                if handoff_child is not None:
+                    local_outputs   = [x for x in output_files if x.get_type() not in final_output_types]
                 if len(output_files) > 0:
-                    self.module_executor.save_output(output_files, final_output_types)
+                    transfers.extend(self.module_executor.save_output(output_files, final_output_types,
+                                                                      local_outputs=local_outputs,
+                                                                      workspace=self.datastore.get_task_workspace(tasks[-1].get_ID()),
+                                                                      wait=False))
+
+                # Hand processor off to child task. Output is only saved to the workspace if child can't use it.
+                # Uploads keep running while child loads its input and are waited on by child
+                if len(local_outputs) > 0 and not self.__cancelled:
+                    persist = lambda: self.module_executor.persist_output(local_outputs)
+                    self.__handed_off = self.platform.hand_off_processor(self.task.get_ID(), handoff_child, persist,
+                                                                         transfers=transfers)
+                    if not self.__handed_off:
+                        persist()
+
+                # Wait for output to be saved unless it's the child's job
+                # Output kept on processor has been persisted if it wasn't handed off so all output is now saved
+                if not self.__handed_off:
+                    self.module_executor.wait_transfers(transfers)
+                    self.module_executor.mark_durable()
+
+                # Cache output so identical tasks in later runs don't need to be re-run
+                # Output that only exists on the processor can't be re-used by later runs
+                if cache_key is not None and not self.__cancelled and len(local_outputs) == 0:
+                    try:
+                        self.call_cache.store(cache_key, self.task)
+                    except BaseException, e:
+                        logging.warning("(%s) Unable to save task output to call cache!" % self.task.get_ID())
+                        if e.message != "":
+                            logging.warning("Received following error:\n%s" % e.message)
+
+            # Give up processor handed off by parent if task didn't claim it
+            self.platform.release_handoff(self.task.get_ID())
 
             # Indicate that task finished without any errors
             if not self.__cancelled:
@@ -180,11 +330,23 @@ class TaskWorker(Thread):
                 logging.error("Task '%s' failed!" % self.task.get_ID())
                 raise
         finally:
-            # Return logs and destroy processor if they exist
+            # Give up processor handed off by parent if task didn't claim it or didn't load parent's output
+            # Parent's output needs to be saved before task's processor is destroyed
             logging.debug("TaskWorker '%s' cleaning up..." % self.task.get_ID())
+            try:
+                self.platform.release_handoff(self.task.get_ID())
+            except BaseException, e:
+                logging.error("Unable to release processor handed off to task '%s'!" % self.task.get_ID())
+                if e.message != "":
+                    logging.error("Received following error:\n%s" % e.message)
+            # Return logs and destroy processor if they exist
             self.__clean_up()
+            # Return reserved resources to the platform
+            self.platform.release_resources(self.task.get_ID())
             # Notify that task worker has completed regardless of success
             self.set_status(TaskWorker.COMPLETE)
+            if self.completion_queue is not None:
+                self.completion_queue.put(self.task.get_ID())
 
     def cancel(self):
         # Cancel pipeline during runtime
@@ -198,6 +360,9 @@ class TaskWorker(Thread):
         self.set_status(self.CANCELLING)
         self.__cancelled = True
 
+        # Stop waiting for platform resources
+        self.platform.withdraw_request(self.task.get_ID())
+
         if self.proc is not None:
             # Prevent further commands from being run on processor
             self.proc.stop()
@@ -225,6 +390,26 @@ class TaskWorker(Thread):
             if e.message != "":
                 logging.error("Received following error:\n%s" % e.message)
 
+        # Processor now belongs to child task so freeze task runtime and cost
+        if self.__handed_off:
+            self.__final_runtime    = self.get_runtime()
+            self.__final_cost       = self.get_cost()
+            return
+
+        # Return processor to platform so later tasks can reuse it
+        if not self.__err and not self.__cancelled:
+            try:
+                runtime, cost = self.get_runtime(), self.get_cost()
+                if self.platform.recycle_processor(self.task.get_ID()):
+                    # Processor will keep running other tasks so freeze task runtime and cost
+                    self.__final_runtime    = runtime
+                    self.__final_cost       = cost
+                    return
+            except BaseException, e:
+                logging.warning("Unable to return processor '%s' to platform for reuse!" % self.proc.get_name())
+                if e.message != "":
+                    logging.warning("Received following error:\n%s" % e.message)
+
         # Try to destroy platform if it's not off
         try:
             # Destroy processor if it hasn't already been destroyed
@@ -237,6 +422,97 @@ class TaskWorker(Thread):
             if e.message != "":
                 logging.error("Received following error:\n%s" % e.message)
 
+    @staticmethod
+    def __has_command(tasks):
+        # Return True if any of the tasks has a command to run
+        return len([task for task in tasks if task.get_module().update_command() is not None]) > 0
+
+    def __set_task_inputs(self, tasks, task_workspace):
+        # Set input args of task modules. Return input files that need to be loaded and cpus/mem needed to run tasks.
+        # Fused tasks get input produced by the task before them straight from the shared working directory
+        input_files     = []
+        fused_outputs   = set()
+        cpus, mem       = 0, 0
+        for task in tasks:
+            self.datastore.set_task_input_args(task.get_ID())
+            module  = task.get_module()
+            cpus    = max(cpus, module.get_argument("nr_cpus"))
+            mem     = max(mem, module.get_argument("mem"))
+            input_files.extend([x for x in self.datastore.get_task_input_files(task.get_ID())
+                                if x.get_file_id() not in fused_outputs])
+
+            # Specify that module output files should be placed in task's working directory
+            module.set_output_dir(task_workspace.get_wrk_dir())
+
+            # Define output so it can be passed to the next task in the chain
+            if task is not tasks[-1]:
+                module.update_command()
+                fused_outputs.update([x.get_file_id() for x in self.datastore.get_task_output_files(task.get_ID())])
+
+        return input_files, cpus, mem
+
+    def __update_command(self, tasks):
+        # Re-generate module commands to reflect changes to input paths
+        # Fused commands are run one after the other. Output of all but the last command is sent to stderr.
+        # Tasks streaming input from the task before them run at the same time and read its output from named pipes
+        cmds = [task.get_module().update_command() for task in tasks]
+        if len(cmds) == 1:
+            return cmds[0]
+
+        # Group commands into stages of commands connected by named pipes
+        stages = []
+        for i, task in enumerate(tasks):
+            if cmds[i] is None:
+                continue
+            cmd = "( %s )" % cmds[i] if i == len(tasks) - 1 else "( %s ) >&2" % cmds[i]
+            fifos = [] if i == 0 or cmds[i-1] is None else self.__get_streamed_outputs(tasks[i-1], task)
+            if len(fifos) > 0:
+                stages[-1][0].append(cmd)
+                stages[-1][1].extend([fifo.get_path() for fifo in fifos])
+                self.__streamed_outputs.extend(fifos)
+            else:
+                stages.append(([cmd], []))
+
+        return " && ".join([self.__get_stage_command(stage_cmds, fifo_paths) for stage_cmds, fifo_paths in stages])
+
+    def __get_streamed_outputs(self, parent, task):
+        # Return parent output files read by task through named pipes
+        # Final output needs to be saved so it's always written to disk
+        if not task.streams_input():
+            return []
+        return [x for x in self.datastore.get_task_output_files(parent.get_ID())
+                if x.get_type() not in parent.get_final_output_keys() and x.get_type() in task.get_input_keys()]
+
+    @staticmethod
+    def __get_stage_command(cmds, fifo_paths):
+        # Return command running commands at the same time and returning a non-zero exit status if any of them fail
+        if len(cmds) == 1:
+            return cmds[0]
+
+        # Opening a named pipe for reading and writing never blocks
+        # Failed commands open and close every pipe so the other commands aren't left waiting for them forever
+        fifos   = " ".join(fifo_paths)
+        release = " ; ".join([": 1<>%s" % fifo_path for fifo_path in fifo_paths])
+        stage   = ["rm -f %s && mkfifo %s && {" % (fifos, fifos)]
+        for i, cmd in enumerate(cmds[:-1]):
+            stage.append("%s || { %s ; exit 1 ; } & PID_%d=$! ;" % (cmd, release, i))
+        stage.append("%s || { %s ; false ; } ; RC=$? ;" % (cmds[-1], release))
+        stage.append(" && ".join(["wait $PID_%d" % i for i in xrange(len(cmds) - 1)] + ["exit $RC ; }"]))
+        return "( %s )" % " ".join(stage)
+
+    def __get_handoff_child(self, tail):
+        # Return id of child task that can take over processor once task finishes. Return None if there isn't one.
+        # Processor is handed off by the last task run on it
+        task_id = tail.get_ID()
+        if tail.is_splitter_task() or not self.platform.can_hand_off(self.task.get_ID(), tail.is_co_locatable()):
+            return None
+
+        # Output can only be kept on processor if a single task needs it and that task needs nothing else
+        children = self.datastore.graph.get_children(task_id)
+        if len(children) != 1 or len(self.datastore.graph.get_parents(children[0])) != 1:
+            return None
+        return children[0]
+
     def __compute_disk_requirements(self, input_files, docker_image, input_multiplier=2):
         # Compute size of disk needed to store input/output files
         input_size = 0
@@ -58,3 +58,22 @@ class DockerHelper(object):
             if e.message != "":
                 logging.error("Received the following msg:\n%s" % e.message)
             raise
+
+    def get_image_digest(self, image_name, job_name=None, **kwargs):
+        # Return content-addressed id of docker image
+        cmd = "sudo docker image inspect %s --format='{{.Id}}'" % image_name
+
+        # Run command and return job name
+        job_name = "get_digest_%s" % image_name if job_name is None else job_name
+        self.proc.run(job_name, cmd, **kwargs)
+
+        # Wait for cmd to finish and get output
+        try:
+            out, err = self.proc.wait_process(job_name)
+            return out.strip()
+
+        except BaseException, e:
+            logging.error("Unable to check docker image digest: %s" % image_name)
+            if e.message != "":
+                logging.error("Received the following msg:\n%s" % e.message)
+            raise
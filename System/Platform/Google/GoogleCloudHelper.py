@@ -130,6 +130,13 @@ class GoogleCloudHelper:
         # Return instance status
         return msg_json["status"]
 
+    @staticmethod
+    def get_restart_cmd(name, zone):
+        # Return command that starts a stopped instance again
+        # READY flag is cleared first so the startup script has to finish again before instance is used
+        return "gcloud compute instances remove-metadata %s --keys READY --zone %s && " \
+               "gcloud compute instances start %s --zone %s" % (name, zone, name, zone)
+
     @staticmethod
     def send_pubsub_message(topic, message=None, attributes=None, encode=True):
         # Send a message to an existing Google cloud Pub/Sub topic
@@ -393,6 +400,22 @@ class GoogleCloudHelper:
         out = GoogleCloudHelper.run_cmd(cmd, err_msg="Unable to describe instance '%s'!" % ins_name)
         return json.loads(out)
 
+    @staticmethod
+    def get_external_ip(instance_data):
+        # Return external IP of instance from its description. Return None if instance has no external IP.
+        for network_interface in instance_data.get("networkInterfaces", []):
+            for access_config in network_interface.get("accessConfigs", []):
+                if "natIP" in access_config:
+                    return access_config["natIP"]
+        return None
+
+    @staticmethod
+    def list_instances():
+        # Return descriptions of all instances in the current project with a single gcloud call
+        cmd = "gcloud compute instances list --format=json"
+        out = GoogleCloudHelper.run_cmd(cmd, err_msg="Unable to list instances in the current project!")
+        return json.loads(out)
+
     @staticmethod
     def instance_exists(ins_name):
         # Check if the current instance still exists on the platform
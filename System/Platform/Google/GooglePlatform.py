@@ -7,6 +7,7 @@ from System.Platform import Platform, Processor
 from Instance import Instance
 from PreemptibleInstance import PreemptibleInstance
 from GoogleCloudHelper import GoogleCloudHelper
+from InstanceStatusCache import InstanceStatusCache
 
 class GooglePlatform(Platform):
 
@@ -34,6 +35,9 @@ class GooglePlatform(Platform):
         # Boolean for whether worker instance create by platform will be preemptible
         self.is_preemptible = self.config["task_processor"]["is_preemptible"]
 
+        # Status of all platform instances is refreshed with a single batched call
+        self.status_cache   = InstanceStatusCache(refresh_interval=self.config["status_refresh_interval"])
+
         # Use authentication key file to gain access to google cloud project using Oauth2 authentication
         GoogleCloudHelper.authenticate(self.key_file)
 
@@ -158,6 +162,7 @@ class GooglePlatform(Platform):
         # Add platform-specific options
         params["zone"]                  = self.zone
         params["service_acct"]          = self.service_acct
+        params["status_cache"]          = self.status_cache
 
         # Randomize the zone within the region if specified
         if self.randomize_zone:
@@ -5,6 +5,9 @@ import math
 
 from System.Platform import Process
 from System.Platform import Processor
+from System.Platform import TransferManager
+from System.Platform import TransferQueue
+from System.Platform import SSHConnection
 from System.Platform.Google import GoogleCloudHelper
 
 class Instance(Processor):
@@ -22,6 +25,13 @@ class Instance(Processor):
         self.is_boot_disk_ssd   = kwargs.pop("is_boot_disk_ssd",    False)
         self.nr_local_ssd       = kwargs.pop("nr_local_ssd",        0)
 
+        # Run commands over a persistent SSH connection instead of a new gcloud ssh call per command
+        self.ssh_multiplexing   = kwargs.pop("ssh_multiplexing",    True)
+        self.ssh_key_file       = kwargs.pop("ssh_key_file",        "~/.ssh/google_compute_engine")
+
+        # Platform-wide cache of instance statuses. Status is polled directly from gcloud if not provided.
+        self.status_cache       = kwargs.pop("status_cache",        None)
+
         # Initialize the region of the instance
         self.region             = GoogleCloudHelper.get_region(self.zone)
 
@@ -41,6 +51,9 @@ class Instance(Processor):
         # Flag for whether startup script has completed running
         self.__startup_script_complete = False
 
+        # Multiplexed SSH connection to instance. Opened once instance is ready to run commands.
+        self.ssh_connection = None
+
     def get_status(self):
         with self.status_lock:
             self.status = self.__sync_status()
@@ -48,6 +61,11 @@ class Instance(Processor):
             return self.status
 
     def adapt_cmd(self, cmd):
+        # Run command over instance's SSH connection if one is open
+        ssh_connection = self.ssh_connection
+        if ssh_connection is not None:
+            return ssh_connection.adapt_cmd(cmd)
+
         # Adapt command for running on instance through gcloud ssh
         cmd = cmd.replace("'", "'\"'\"'")
         cmd = "gcloud compute ssh gap@%s --command '%s' --zone %s" % (self.name, cmd, self.zone)
@@ -96,6 +114,9 @@ class Instance(Processor):
                                            num_retries=self.default_num_cmd_retries)
         self.wait_process("create")
 
+        # Cached status won't know about the new instance yet
+        self.invalidate_status()
+
         # Wait for startup script to completely finish
         logging.debug("(%s) Waiting for instance startup-script completion..." % self.name)
         self.wait_until_ready()
@@ -107,6 +128,13 @@ class Instance(Processor):
         if self.get_status() == Processor.OFF:
             return
 
+        # Files staged on the processor are removed along with it
+        TransferManager.forget_host(self.name)
+        TransferQueue.remove_queue(self)
+
+        # Close SSH connection as instance will no longer accept commands
+        self.close_ssh_connection()
+
         # Set status to indicate that instance cannot run commands and is destroying
         logging.info("(%s) Process 'destroy' started!" % self.name)
         cmd = self.__get_gcloud_destroy_cmd()
@@ -155,6 +183,8 @@ class Instance(Processor):
         elif proc_name == "destroy":
             # Set the stop time
             self.set_stop_time()
+            # Cached status won't know that instance has been deleted
+            self.invalidate_status()
 
         # Case: Process completed
         if proc_obj.do_log_success():
@@ -167,6 +197,9 @@ class Instance(Processor):
         # Determine if command can be retried
         can_retry = False
 
+        # Make sure decision is based on up-to-date instance status
+        self.invalidate_status()
+
         # Raise error if processor is locked
         if self.is_locked() and proc_name != "destroy":
             self.raise_error(proc_name, proc_obj)
@@ -202,7 +235,8 @@ class Instance(Processor):
                      cmd=proc_obj.get_command(),
                      num_retries=proc_obj.get_num_retries() - 1,
                      docker_image=proc_obj.get_docker_image(),
-                     quiet_failure=proc_obj.is_quiet())
+                     quiet_failure=proc_obj.is_quiet(),
+                     output_parser=proc_obj.get_output_parser())
 
         # Raise error if no restarts left
         self.raise_error(proc_name, proc_obj)
@@ -244,6 +278,44 @@ class Instance(Processor):
         # Configure CRCMOD for fast file transfer
         self.__configure_CRCMOD()
 
+        # Open connection used to run all further commands
+        self.open_ssh_connection()
+
+    def open_ssh_connection(self):
+        # Open multiplexed SSH connection to instance's external IP
+        # Commands continue to be run through gcloud ssh if connection can't be opened
+        if not self.ssh_multiplexing:
+            return
+
+        self.close_ssh_connection()
+        try:
+            ip_address = GoogleCloudHelper.get_external_ip(GoogleCloudHelper.describe(self.name, self.zone))
+        except (RuntimeError, ValueError):
+            ip_address = None
+
+        if ip_address is None:
+            logging.warning("(%s) Unable to determine external IP! Commands will be run through gcloud ssh." % self.name)
+            return
+
+        ssh_connection = SSHConnection(self.name, ip_address, "gap", key_file=self.ssh_key_file)
+        if ssh_connection.open():
+            self.ssh_connection = ssh_connection
+            logging.info("(%s) Running commands over SSH connection to %s." % (self.name, ip_address))
+        else:
+            logging.warning("(%s) Unable to open SSH connection! Commands will be run through gcloud ssh." % self.name)
+
+    def close_ssh_connection(self):
+        # Close SSH connection so new commands are run through gcloud ssh
+        ssh_connection = self.ssh_connection
+        self.ssh_connection = None
+        if ssh_connection is not None:
+            ssh_connection.close()
+
+    def invalidate_status(self):
+        # Force the next status check to fetch the current status from Google Cloud
+        if self.status_cache is not None:
+            self.status_cache.invalidate(self.name)
+
     def raise_error(self, proc_name, proc_obj):
         # Log failure to debug logger if quiet failure
         stdout_msg, stderr_msg = proc_obj.get_output()
@@ -279,12 +351,29 @@ class Instance(Processor):
 
     def __poll_status(self):
 
+        # Get instance status from platform-wide status cache if available
+        if self.status_cache is not None:
+            return self.__poll_cached_status()
+
         if not GoogleCloudHelper.instance_exists(self.name):
             self.__startup_script_complete = False
             return Processor.OFF
 
         # Try to get instance status
         status = GoogleCloudHelper.get_instance_status(self.name, self.zone)
+        return self.__parse_status(status, self.__poll_startup_script)
+
+    def __poll_cached_status(self):
+        # Get status and metadata from the most recent batched instance listing
+        data = self.status_cache.get_instance(self.name)
+        if data is None:
+            self.__startup_script_complete = False
+            return Processor.OFF
+
+        return self.__parse_status(data["status"], lambda: self.__is_startup_script_complete(data))
+
+    def __parse_status(self, status, startup_script_checker):
+        # Convert Google instance status to processor status
         if status in ["TERMINATED", "STOPPING"]:
             self.__startup_script_complete = False
             return Processor.DESTROYING
@@ -294,7 +383,7 @@ class Instance(Processor):
             return Processor.CREATING
 
         elif status == "RUNNING":
-            if self.__startup_script_complete or self.__poll_startup_script():
+            if self.__startup_script_complete or startup_script_checker():
                 self.__startup_script_complete = True
                 return Processor.AVAILABLE
             self.__startup_script_complete = False
@@ -303,8 +392,12 @@ class Instance(Processor):
     def __poll_startup_script(self):
         # Return true if instance is currently available for running commands
         data = GoogleCloudHelper.describe(self.name, self.zone)
+        return self.__is_startup_script_complete(data)
+
+    @staticmethod
+    def __is_startup_script_complete(data):
         # Check to see if "READY" has been added to instance metadata indicating startup-script has complete
-        for item in data["metadata"]["items"]:
+        for item in data.get("metadata", {}).get("items", []):
             if item["key"] == "READY":
                 return True
         return False
@@ -345,12 +438,12 @@ class Instance(Processor):
 
     def __configure_SSH(self, max_connections=500, log=False):
 
-        # Increase the number of concurrent SSH connections
+        # Increase the number of concurrent SSH connections and sessions per multiplexed connection
         logging.info("(%s) Increasing the number of maximum concurrent SSH connections to %s." % (self.name, max_connections))
         if log:
-            cmd = "sudo bash -c 'echo \"MaxStartups %s\" >> /etc/ssh/sshd_config' !LOG2! " % max_connections
+            cmd = "sudo bash -c 'echo -e \"MaxStartups %s\\nMaxSessions %s\" >> /etc/ssh/sshd_config' !LOG2! " % (max_connections, max_connections)
         else:
-            cmd = "sudo bash -c 'echo \"MaxStartups %s\" >> /etc/ssh/sshd_config' " % max_connections
+            cmd = "sudo bash -c 'echo -e \"MaxStartups %s\\nMaxSessions %s\" >> /etc/ssh/sshd_config' " % (max_connections, max_connections)
         self.run("configureSSH", cmd)
         self.wait_process("configureSSH")
 
@@ -0,0 +1,17 @@
+from System.Platform import StatusCache
+from GoogleCloudHelper import GoogleCloudHelper
+
+class InstanceStatusCache(StatusCache):
+    # Platform-wide cache of instance descriptions shared by all instances on a platform
+    # Refreshed with a single batched 'gcloud compute instances list' call so that status checks
+    # are served from memory instead of launching two gcloud processes per instance per check
+    def __init__(self, refresh_interval=10):
+        super(InstanceStatusCache, self).__init__(refresh_interval)
+
+    def get_instance(self, name):
+        # Return description of an instance or None if the instance doesn't exist
+        return self.get_entry(name)
+
+    def fetch_entries(self):
+        instances = GoogleCloudHelper.list_instances()
+        return dict([(instance["name"], instance) for instance in instances])
@@ -4,6 +4,8 @@ import time
 
 from System.Platform import Process
 from System.Platform import Processor
+from System.Platform import TransferManager
+from System.Platform.Google import GoogleCloudHelper
 from Instance import Instance
 
 class PreemptibleInstance(Instance):
@@ -44,8 +46,15 @@ class PreemptibleInstance(Instance):
         prev_price = self.price
         prev_start = self.start_time
 
-        # Destroying the instance
-        self.destroy()
+        # Files staged by earlier tasks may not survive the reset so they're transferred again instead of linked
+        TransferManager.forget_host(self.name)
+
+        # Restart preempted instance so its disk and the stages of work checkpointed on it survive the reset
+        # Instance is re-created from scratch if it no longer exists or can't be restarted
+        restarted = self.is_preemptible and self.__restart()
+        if not restarted:
+            # Destroying the instance
+            self.destroy()
 
         # Add record to cost history of last run
         self.cost_history.append((prev_price, prev_start, self.stop_time))
@@ -59,14 +68,27 @@ class PreemptibleInstance(Instance):
             if proc in self.processes:
                 self.processes.pop(proc)
 
+        # Recreating the instance
+        if restarted:
+            self.invalidate_status()
+            self.wait_until_ready()
+        else:
+            self.create()
+
+        # Processes whose results are stored off the instance or were checkpointed on the surviving disk aren't re-run
+        skipped = set(self.durable_processes)
+        if restarted:
+            for marker_path in self.__find_markers(self.checkpoints.keys()):
+                skipped.update(self.checkpoints[marker_path])
+
         # Identifying which process(es) need to be recalled
         commands_to_run = list()
-        while len(self.processes):
-            process_tuple = self.processes.popitem(last=False)
-            commands_to_run.append((process_tuple[0], process_tuple[1]))
-
-        # Recreating the instance
-        self.create()
+        for proc_name, proc_obj in self.processes.items():
+            if proc_name in skipped and proc_obj.is_complete():
+                logging.debug("(%s) Skipping process '%s' after reset. Results already saved." % (self.name, proc_name))
+                continue
+            self.processes.pop(proc_name)
+            commands_to_run.append((proc_name, proc_obj))
 
         # Rerunning all the commands
         if len(commands_to_run):
@@ -76,7 +98,8 @@ class PreemptibleInstance(Instance):
                          cmd=proc_obj.get_command(),
                          num_retries=proc_obj.get_num_retries(),
                          docker_image=proc_obj.get_docker_image(),
-                         quiet_failure=proc_obj.is_quiet())
+                         quiet_failure=proc_obj.is_quiet(),
+                         output_parser=proc_obj.get_output_parser())
                 self.wait_process(proc_name)
 
     def get_runtime(self):
@@ -121,6 +144,9 @@ class PreemptibleInstance(Instance):
         can_retry   = False
         needs_reset = False
 
+        # Make sure decision is based on up-to-date instance status
+        self.invalidate_status()
+
         logging.warning("(%s) Handling failure for proc '%s'. Curr status: %s" % (self.name, proc_name, self.get_status()))
         logging.debug("(%s) Error code: %s" % (self.name, proc_obj.returncode))
         
@@ -188,12 +214,61 @@ class PreemptibleInstance(Instance):
                      cmd=proc_obj.get_command(),
                      num_retries=proc_obj.get_num_retries() - 1,
                      docker_image=proc_obj.get_docker_image(),
-                     quiet_failure=proc_obj.is_quiet())
+                     quiet_failure=proc_obj.is_quiet(),
+                     output_parser=proc_obj.get_output_parser())
 
         # Raise error if command failed, has no retries, and wasn't caused by preemption
         else:
             self.raise_error(proc_name, proc_obj)
 
+    def __restart(self):
+        # Start preempted instance again with the same disk. Return True if instance was restarted.
+        # Preempted instances are stopped (TERMINATED) rather than deleted so their disk is still there.
+        self.close_ssh_connection()
+        try:
+            if not GoogleCloudHelper.instance_exists(self.name):
+                return False
+
+            for _ in xrange(60):
+                status = GoogleCloudHelper.get_instance_status(self.name, self.zone)
+                if status != "STOPPING":
+                    break
+                time.sleep(10)
+            if status != "TERMINATED":
+                return False
+
+            self.set_stop_time()
+            logging.info("(%s) Restarting preempted instance!" % self.name)
+            cmd = GoogleCloudHelper.get_restart_cmd(self.name, self.zone)
+            proc = sp.Popen(cmd, stdout=sp.PIPE, stderr=sp.PIPE, shell=True)
+            out, err = proc.communicate()
+            if proc.returncode != 0:
+                logging.warning("(%s) Unable to restart preempted instance! Instance will be re-created." % self.name)
+                logging.debug("(%s) The following error was received:\n%s" % (self.name, err))
+                return False
+
+        except RuntimeError:
+            logging.warning("(%s) Unable to restart preempted instance! Instance will be re-created." % self.name)
+            return False
+
+        self.set_start_time()
+        return True
+
+    def __find_markers(self, marker_paths):
+        # Return the checkpoint marker files that still exist on the instance's disk
+        if len(marker_paths) == 0:
+            return []
+        job_name = "find_checkpoints"
+        self.run(job_name, "ls -1 %s 2>/dev/null || true" % " ".join(marker_paths), num_retries=0, quiet_failure=True)
+        try:
+            out, err = self.wait_process(job_name)
+        except RuntimeError:
+            return []
+        finally:
+            self.processes.pop(job_name, None)
+        found = set([line.strip() for line in out.split("\n")])
+        return [marker_path for marker_path in marker_paths if marker_path in found]
+
     def wait_until_ready(self):
         # Wait until startup-script has completed on instance
         # This signifies that the instance has initialized ssh and the instance environment is finalized
@@ -1,4 +1,5 @@
 from GoogleCloudHelper import GoogleCloudHelper
+from InstanceStatusCache import InstanceStatusCache
 from Instance import Instance
 from PreemptibleInstance import PreemptibleInstance
 from GooglePlatform import GooglePlatform
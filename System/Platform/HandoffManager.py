@@ -0,0 +1,156 @@
+import logging
+
+from Processor import Processor
+from ProcessorSlot import ProcessorSlot
+
+class HandoffManager(object):
+    # Hands a finished task's processor to its only child so intermediate files never leave the processor's disk
+    # Processor's resources stay reserved until the child claims the processor or gives it up
+    def __init__(self, platform, enabled):
+        self.platform = platform
+
+        # Hand off processors whenever possible. Co-located tasks are always handed off.
+        self.enabled = enabled
+
+        # Processors handed off by finished tasks waiting to be claimed by the child task they were handed to
+        self.__handoffs         = {}
+
+        # Handoffs claimed by child tasks that haven't loaded the parent task's output yet
+        self.__claimed_handoffs = {}
+
+    def can_hand_off(self, task_id, co_locate=False):
+        # Return True if a task's processor can be handed to its child once the task finishes
+        if not (self.enabled or co_locate) or self.platform.is_locked():
+            return False
+        processor = self.platform.processors.get(task_id, None)
+        return processor is not None and not isinstance(processor, ProcessorSlot)
+
+    def hand_off(self, task_id, child_task_id, persist, transfers=None):
+        # Keep a finished task's processor and reserved resources for its child task
+        # Persist is called to save files the child would need if the child can't use the processor
+        # Transfers are the task's output uploads still running on the processor
+        # Return True if processor was handed off, False if it should be released as usual
+        platform = self.platform
+        with platform.platform_lock:
+            processor = platform.processors.get(task_id, None)
+            if platform.is_locked() or processor is None or not platform.admission.has_reservation(task_id) \
+                    or child_task_id in self.__handoffs:
+                return False
+
+            handoff = HandedOffProcessor(processor, task_id, child_task_id, persist, transfers)
+            platform.processors.pop(task_id)
+            platform.processors[handoff.reservation_id] = processor
+            platform.admission.transfer(task_id, handoff.reservation_id)
+            self.__handoffs[child_task_id] = handoff
+
+        logging.info("(%s) Handed processor '%s' off to task '%s'." % (task_id, processor.get_name(), child_task_id))
+        return True
+
+    def has_handoff(self, task_id):
+        with self.platform.platform_lock:
+            return task_id in self.__handoffs
+
+    def claim(self, task_id, nr_cpus, mem, disk_space):
+        # Claim processor handed off to task if it has enough resources to run the task
+        # Return the handoff if processor was claimed, None otherwise. Task's resources are already reserved when claimed.
+        platform = self.platform
+        with platform.platform_lock:
+            handoff = self.__handoffs.get(task_id, None)
+            if handoff is None or platform.is_locked():
+                return None
+
+            res_cpus, res_mem, res_disk_space = platform.admission.get_reservation(handoff.reservation_id)
+            processor = handoff.processor
+            if nr_cpus > res_cpus or mem > res_mem or disk_space > res_disk_space \
+                    or processor.is_locked() or processor.get_status() != Processor.AVAILABLE:
+                logging.debug("(%s) Unable to use processor '%s' handed off by task '%s'!" %
+                              (task_id, processor.get_name(), handoff.parent_task_id))
+                return None
+
+            self.__handoffs.pop(task_id)
+            platform.processors.pop(handoff.reservation_id)
+            platform.admission.transfer(handoff.reservation_id, task_id)
+            platform.claimed_processors[task_id] = processor
+            self.__claimed_handoffs[task_id] = handoff
+
+        logging.debug("(%s) Claimed processor '%s' handed off by task '%s'!" %
+                      (task_id, processor.get_name(), handoff.parent_task_id))
+        return handoff
+
+    def complete(self, task_id):
+        # Child task has loaded the output its parent left on the claimed processor
+        with self.platform.platform_lock:
+            self.__claimed_handoffs.pop(task_id, None)
+
+    def release(self, task_id):
+        # Give up processor handed off to task
+        # Parent task's files are persisted before processor is returned to the pool or destroyed
+        # Return True if there was a processor to release
+        platform = self.platform
+        with platform.platform_lock:
+            handoff = self.__handoffs.pop(task_id, None)
+            claimed_handoff = self.__claimed_handoffs.pop(task_id, None)
+
+        # Task claimed the processor but quit before loading the parent's output
+        if claimed_handoff is not None:
+            self.__release_claimed(task_id, claimed_handoff)
+            return True
+
+        if handoff is None:
+            return False
+
+        try:
+            logging.info("(%s) Saving output of task '%s' left on processor '%s'..." %
+                         (task_id, handoff.parent_task_id, handoff.processor.get_name()))
+            handoff.persist()
+            for transfer in handoff.transfers:
+                transfer.wait()
+        finally:
+            if not platform.recycle_processor(handoff.reservation_id):
+                self.__destroy_processor(handoff.processor)
+                platform.release_resources(handoff.reservation_id)
+        return True
+
+    def __release_claimed(self, task_id, handoff):
+        # Save output of parent task left on a claimed processor
+        # Processor is cleaned before it goes back in the pool if the task never used it
+        platform = self.platform
+        try:
+            logging.info("(%s) Saving output of task '%s' left on claimed processor '%s'..." %
+                         (task_id, handoff.parent_task_id, handoff.processor.get_name()))
+            handoff.persist()
+            for transfer in handoff.transfers:
+                transfer.wait()
+        finally:
+            with platform.platform_lock:
+                unused = platform.claimed_processors.get(task_id, None) is handoff.processor
+            if unused and not platform.pool.clean(task_id, handoff.processor):
+                # Destroy processor instead of returning it to the pool
+                with platform.platform_lock:
+                    platform.claimed_processors.pop(task_id, None)
+                self.__destroy_processor(handoff.processor)
+
+    @staticmethod
+    def __destroy_processor(processor):
+        try:
+            processor.destroy(wait=False)
+        except BaseException, e:
+            logging.warning("Unable to destroy processor '%s'!" % processor.get_name())
+            if e.message != "":
+                logging.warning("Received following error:\n%s" % e.message)
+
+
+class HandedOffProcessor(object):
+    # Processor of a finished task waiting to be claimed by the task's child
+    def __init__(self, processor, parent_task_id, child_task_id, persist, transfers=None):
+        self.processor      = processor
+        self.parent_task_id = parent_task_id
+        self.child_task_id  = child_task_id
+        # Function saving parent task files left on processor
+        self.persist        = persist
+        # Uploads of parent task output still running on processor
+        self.transfers      = [] if transfers is None else transfers
+        # Parent task's working directory. Removed once child has loaded its input.
+        self.wrk_dir        = processor.wrk_dir
+        # Key under which processor's resources stay reserved until child claims it
+        self.reservation_id = "handoff-%s" % child_task_id
@@ -0,0 +1,121 @@
+import logging
+import subprocess as sp
+import getpass
+
+class SlurmHelper(object):
+    # Wrappers around SLURM commands used to manage jobs submitted by the platform
+
+    # Job states in which an allocation is still waiting to start
+    PENDING_STATES  = ["PENDING", "CONFIGURING", "REQUEUED", "REQUEUE_HOLD", "REQUEUE_FED", "RESIZING", "SUSPENDED"]
+
+    # Job states in which an allocation can run job steps
+    RUNNING_STATES  = ["RUNNING"]
+
+    # Job states in which an allocation is being torn down
+    STOPPING_STATES = ["COMPLETING", "SIGNALING", "STAGE_OUT", "STOPPED"]
+
+    # Oldest SLURM release supporting 'srun --overlap', which lets job steps share the allocation's resources
+    MIN_VERSION     = (20, 11)
+
+    @staticmethod
+    def run_cmd(cmd, err_msg=None):
+
+        # Running and waiting for the command
+        proc = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+        out, err = proc.communicate()
+
+        # Check if any error has appeared
+        if proc.returncode != 0:
+            logging.error("SlurmHelper could not run the following command:\n%s" % cmd)
+            if err_msg is not None:
+                logging.error("%s. The following error appeared:\n    %s" % (err_msg, err))
+            raise RuntimeError("SlurmHelper command error!")
+
+        return out
+
+    @staticmethod
+    def get_version():
+        # Return SLURM version as a tuple of ints (e.g. 'slurm 20.11.8' -> (20, 11, 8))
+        out = SlurmHelper.run_cmd("srun --version", err_msg="Unable to determine SLURM version!")
+        version = out.strip().split(" ")[-1]
+        try:
+            return tuple([int(part) for part in version.split("-")[0].split(".")])
+        except ValueError:
+            logging.error("Unable to parse SLURM version from 'srun --version' output: %s" % out.strip())
+            raise RuntimeError("Unable to parse SLURM version!")
+
+    @staticmethod
+    def get_sbatch_cmd(job_name, nr_cpus, mem, disk_space, cmd, partition=None, account=None,
+                       time_limit=None, extra_options=""):
+        # Return sbatch command that submits a single-node job with the requested resources
+        # Job id is printed to stdout when submission succeeds
+        args = ["sbatch", "--parsable",
+                "--job-name=%s" % job_name,
+                "--nodes=1",
+                "--ntasks=1",
+                "--cpus-per-task=%d" % nr_cpus,
+                "--mem=%dG" % mem,
+                "--tmp=%dG" % disk_space,
+                "--output=/dev/null",
+                "--error=/dev/null"]
+
+        if partition is not None:
+            args.append("--partition=%s" % partition)
+
+        if account is not None:
+            args.append("--account=%s" % account)
+
+        if time_limit is not None:
+            args.append("--time=%s" % time_limit)
+
+        if extra_options:
+            args.append(extra_options)
+
+        cmd = cmd.replace("'", "'\"'\"'")
+        args.append("--wrap='%s'" % cmd)
+        return " ".join(args)
+
+    @staticmethod
+    def get_srun_cmd(job_id, cmd):
+        # Return srun command that runs a job step inside an existing allocation
+        # Steps overlap so that multiple commands can run in the allocation at the same time
+        cmd = cmd.replace("'", "'\"'\"'")
+        return "srun --jobid=%s --overlap --nodes=1 --ntasks=1 --quiet bash -c '%s'" % (job_id, cmd)
+
+    @staticmethod
+    def get_scancel_cmd(job_ids):
+        return "scancel %s" % " ".join([str(job_id) for job_id in job_ids])
+
+    @staticmethod
+    def parse_job_id(sbatch_output):
+        # Parsable sbatch output is '<job_id>' or '<job_id>;<cluster_name>'
+        return sbatch_output.strip().split(";")[0]
+
+    @staticmethod
+    def list_jobs():
+        # Return states of all of the current user's queued and running jobs with a single squeue call
+        cmd = "squeue --noheader --user=%s --format='%%i|%%T'" % getpass.getuser()
+        out = SlurmHelper.run_cmd(cmd, err_msg="Unable to list SLURM jobs!")
+        return SlurmHelper.__parse_job_states(out)
+
+    @staticmethod
+    def get_job_history(job_ids):
+        # Return final states of finished jobs with a single sacct call
+        if len(job_ids) == 0:
+            return {}
+        cmd = "sacct --noheader --parsable2 --allocations --format=JobID,State --jobs=%s" % ",".join(job_ids)
+        out = SlurmHelper.run_cmd(cmd, err_msg="Unable to get SLURM job accounting information!")
+        return SlurmHelper.__parse_job_states(out)
+
+    @staticmethod
+    def __parse_job_states(out):
+        # Parse lines of '<job_id>|<state>' into a dictionary of job states
+        # States can have trailing info (e.g. 'CANCELLED by 1234') and are standardized to the state name
+        states = {}
+        for line in out.strip().split("\n"):
+            if "|" not in line:
+                continue
+            job_id, state = line.split("|", 1)
+            state = state.strip().split(" ")[0].rstrip("+")
+            states[job_id.strip()] = state
+        return states
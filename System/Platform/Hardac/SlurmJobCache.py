@@ -0,0 +1,44 @@
+import threading
+
+from System.Platform import StatusCache
+from SlurmHelper import SlurmHelper
+
+class SlurmJobCache(StatusCache):
+    # Platform-wide cache of SLURM job states shared by all processors on a platform
+    # Refreshed with one squeue call (plus one sacct call for jobs that have left the queue)
+    # so the scheduler isn't polled once per job
+    def __init__(self, refresh_interval=15):
+        super(SlurmJobCache, self).__init__(refresh_interval)
+
+        # Ids of jobs whose state is being tracked
+        self.__tracked_jobs = set()
+        self.__tracked_lock = threading.Lock()
+
+    def track(self, job_id):
+        # Start tracking the state of a job
+        with self.__tracked_lock:
+            self.__tracked_jobs.add(job_id)
+        self.invalidate(job_id)
+
+    def untrack(self, job_id):
+        # Stop tracking the state of a job
+        with self.__tracked_lock:
+            self.__tracked_jobs.discard(job_id)
+        self.remove_entry(job_id)
+
+    def get_job_state(self, job_id):
+        # Return SLURM state of a job or None if the job state is unknown
+        return self.get_entry(job_id)
+
+    def fetch_entries(self):
+        with self.__tracked_lock:
+            tracked_jobs = list(self.__tracked_jobs)
+
+        # Get states of jobs still in the queue
+        job_states = SlurmHelper.list_jobs()
+
+        # Get final states of tracked jobs that are no longer in the queue
+        finished_jobs = [job_id for job_id in tracked_jobs if job_id not in job_states]
+        job_states.update(SlurmHelper.get_job_history(finished_jobs))
+
+        return dict([(job_id, job_states[job_id]) for job_id in tracked_jobs if job_id in job_states])
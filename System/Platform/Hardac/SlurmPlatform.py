@@ -0,0 +1,124 @@
+import os
+import logging
+from distutils.spawn import find_executable
+
+from System.Platform import Platform, Processor
+from SlurmHelper import SlurmHelper
+from SlurmProcessor import SlurmProcessor
+from SlurmJobCache import SlurmJobCache
+
+class SlurmPlatform(Platform):
+    # Platform that runs each task inside its own single-node SLURM allocation
+    # Final output and workspace directories must be on a filesystem shared with the compute nodes
+
+    CONFIG_SPEC = "System/Platform/Hardac/SlurmPlatform.validate"
+
+    def __init__(self, name, platform_config_file, final_output_dir):
+        # Call super constructor from Platform
+        super(SlurmPlatform, self).__init__(name, platform_config_file, final_output_dir)
+
+        # Standardize workspace directory so task working directories are nested beneath it
+        self.wrk_dir = self.standardize_dir(self.wrk_dir)
+
+        # Number of times to retry a failed command
+        self.cmd_retries = self.config["cmd_retries"]
+
+        # Whether commands on compute nodes can be run with sudo
+        self.use_sudo = self.config["use_sudo"]
+
+        # State of all platform jobs is refreshed with a single batched squeue/sacct call
+        self.job_cache = SlurmJobCache(refresh_interval=self.config["status_refresh_interval"])
+
+    def validate(self):
+        # Check that SLURM commands are available
+        for slurm_cmd in ["sbatch", "srun", "squeue", "sacct", "scancel"]:
+            if find_executable(slurm_cmd) is None:
+                logging.error("SLURM command '%s' not found! SLURM commands must be on the PATH." % slurm_cmd)
+                raise IOError("SLURM command '%s' not found!" % slurm_cmd)
+
+        # Check that job steps can overlap inside the allocation held by each processor
+        slurm_version = SlurmHelper.get_version()
+        if slurm_version[:2] < SlurmHelper.MIN_VERSION:
+            logging.error("SLURM version %s is not supported! SLURM platform requires SLURM %s or newer." %
+                          (".".join([str(x) for x in slurm_version]), ".".join([str(x) for x in SlurmHelper.MIN_VERSION])))
+            raise RuntimeError("Unsupported SLURM version!")
+
+        # Check that output and workspace dirs are paths on the local filesystem
+        for dir_type, dir_path in [("final output", self.final_output_dir), ("workspace", self.wrk_dir)]:
+            if not os.path.isabs(dir_path):
+                logging.error("Invalid %s directory: %s. SLURM platform directories must be absolute paths!"
+                              % (dir_type, dir_path))
+                raise IOError("Invalid %s directory!" % dir_type)
+
+        # Make final output directory if it doesn't exist already
+        if not os.path.isdir(self.final_output_dir):
+            try:
+                os.makedirs(self.final_output_dir)
+            except OSError:
+                logging.error("Unable to create final output directory: %s" % self.final_output_dir)
+                raise
+
+    def init_helper_processor(self, name, nr_cpus, mem, disk_space):
+        return SlurmProcessor(name,
+                              nr_cpus,
+                              mem,
+                              disk_space,
+                              **self.__get_processor_config())
+
+    def init_task_processor(self, name, nr_cpus, mem, disk_space):
+        return SlurmProcessor(name,
+                              nr_cpus,
+                              mem,
+                              disk_space,
+                              **self.__get_processor_config())
+
+    def publish_report(self, report=None):
+
+        # Exit as nothing to output
+        if report is None:
+            return
+
+        # Write report directly to final output directory
+        report_filepath = os.path.join(self.final_output_dir, "%s_final_report.json" % self.name)
+        try:
+            with open(report_filepath, "w") as report_file:
+                report_file.write(str(report))
+        except IOError:
+            logging.error("Could not write final report to the final output directory!")
+            raise
+
+    def clean_up(self):
+
+        logging.info("Cleaning up SLURM Platform.")
+
+        # Initiate cancellation of all allocations that haven't been released
+        for proc_name, proc_obj in self.processors.iteritems():
+            try:
+                proc_obj.destroy(wait=False)
+            except RuntimeError:
+                logging.warning("(%s) Could not destroy processor!" % proc_name)
+
+        # Now wait for all cancellations to finish
+        for proc_name, proc_obj in self.processors.iteritems():
+            try:
+                if "destroy" in proc_obj.processes:
+                    proc_obj.wait_process("destroy")
+            except RuntimeError:
+                logging.warning("(%s) Could not destroy processor!" % proc_name)
+
+        logging.info("Clean up complete!")
+
+    ####### PRIVATE UTILITY METHODS
+
+    def __get_processor_config(self):
+        # Returns complete config for a SLURM processor
+        params = {}
+        for param, value in self.config["job_options"].iteritems():
+            params[param] = value
+
+        # Add platform-specific options
+        params["wrk_dir"]       = self.wrk_dir
+        params["cmd_retries"]   = self.cmd_retries
+        params["use_sudo"]      = self.use_sudo
+        params["job_cache"]     = self.job_cache
+        return params
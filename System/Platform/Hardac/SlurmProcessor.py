@@ -0,0 +1,257 @@
+import logging
+import subprocess as sp
+import time
+
+from System.Platform import Process
+from System.Platform import Processor
+from System.Platform import TransferManager
+from System.Platform import TransferQueue
+from SlurmHelper import SlurmHelper
+
+class SlurmProcessor(Processor):
+    # Processor backed by a single-node SLURM allocation
+    # Allocation is submitted with sbatch when the processor is created and commands run inside it as srun job steps
+
+    def __init__(self, name, nr_cpus, mem, disk_space, **kwargs):
+        # Call super constructor
+        super(SlurmProcessor, self).__init__(name, nr_cpus, mem, disk_space, **kwargs)
+
+        # Platform-wide cache of SLURM job states
+        self.job_cache          = kwargs.pop("job_cache")
+
+        # Get optional scheduling arguments
+        self.partition          = kwargs.pop("partition",               None)
+        self.account            = kwargs.pop("account",                 None)
+        self.time_limit         = kwargs.pop("time_limit",              None)
+        self.extra_options      = kwargs.pop("extra_sbatch_options",    "")
+
+        # Id of SLURM job holding the processor's resources
+        self.job_id             = None
+
+        # Flag for whether allocation has ever started running
+        self.__allocation_started = False
+
+    def get_status(self):
+        with self.status_lock:
+            self.status = self.__sync_status()
+            logging.debug("(%s) Status: %s" % (self.name, self.status))
+            return self.status
+
+    def create(self):
+
+        if not self.get_status() == Processor.OFF:
+            logging.error("(%s) Cannot create processor! One with that name already exits with current status: %s" % (
+                self.name, self.get_status()))
+            raise RuntimeError("Processor can only be created if it's 'OFF'!")
+
+        elif self.is_locked():
+            logging.error("(%s) Failed to create processor. Processor locked!" % self.name)
+            raise RuntimeError("Cannot create processor while locked!")
+
+        # Submit a placeholder job that holds the allocation until the processor is destroyed
+        logging.info("(%s) Process 'create' started!" % self.name)
+        cmd = SlurmHelper.get_sbatch_cmd(self.name,
+                                         self.nr_cpus,
+                                         self.mem,
+                                         self.disk_space,
+                                         "sleep infinity",
+                                         partition=self.partition,
+                                         account=self.account,
+                                         time_limit=self.time_limit,
+                                         extra_options=self.extra_options)
+
+        self.processes["create"] = Process(cmd,
+                                           cmd=cmd,
+                                           stdout=sp.PIPE,
+                                           stderr=sp.PIPE,
+                                           shell=True,
+                                           num_retries=self.default_num_cmd_retries)
+        self.wait_process("create")
+
+        # Wait for SLURM to schedule the allocation
+        logging.debug("(%s) Waiting for SLURM job %s to start running..." % (self.name, self.job_id))
+        self.wait_until_ready()
+        logging.debug("(%s) SLURM job %s running! Now ready to run commands!" % (self.name, self.job_id))
+
+    def destroy(self, wait=True):
+
+        # Return if allocation has already been released
+        if self.get_status() == Processor.OFF:
+            return
+
+        # Files staged on the processor are removed along with it
+        TransferManager.forget_host(self.name)
+        TransferQueue.remove_queue(self)
+
+        # Kill any job steps still running in the allocation
+        self.stop()
+
+        # Release the allocation
+        logging.info("(%s) Process 'destroy' started!" % self.name)
+        cmd = SlurmHelper.get_scancel_cmd([self.job_id])
+        self.processes["destroy"] = Process(cmd,
+                                            cmd=cmd,
+                                            stdout=sp.PIPE,
+                                            stderr=sp.PIPE,
+                                            shell=True,
+                                            num_retries=self.default_num_cmd_retries)
+
+        # Wait for cancel to complete if requested
+        if wait:
+            self.wait_process("destroy")
+
+    def wait_process(self, proc_name):
+        # Get process from process list
+        proc_obj = self.processes[proc_name]
+
+        # Return immediately if process has already been set to complete
+        if proc_obj.is_complete():
+            return proc_obj.get_output()
+
+        # Wait for process to finish
+        out, err = proc_obj.communicate()
+
+        # Set process to complete
+        proc_obj.set_complete()
+
+        # Store process output for later use
+        proc_obj.set_output(out=out, err=err)
+
+        # Case: Process completed with errors
+        if proc_obj.has_failed():
+            # Determine whether to retry or raise errors
+            self.handle_failure(proc_name, proc_obj)
+            # If no errors thrown, try waiting on the process again
+            return self.wait_process(proc_name)
+
+        if proc_name == "create":
+            # Register allocation with the platform job cache
+            self.job_id = SlurmHelper.parse_job_id(out)
+            self.job_cache.track(self.job_id)
+            logging.debug("(%s) Submitted SLURM job %s" % (self.name, self.job_id))
+
+        elif proc_name == "destroy":
+            # Set the stop time
+            self.set_stop_time()
+            # Allocation no longer needs to be tracked
+            self.job_cache.untrack(self.job_id)
+            self.job_id = None
+
+        # Case: Process completed
+        if proc_obj.do_log_success():
+            logging.info("(%s) Process '%s' complete!" % (self.name, proc_name))
+
+        return out, err
+
+    def handle_failure(self, proc_name, proc_obj):
+
+        # Make sure decision is based on up-to-date job state
+        self.job_cache.invalidate(self.job_id)
+
+        # Determine if command can be retried
+        can_retry = False
+
+        # Raise error if processor is locked
+        if self.is_locked() and proc_name != "destroy":
+            self.raise_error(proc_name, proc_obj)
+
+        elif self.get_status() == Processor.OFF:
+            if proc_name == "destroy":
+                return
+            can_retry = proc_name == "create" and proc_obj.get_num_retries() > 0
+
+        elif self.get_status() == Processor.AVAILABLE:
+            can_retry = proc_obj.get_num_retries() > 0 and proc_name != "create"
+
+        else:
+            can_retry = proc_name == "destroy" and proc_obj.get_num_retries() > 0
+
+        # Retry sbatch/scancel command
+        if can_retry and proc_name in ["create", "destroy"]:
+            logging.warning("(%s) Process '%s' failed but we still got %s retries left. Re-running command!" % (
+                self.name, proc_name, proc_obj.get_num_retries()))
+            self.processes[proc_name] = Process(proc_obj.get_command(),
+                                                cmd=proc_obj.get_command(),
+                                                stdout=sp.PIPE,
+                                                stderr=sp.PIPE,
+                                                shell=True,
+                                                num_retries=proc_obj.get_num_retries() - 1)
+        # Retry job step
+        elif can_retry:
+            logging.warning("(%s) Process '%s' failed but we still got %s retries left. Re-running command!" % (
+                self.name, proc_name, proc_obj.get_num_retries()))
+            self.run(job_name=proc_name,
+                     cmd=proc_obj.get_command(),
+                     num_retries=proc_obj.get_num_retries() - 1,
+                     docker_image=proc_obj.get_docker_image(),
+                     quiet_failure=proc_obj.is_quiet(),
+                     output_parser=proc_obj.get_output_parser())
+
+        # Raise error if command can't be retried
+        else:
+            self.raise_error(proc_name, proc_obj)
+
+    def raise_error(self, proc_name, proc_obj):
+        # Log failure to debug logger if quiet failure
+        stdout_msg, stderr_msg = proc_obj.get_output()
+        if proc_obj.is_quiet():
+            logging.debug("(%s) Process '%s' failed!" % (self.name, proc_name))
+            if stdout_msg != "" or stderr_msg != "":
+                logging.debug("(%s) The following error was received:\n%s\n%s" % (self.name, stdout_msg, stderr_msg))
+
+        # Warn that process has failed due to cancellation
+        elif proc_obj.is_stopped():
+            logging.warning("(%s) Process '%s' failed due to cancellation!" % (self.name, proc_name))
+
+        # Log failure to error logger otherwise
+        else:
+            logging.error("(%s) Process '%s' failed!" % (self.name, proc_name))
+            if stdout_msg != "" or stderr_msg != "":
+                logging.debug("(%s) The following error was received:\n%s\n%s" % (self.name, stdout_msg, stderr_msg))
+        raise RuntimeError("SLURM processor %s has failed!" % self.name)
+
+    def wait_until_ready(self):
+        # Wait until SLURM starts running the allocation
+        # Jobs can sit in the queue for a long time so wait until the job starts or leaves the queue
+        while self.get_status() == Processor.CREATING and not self.is_locked():
+            time.sleep(self.job_cache.refresh_interval)
+
+        if self.is_locked():
+            logging.debug("(%s) Processor locked while waiting for allocation!" % self.name)
+            raise RuntimeError("(%s) Processor locked while waiting for allocation!" % self.name)
+
+        elif self.get_status() != Processor.AVAILABLE:
+            logging.error("(%s) SLURM job %s stopped before it started running!" % (self.name, self.job_id))
+            raise RuntimeError("(%s) SLURM job stopped before it started running!" % self.name)
+
+        # Set start time once resources have actually been allocated
+        self.set_start_time()
+
+    def adapt_cmd(self, cmd):
+        # Adapt command for running as a job step inside the processor's allocation
+        return SlurmHelper.get_srun_cmd(self.job_id, cmd)
+
+    def __sync_status(self):
+        # Convert SLURM job state of allocation to processor status
+        if self.job_id is None:
+            return Processor.OFF
+
+        state = self.job_cache.get_job_state(self.job_id)
+
+        if state is None:
+            # Newly submitted jobs can take a moment to show up in the queue
+            # Jobs that have run and then disappeared from accounting are gone
+            return Processor.OFF if self.__allocation_started else Processor.CREATING
+
+        elif state in SlurmHelper.PENDING_STATES:
+            return Processor.CREATING
+
+        elif state in SlurmHelper.RUNNING_STATES:
+            self.__allocation_started = True
+            return Processor.AVAILABLE
+
+        elif state in SlurmHelper.STOPPING_STATES:
+            return Processor.DESTROYING
+
+        # Job has finished (e.g. COMPLETED, CANCELLED, TIMEOUT, PREEMPTED, NODE_FAIL)
+        return Processor.OFF
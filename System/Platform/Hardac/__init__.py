@@ -0,0 +1,4 @@
+from SlurmHelper import SlurmHelper
+from SlurmJobCache import SlurmJobCache
+from SlurmProcessor import SlurmProcessor
+from SlurmPlatform import SlurmPlatform
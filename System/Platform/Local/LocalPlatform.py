@@ -0,0 +1,108 @@
+import os
+import logging
+import multiprocessing
+
+from System.Platform import Platform, Processor
+from LocalProcessor import LocalProcessor
+
+class LocalPlatform(Platform):
+    # Platform that runs every task as a set of subprocesses on the machine running GAP
+    # Resources reserved by running tasks can never exceed the PLAT_MAX_* limits in the platform config
+    # Limits are only applied when tasks are admitted. Commands aren't confined to the cpus/mem they requested.
+
+    CONFIG_SPEC = "System/Platform/Local/LocalPlatform.validate"
+
+    def __init__(self, name, platform_config_file, final_output_dir):
+        # Call super constructor from Platform
+        super(LocalPlatform, self).__init__(name, platform_config_file, final_output_dir)
+
+        # Standardize workspace directory so task working directories are nested beneath it
+        self.wrk_dir = self.standardize_dir(self.wrk_dir)
+
+        # Number of times to retry a failed command
+        self.cmd_retries = self.config["cmd_retries"]
+
+        # Whether commands can be run with sudo on this machine
+        self.use_sudo = self.config["use_sudo"]
+
+    def validate(self):
+        # Check that output and workspace dirs are paths on the local filesystem
+        for dir_type, dir_path in [("final output", self.final_output_dir), ("workspace", self.wrk_dir)]:
+            if not os.path.isabs(dir_path):
+                logging.error("Invalid %s directory: %s. Local platform directories must be absolute paths!"
+                              % (dir_type, dir_path))
+                raise IOError("Invalid %s directory!" % dir_type)
+
+            # Make directory if it doesn't exist already
+            if not os.path.isdir(dir_path):
+                try:
+                    os.makedirs(dir_path)
+                except OSError:
+                    logging.error("Unable to create %s directory: %s" % (dir_type, dir_path))
+                    raise
+
+        # Warn if platform is configured to use more cpus than are available on this machine
+        nr_local_cpus = multiprocessing.cpu_count()
+        if self.TOTAL_NR_CPUS > nr_local_cpus:
+            logging.warning("Local platform configured with %s CPUs but only %s CPUs are available!" %
+                            (self.TOTAL_NR_CPUS, nr_local_cpus))
+
+    def init_helper_processor(self, name, nr_cpus, mem, disk_space):
+        return LocalProcessor(name,
+                              nr_cpus,
+                              mem,
+                              disk_space,
+                              **self.__get_processor_config())
+
+    def init_task_processor(self, name, nr_cpus, mem, disk_space):
+        return LocalProcessor(name,
+                              nr_cpus,
+                              mem,
+                              disk_space,
+                              **self.__get_processor_config())
+
+    def publish_report(self, report=None):
+
+        # Exit as nothing to output
+        if report is None:
+            return
+
+        # Write report directly to final output directory
+        report_filepath = os.path.join(self.final_output_dir, "%s_final_report.json" % self.name)
+        try:
+            with open(report_filepath, "w") as report_file:
+                report_file.write(str(report))
+        except IOError:
+            logging.error("Could not write final report to the final output directory!")
+            raise
+
+    def clean_up(self):
+
+        logging.info("Cleaning up Local Platform.")
+
+        # Kill any running processes and remove task working directories
+        for proc_name, proc_obj in self.processors.iteritems():
+            try:
+                proc_obj.destroy(wait=False)
+            except RuntimeError:
+                logging.warning("(%s) Could not destroy processor!" % proc_name)
+
+        # Now wait for all destroy processes to finish
+        for proc_name, proc_obj in self.processors.iteritems():
+            try:
+                if proc_obj.get_status() != Processor.OFF:
+                    proc_obj.wait_process("destroy")
+            except RuntimeError:
+                logging.warning("(%s) Could not destroy processor!" % proc_name)
+
+        logging.info("Clean up complete!")
+
+    ####### PRIVATE UTILITY METHODS
+
+    def __get_processor_config(self):
+        # Returns complete config for a local processor
+        params = {}
+        params["wrk_dir"]       = self.wrk_dir
+        params["cmd_retries"]   = self.cmd_retries
+        params["use_sudo"]      = self.use_sudo
+        return params
@@ -0,0 +1,164 @@
+import logging
+import subprocess as sp
+
+from System.Platform import Process
+from System.Platform import Processor
+from System.Platform import TransferManager
+from System.Platform import TransferQueue
+
+class LocalProcessor(Processor):
+    # Processor that runs commands as subprocesses on the machine running GAP
+
+    def __init__(self, name, nr_cpus, mem, disk_space, **kwargs):
+        # Call super constructor
+        super(LocalProcessor, self).__init__(name, nr_cpus, mem, disk_space, **kwargs)
+
+        # Base workspace directory. Task working directories are created underneath it.
+        self.base_wrk_dir = self.wrk_dir
+
+    def create(self):
+
+        if not self.get_status() == Processor.OFF:
+            logging.error("(%s) Cannot create processor! One with that name already exits with current status: %s" % (
+                self.name, self.get_status()))
+            raise RuntimeError("Processor can only be created if it's 'OFF'!")
+
+        elif self.is_locked():
+            logging.error("(%s) Failed to create processor. Processor locked!" % self.name)
+            raise RuntimeError("Cannot create processor while locked!")
+
+        # Nothing needs to be provisioned so processor is available immediately
+        self.set_start_time()
+        self.set_status(Processor.AVAILABLE)
+        logging.debug("(%s) Local processor ready to run commands!" % self.name)
+
+    def destroy(self, wait=True):
+
+        # Return if processor has already been destroyed
+        if self.get_status() == Processor.OFF:
+            return
+
+        # Files staged on the processor are removed along with it
+        TransferManager.forget_host(self.name)
+        TransferQueue.remove_queue(self)
+
+        # Kill anything still running on the processor
+        self.stop()
+
+        logging.info("(%s) Process 'destroy' started!" % self.name)
+        self.set_status(Processor.DESTROYING)
+
+        # Remove task working directory to free up local disk space
+        # Never remove the base workspace directory itself as it's shared with other tasks
+        cmd = "true"
+        if self.wrk_dir.rstrip("/") != self.base_wrk_dir.rstrip("/") and self.wrk_dir.startswith(self.base_wrk_dir):
+            cmd = self.adapt_privileges("sudo rm -rf %s" % self.wrk_dir)
+
+        self.processes["destroy"] = Process(cmd,
+                                            cmd=cmd,
+                                            stdout=sp.PIPE,
+                                            stderr=sp.PIPE,
+                                            shell=True,
+                                            num_retries=0)
+
+        # Wait for clean up to complete if requested
+        if wait:
+            self.wait_process("destroy")
+
+    def stop_process(self, proc_name):
+        # Kill process along with any child processes the command spawned
+        proc_obj = self.processes[proc_name]
+        if proc_obj.poll() is None:
+            logging.debug("Killing process: %s" % proc_name)
+            self.__kill_child_processes(proc_obj.pid)
+            proc_obj.stop()
+
+    def wait_process(self, proc_name):
+        # Get process from process list
+        proc_obj = self.processes[proc_name]
+
+        # Return immediately if process has already been set to complete
+        if proc_obj.is_complete():
+            return proc_obj.get_output()
+
+        # Wait for process to finish
+        out, err = proc_obj.communicate()
+
+        # Set process to complete
+        proc_obj.set_complete()
+
+        # Store process output for later use
+        proc_obj.set_output(out=out, err=err)
+
+        # Case: Process completed with errors
+        if proc_obj.has_failed():
+            # Determine whether to retry or raise errors
+            self.handle_failure(proc_name, proc_obj)
+            # If no errors thrown, try waiting on the process again
+            return self.wait_process(proc_name)
+
+        if proc_name == "destroy":
+            self.set_stop_time()
+            self.set_status(Processor.OFF)
+
+        # Case: Process completed
+        if proc_obj.do_log_success():
+            logging.info("(%s) Process '%s' complete!" % (self.name, proc_name))
+
+        return out, err
+
+    def handle_failure(self, proc_name, proc_obj):
+
+        # Processor is considered off even if the working directory couldn't be removed
+        if proc_name == "destroy":
+            logging.warning("(%s) Unable to remove working directory: %s" % (self.name, self.wrk_dir))
+            self.set_stop_time()
+            self.set_status(Processor.OFF)
+            return
+
+        # Retry command if processor isn't locked and retries remain
+        if not self.is_locked() and not proc_obj.is_stopped() and proc_obj.get_num_retries() > 0:
+            logging.warning("(%s) Process '%s' failed but we still got %s retries left. Re-running command!" % (
+                self.name, proc_name, proc_obj.get_num_retries()))
+            self.run(job_name=proc_name,
+                     cmd=proc_obj.get_command(),
+                     num_retries=proc_obj.get_num_retries() - 1,
+                     docker_image=proc_obj.get_docker_image(),
+                     quiet_failure=proc_obj.is_quiet(),
+                     output_parser=proc_obj.get_output_parser())
+            return
+
+        self.raise_error(proc_name, proc_obj)
+
+    def raise_error(self, proc_name, proc_obj):
+        # Log failure to debug logger if quiet failure
+        stdout_msg, stderr_msg = proc_obj.get_output()
+        if proc_obj.is_quiet():
+            logging.debug("(%s) Process '%s' failed!" % (self.name, proc_name))
+            if stdout_msg != "" or stderr_msg != "":
+                logging.debug("(%s) The following error was received:\n%s\n%s" % (self.name, stdout_msg, stderr_msg))
+
+        # Warn that process has failed due to cancellation
+        elif proc_obj.is_stopped():
+            logging.warning("(%s) Process '%s' failed due to cancellation!" % (self.name, proc_name))
+
+        # Log failure to error logger otherwise
+        else:
+            logging.error("(%s) Process '%s' failed!" % (self.name, proc_name))
+            if stdout_msg != "" or stderr_msg != "":
+                logging.debug("(%s) The following error was received:\n%s\n%s" % (self.name, stdout_msg, stderr_msg))
+        raise RuntimeError("Local processor %s has failed!" % self.name)
+
+    def adapt_cmd(self, cmd):
+        # Run command with bash so commands behave the same as on remote processors
+        cmd = cmd.replace("'", "'\"'\"'")
+        return "bash -c '%s'" % cmd
+
+    @staticmethod
+    def __kill_child_processes(pid):
+        # Recursively kill all descendants of a process
+        proc = sp.Popen("pgrep -P %d" % pid, stdout=sp.PIPE, stderr=sp.PIPE, shell=True)
+        out, err = proc.communicate()
+        for child_pid in out.split():
+            LocalProcessor.__kill_child_processes(int(child_pid))
+            sp.call("kill -TERM %s" % child_pid, stdout=sp.PIPE, stderr=sp.PIPE, shell=True)
@@ -0,0 +1,2 @@
+from LocalProcessor import LocalProcessor
+from LocalPlatform import LocalPlatform
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from Processor import Processor
+from ProcessorSlot import ProcessorSlot
+
+class PackedProcessor(object):
+    # Large processor shared by several small tasks that each run in their own processor slot
+    # Keeps track of the cpus/mem/disk space reserved by each slot so the host is never oversubscribed
+    def __init__(self, name, nr_cpus, mem, disk_space):
+        self.name           = name
+        self.nr_cpus        = nr_cpus
+        self.mem            = mem
+        self.disk_space     = disk_space
+
+        # Host processor. Initialized by the platform the first time a slot is handed to a task.
+        self.processor      = None
+
+        # Resources (cpus, mem, disk space) reserved by each task running on the host
+        self.slots          = {}
+
+        # Time when the last slot was released
+        self.idle_since     = time.time()
+
+        # Key under which host's resources are reserved on the platform (packed processor names are unique)
+        self.reservation_id = name
+
+        # Lock ensuring only one slot creates the host
+        self.create_lock    = threading.Lock()
+
+    def can_fit(self, nr_cpus, mem, disk_space):
+        cpus_used, mem_used, disk_space_used = self.get_usage()
+        return cpus_used + nr_cpus <= self.nr_cpus \
+               and mem_used + mem <= self.mem \
+               and disk_space_used + disk_space <= self.disk_space
+
+    def reserve(self, task_id, nr_cpus, mem, disk_space):
+        self.slots[task_id] = (nr_cpus, mem, disk_space)
+
+    def release(self, task_id):
+        self.slots.pop(task_id, None)
+        if self.is_empty():
+            self.idle_since = time.time()
+
+    def is_empty(self):
+        return len(self.slots) == 0
+
+    def get_usage(self):
+        cpus_used, mem_used, disk_space_used = 0, 0, 0
+        for nr_cpus, mem, disk_space in self.slots.itervalues():
+            cpus_used       += nr_cpus
+            mem_used        += mem
+            disk_space_used += disk_space
+        return cpus_used, mem_used, disk_space_used
+
+    def get_slot(self, task_id, name, **kwargs):
+        # Return processor slot for a task that has reserved space on the host
+        nr_cpus, mem, disk_space = self.slots[task_id]
+        return ProcessorSlot(name, nr_cpus, mem, disk_space, packed_processor=self, **kwargs)
+
+    def get_processor(self):
+        return self.processor
+
+    def set_processor(self, processor):
+        self.processor = processor
+
+    def create(self):
+        # Create host if it isn't already running
+        with self.create_lock:
+            if self.processor.get_status() == Processor.OFF:
+                self.processor.create()
+
+    def get_share(self, slot):
+        # Fraction of host used by a slot
+        return max(float(slot.get_nr_cpus()) / self.nr_cpus, float(slot.get_mem()) / self.mem)
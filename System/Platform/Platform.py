@@ -5,6 +5,11 @@ import threading
 
 from Config import ConfigParser
 from Processor import Processor
+from ProcessorSlot import ProcessorSlot
+from ResourceAdmission import ResourceAdmission
+from ProcessorPacker import ProcessorPacker
+from ProcessorPool import ProcessorPool
+from HandoffManager import HandoffManager
 
 class TaskPlatformResourceLimitError(Exception):
     pass
@@ -44,6 +49,15 @@ class Platform(object):
         self.MIN_MEM            = 1
         self.MIN_DISK_SPACE     = 1
 
+        # Tasks needing at most this many cpus/mem (GB) share packed processors (0 disables packing)
+        self.PACK_TASK_MAX_NR_CPUS  = self.config.get("PACK_TASK_MAX_NR_CPUS", 0)
+        self.PACK_TASK_MAX_MEM      = self.config.get("PACK_TASK_MAX_MEM", 0)
+
+        # Size of processors that small tasks are packed onto
+        self.PACK_NR_CPUS       = self.config.get("PACK_PROC_NR_CPUS", self.MAX_NR_CPUS)
+        self.PACK_MEM           = self.config.get("PACK_PROC_MEM", self.MAX_MEM)
+        self.PACK_DISK_SPACE    = self.config.get("PACK_PROC_DISK_SPACE", self.MAX_DISK_SPACE)
+
         # Check to make sure resource limits are fine
         self.__check_resources()
 
@@ -60,6 +74,21 @@ class Platform(object):
         # Boolean flag to lock processor creation upon cleanup
         self.__locked = False
 
+        # Idle processors handed to tasks at admission time but not yet retrieved with get_processor()
+        self.claimed_processors = {}
+
+        # Resources reserved by tasks and processors and the queue of tasks waiting for resources
+        self.admission  = ResourceAdmission(self)
+
+        # Small tasks sharing packed processors
+        self.packer     = ProcessorPacker(self)
+
+        # Processors of finished tasks kept idle for reuse by later tasks
+        self.pool       = ProcessorPool(self, ttl=self.config.get("PROC_POOL_TTL", 0))
+
+        # Processors of finished tasks handed to their only child task
+        self.handoffs   = HandoffManager(self, enabled=self.config.get("PROC_LOCALITY", False))
+
     def get_processor(self, task_id, nr_cpus, mem, disk_space):
         # Initialize new processor and register with platform
 
@@ -69,6 +98,21 @@ class Platform(object):
             raise TaskPlatformLockError("Cannot get processor while platform is locked!")
         logging.debug("(%s) Platform ain't locked!" % task_id)
 
+        # Use idle processor handed to task when its resources were reserved
+        with self.platform_lock:
+            processor = self.claimed_processors.pop(task_id, None)
+            if processor is not None:
+                logging.info("Reusing idle processor '%s' for task '%s'..." % (processor.get_name(), task_id))
+                self.processors[task_id] = processor
+                return processor
+            packed = self.packer.get_packed_processor(task_id)
+
+        # Run small tasks in a slot on a shared processor
+        if packed is not None:
+            slot = self.packer.get_slot(task_id, packed)
+            self.update_reservation(task_id)
+            return slot
+
         # Check to see if processor is asking for too many resources
         logging.debug("(%s) Checking to see if processor is too big for platform..." % task_id)
         self.__check_processor(task_id, nr_cpus, mem, disk_space)
@@ -93,8 +137,22 @@ class Platform(object):
                 logging.error("Platform cannot create task processor with duplicate id: '%s'!" % task_id)
                 raise RuntimeError("Platform attempted to create duplicate task processor!")
 
+        self.update_reservation(task_id)
         return self.processors[task_id]
 
+    def update_reservation(self, task_id):
+        # Reserve the resources a task's processor actually has instead of the resources the task requested
+        # Platforms can round up requested cpus/mem when a processor is initialized or created (e.g. to an instance type)
+        with self.platform_lock:
+            processor = self.processors.get(task_id, None)
+            owner_id = task_id
+            if isinstance(processor, ProcessorSlot):
+                # Slots share the resources reserved for their packed processor
+                owner_id = processor.packed_processor.reservation_id
+                processor = processor.packed_processor.get_processor()
+            if processor is not None:
+                self.admission.resize(owner_id, processor.get_nr_cpus(), processor.get_mem(), processor.get_disk_space())
+
     def get_helper_processor(self):
         # Initialize helper processor
 
@@ -112,18 +170,162 @@ class Platform(object):
         # Add to list of processors if not already there
         if "helper" not in self.processors:
             self.processors["helper"] = processor
+            # Helper resources stay reserved for the lifetime of the platform
+            with self.platform_lock:
+                self.admission.reserve("helper", processor.get_nr_cpus(), processor.get_mem(), processor.get_disk_space())
         else:
             logging.error("Platform cannot create duplicate helper processor!")
             raise RuntimeError("Platform attempted to create duplicate helper processor!")
 
         return self.processors["helper"]
 
+    def request_resources(self, task_id, nr_cpus, mem, disk_space, priority=0, docker_image=None, parent_ids=None):
+        # Block until platform resources can be reserved for a task
+        # Idle processors matching the request (same cpus, mem, docker image) are handed over to the task for reuse
+        # Return True if resources were reserved, False if request was withdrawn or platform was locked
+
+        # Make sure request could ever be satisfied by a single processor
+        self.__check_processor(task_id, nr_cpus, mem, disk_space)
+
+        with self.admission.cv:
+            # Processor handed off by parent task has already been claimed with its resources
+            if task_id in self.claimed_processors:
+                return True
+
+            request = self.admission.add_request(task_id, nr_cpus, mem, disk_space, priority,
+                                                 docker_image=docker_image, parent_ids=parent_ids)
+            try:
+                while True:
+                    if self.__locked or self.admission.is_withdrawn(task_id):
+                        logging.debug("(%s) Resource request withdrawn before being admitted!" % task_id)
+                        return False
+
+                    if self.packer.is_packable(request):
+                        # Small tasks are admitted once there's room on a packed processor
+                        if self.packer.reserve_slot(request):
+                            return True
+                        admission_request = self.packer.get_packed_processor_request(request)
+
+                    else:
+                        # Reuse an idle processor. Its resources are already reserved so no other request is delayed.
+                        pooled = self.pool.claim(request)
+                        if pooled is not None:
+                            self.admission.transfer(pooled.reservation_id, task_id)
+                            self.claimed_processors[task_id] = pooled.processor
+                            logging.debug("(%s) Claimed idle processor '%s'!" % (task_id, pooled.processor.get_name()))
+                            return True
+
+                        if self.admission.can_admit(request):
+                            self.admission.reserve(task_id, nr_cpus, mem, disk_space, shape=request.get_shape())
+                            logging.debug("(%s) Reserved %s CPUs, %sGB mem, %sGB disk space!" % (task_id, nr_cpus, mem, disk_space))
+                            return True
+                        admission_request = request
+
+                    # Destroy idle processors if they're the only thing keeping the request from being admitted
+                    self.pool.evict(admission_request)
+
+                    self.admission.cv.wait()
+            finally:
+                self.admission.remove_request(task_id)
+
+    def update_request_priority(self, task_id, priority):
+        # Change priority of a request waiting to be admitted
+        with self.platform_lock:
+            self.admission.update_priority(task_id, priority)
+
+    def withdraw_request(self, task_id):
+        # Stop waiting for resources (e.g. task was cancelled)
+        with self.platform_lock:
+            self.admission.withdraw(task_id)
+
+    def release_resources(self, task_id):
+        # Return resources reserved by a task to the platform and wake up waiting requests
+        # Output of parent task left on a claimed processor is saved first so it isn't lost along with the processor
+        self.release_handoff(task_id)
+
+        with self.platform_lock:
+            # Free up task's slot on packed processor
+            packed = self.packer.release_slot(task_id)
+            if packed is not None:
+                if packed.is_empty() and not self.__locked:
+                    if self.pool.is_enabled():
+                        self.pool.start_reaper()
+                    else:
+                        self.pool.destroy_idle(packed)
+                self.admission.cv.notify_all()
+                return
+
+            # Put claimed processor back in the pool if task quit before using it
+            processor = self.claimed_processors.pop(task_id, None)
+            if processor is not None:
+                if not self.__locked:
+                    self.pool.add(task_id, processor, last_task_id=None)
+                    return
+                # Make sure processor is destroyed during clean up
+                self.processors[task_id] = processor
+
+            if self.admission.release(task_id):
+                logging.debug("(%s) Released platform resources!" % task_id)
+
+    def recycle_processor(self, task_id):
+        # Return a finished task's processor to the pool of idle processors so that later tasks can reuse it
+        # Task's resource reservation is transferred to the idle processor
+        # Return True if processor was added to the pool, False if it should be destroyed instead
+        if not self.pool.is_enabled() or self.__locked:
+            return False
+
+        processor = self.processors.get(task_id, None)
+        if processor is None or isinstance(processor, ProcessorSlot) or processor.is_locked() or processor.get_status() != Processor.AVAILABLE:
+            return False
+
+        # Processor is in an unknown state if any of its processes haven't finished
+        for proc_obj in processor.processes.itervalues():
+            if not proc_obj.is_complete():
+                return False
+
+        # Remove task files so the next task starts with an empty workspace
+        if not self.pool.clean(task_id, processor):
+            return False
+
+        with self.platform_lock:
+            if self.__locked or not self.admission.has_reservation(task_id):
+                return False
+            self.processors.pop(task_id)
+            self.pool.add(task_id, processor, last_task_id=task_id)
+
+        logging.info("(%s) Returned processor '%s' to pool of idle processors." % (task_id, processor.get_name()))
+        return True
+
+    def can_hand_off(self, task_id, co_locate=False):
+        # Return True if a task's processor can be handed to its child once the task finishes
+        return self.handoffs.can_hand_off(task_id, co_locate=co_locate)
+
+    def hand_off_processor(self, task_id, child_task_id, persist, transfers=None):
+        # Keep a finished task's processor and reserved resources for its child task
+        # Return True if processor was handed off, False if it should be released as usual
+        return self.handoffs.hand_off(task_id, child_task_id, persist, transfers=transfers)
+
+    def has_handoff(self, task_id):
+        return self.handoffs.has_handoff(task_id)
+
+    def claim_handoff(self, task_id, nr_cpus, mem, disk_space):
+        # Claim processor handed off to task if it has enough resources to run the task
+        # Return the handoff if processor was claimed, None otherwise
+        return self.handoffs.claim(task_id, nr_cpus, mem, disk_space)
+
+    def complete_handoff(self, task_id):
+        # Child task has loaded the output its parent left on the claimed processor
+        self.handoffs.complete(task_id)
+
+    def release_handoff(self, task_id):
+        # Give up processor handed off to task. Return True if there was a processor to release.
+        return self.handoffs.release(task_id)
+
     def can_make_processor(self, req_cpus, req_mem, req_disk_space):
-        cpu, mem, disk_space = self.__get_curr_usage()
-        cpu_overload    = cpu + req_cpus > self.TOTAL_NR_CPUS
-        mem_overload    = mem + req_mem > self.TOTAL_MEM
-        disk_overload   = disk_space + req_disk_space > self.TOTAL_DISK_SPACE
-        return (not cpu_overload) and (not mem_overload) and (not disk_overload) and (not self.__locked)
+        # Return True if resources are currently available. Does not reserve the resources.
+        with self.platform_lock:
+            cpu, mem, disk_space = self.admission.get_usage()
+            return self.admission.fits(cpu, mem, disk_space, req_cpus, req_mem, req_disk_space) and not self.__locked
 
     def get_max_nr_cpus(self):
         return self.MAX_NR_CPUS
@@ -143,13 +345,26 @@ class Platform(object):
     def get_wrk_dir(self):
         return self.wrk_dir
 
+    def is_locked(self):
+        return self.__locked
+
     def lock(self):
         with self.platform_lock:
             self.__locked = True
+            # Wake up any tasks waiting for resources so they can quit
+            self.admission.cv.notify_all()
+            eviction_threads = self.pool.get_eviction_threads()
+
+        # Wait for idle processors to finish being destroyed so they aren't destroyed twice during clean up
+        for eviction_thread in eviction_threads:
+            eviction_thread.join()
 
     def unlock(self):
         with self.platform_lock:
             self.__locked = False
+            # Reaper quits while the platform is locked
+            if len(self.pool.get_idle_processors()) > 0:
+                self.pool.start_reaper()
 
     def __check_processor(self, task_id, nr_cpus, mem, disk_space):
         # Check that nr_cpus, mem, disk space are under max
@@ -184,24 +399,17 @@ class Platform(object):
                     self.MAX_DISK_SPACE, self.TOTAL_DISK_SPACE))
             err = True
 
+        elif self.PACK_TASK_MAX_NR_CPUS > 0 and (self.PACK_NR_CPUS > self.MAX_NR_CPUS or
+                                                 self.PACK_MEM > self.MAX_MEM or
+                                                 self.PACK_DISK_SPACE > self.MAX_DISK_SPACE):
+            logging.error("Platform config error! Packed processor size (%s CPUs, %sGB mem, %sGB disk space) "
+                          "cannot exceed max task size!" % (self.PACK_NR_CPUS, self.PACK_MEM, self.PACK_DISK_SPACE))
+            err = True
+
         if err:
             raise TaskPlatformResourceLimitError(
                 "Task resource limit (CPU/Mem/Disk space) cannot exceed platform resource limit!")
 
-    def __get_curr_usage(self):
-        # Return total cpus, mem, disk space currently in use on platform
-        with self.platform_lock:
-            procs = self.processors.values()
-        cpu = 0
-        mem = 0
-        disk_space = 0
-        for processor in procs:
-            if processor.get_status() > Processor.OFF:
-                cpu += processor.get_nr_cpus()
-                mem += processor.get_mem()
-                disk_space += processor.get_disk_space()
-        return cpu, mem, disk_space
-
     ####### ABSTRACT METHODS TO BE IMPLEMENTED BY INHERITING CLASSES
     @abc.abstractmethod
     def init_task_processor(self, name, nr_cpus, mem, disk_space):
@@ -233,3 +441,4 @@ class Platform(object):
     def standardize_dir(dir_path):
         # Makes directory names uniform to include a single '/' at the end
         return dir_path.rstrip("/") + "/"
+
@@ -1,5 +1,8 @@
+import threading
 import subprocess as sp
 
+from StreamCapture import StreamCapture
+
 class Process(sp.Popen):
 
     def __init__(self, args, **kwargs):
@@ -9,12 +12,34 @@ class Process(sp.Popen):
         # Quiet failure means logger will not register command failure as error
         self.quiet          = kwargs.pop("quiet_failure", False)
         self.log_success    = kwargs.pop("log_success", True)
+        # Parser that receives output lines as they're produced instead of the output being kept
+        self.output_parser  = kwargs.pop("output_parser", None)
         super(Process, self).__init__(args,     **kwargs)
         self.complete       = False
         self.stopped        = False
         self.out            = ""
         self.err            = ""
 
+        # Start reading output right away so process never blocks on a full pipe and output is never fully in memory
+        self.captures       = None
+        if self.stdout is not None and self.stderr is not None:
+            self.captures = self.__start_capture()
+
+    def communicate(self, input=None):
+        # Wait for process to finish and return its output
+        if self.captures is None:
+            return super(Process, self).communicate(input)
+
+        self.wait()
+        try:
+            for capture in self.captures:
+                capture.join()
+        except BaseException:
+            # Parsing errors only matter if the command succeeded. Failed commands are retried or raise their own error.
+            if self.returncode == 0:
+                raise
+        return self.get_output()
+
     def is_complete(self):
         return self.complete
 
@@ -22,6 +47,9 @@ class Process(sp.Popen):
         self.complete = True
 
     def set_output(self, out, err):
+        # Captured output is already stored in bounded buffers/spill files so it isn't held again in memory
+        if self.captures is not None:
+            return
         self.out = out
         self.err = err
 
@@ -38,7 +66,19 @@ class Process(sp.Popen):
     def get_docker_image(self):
         return self.docker_image
 
+    def get_output_parser(self):
+        return self.output_parser
+
     def get_output(self):
+        # Return output held in memory (most recent lines if output was spilled to disk)
+        if self.captures is not None:
+            return self.captures[0].get_output(), self.captures[1].get_output()
+        return self.out, self.err
+
+    def read_output(self):
+        # Return full output, reading back any output spilled to disk
+        if self.captures is not None:
+            return self.captures[0].read_output(), self.captures[1].read_output()
         return self.out, self.err
 
     def is_quiet(self):
@@ -52,4 +92,24 @@ class Process(sp.Popen):
         return self.stopped
 
     def do_log_success(self):
-        return self.log_success
\ No newline at end of file
+        return self.log_success
+
+    def __start_capture(self):
+        # Keep full output unless it's being parsed as it's produced
+        if self.output_parser is None:
+            return StreamCapture(self.stdout), StreamCapture(self.stderr)
+
+        # Restart parser so lines from earlier failed attempts of the command are discarded
+        output_parser = self.output_parser
+        output_parser.start_cmd_output()
+
+        # Lines from stdout and stderr are parsed one at a time
+        parser_lock = threading.Lock()
+        def get_line_handler(is_stderr):
+            def handle_line(line):
+                with parser_lock:
+                    output_parser.process_cmd_output_line(line, is_stderr)
+            return handle_line
+
+        return StreamCapture(self.stdout, keep_output=False, line_handler=get_line_handler(False)), \
+               StreamCapture(self.stderr, keep_output=False, line_handler=get_line_handler(True))
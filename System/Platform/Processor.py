@@ -1,4 +1,5 @@
 import os
+import re
 import logging
 import abc
 from collections import OrderedDict
@@ -40,9 +41,20 @@ class Processor(object):
         # Default number of times to retry commands if none specified at command runtime
         self.default_num_cmd_retries = kwargs.pop("cmd_retries", 1)
 
+        # Whether commands can be run with sudo. If not, sudo is dropped from every command run by the processor.
+        self.use_sudo   = kwargs.pop("use_sudo", True)
+
         # Ordered dictionary of processing being run by processor
         self.processes  = OrderedDict()
 
+        # Names of completed processes whose results are stored off the processor (e.g. outputs saved to a bucket)
+        # They don't need to be re-run if the processor has to be reset
+        self.durable_processes = set()
+
+        # Marker files written to the processor's disk once a stage of work (e.g. input staging) has completed
+        # Maps marker path to names of the processes whose results are on disk if the marker is still there
+        self.checkpoints = OrderedDict()
+
         # Setting the instance status
         self.status_lock    = threading.Lock()
         self.status         = Processor.OFF
@@ -57,7 +69,7 @@ class Processor(object):
     def destroy(self, wait=True):
         self.set_status(Processor.OFF)
 
-    def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False):
+    def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False, output_parser=None):
 
         # Throw error if attempting to run command on stopped processor
         if self.is_locked():
@@ -94,6 +106,9 @@ class Processor(object):
         if docker_image is not None:
             cmd = "sudo docker run --rm --user root -v %s:%s %s /bin/bash -c '%s'" % (self.wrk_dir, self.wrk_dir, docker_image, cmd)
 
+        # Drop sudo from command if processor runs commands without elevated privileges
+        cmd = self.adapt_privileges(cmd)
+
         # Make any modifications to the command to allow it to be run on a specific platform
         cmd = self.adapt_cmd(cmd)
 
@@ -114,6 +129,7 @@ class Processor(object):
         kwargs["num_retries"] = num_retries
         kwargs["docker_image"] = docker_image
         kwargs["quiet_failure"] = quiet_failure
+        kwargs["output_parser"] = output_parser
 
         # Add process to list of processes
         self.processes[job_name] = Process(cmd, **kwargs)
@@ -133,6 +149,31 @@ class Processor(object):
         with threading.Lock():
             self.locked = False
 
+    def clear_processes(self):
+        # Forget about finished processes so processor can be reused by another task
+        self.processes = OrderedDict()
+        self.durable_processes = set()
+        self.checkpoints = OrderedDict()
+
+    def mark_durable(self, proc_names):
+        # Record that the results of processes no longer depend on the processor's disk
+        self.durable_processes.update(proc_names)
+
+    def is_durable(self, proc_name):
+        return proc_name in self.durable_processes
+
+    def add_checkpoint(self, marker_path, proc_names):
+        # Record that processes don't need to be re-run as long as marker file survives on the processor's disk
+        self.checkpoints[marker_path] = list(proc_names)
+
+    def get_checkpoints(self):
+        return self.checkpoints
+
+    def read_output(self, proc_name):
+        # Return full output of a finished process
+        # wait_process() only returns the most recent lines of output too large to hold in memory
+        return self.processes[proc_name].read_output()
+
     def stop(self):
         # Lock so that no new processes can be run on processor
         self.lock()
@@ -140,8 +181,12 @@ class Processor(object):
         # Kill all currently executing processes on processor
         for proc_name, proc_obj in self.processes.iteritems():
             if not proc_obj.is_complete() and proc_name.lower() != "destroy":
-                logging.debug("Killing process: %s" % proc_name)
-                proc_obj.stop()
+                self.stop_process(proc_name)
+
+    def stop_process(self, proc_name):
+        # Kill a single process running on processor
+        logging.debug("Killing process: %s" % proc_name)
+        self.processes[proc_name].stop()
 
     ############ Getters and Setters
     def set_status(self, new_status):
@@ -210,3 +255,9 @@ class Processor(object):
     @abc.abstractmethod
     def adapt_cmd(self, cmd):
         pass
+
+    def adapt_privileges(self, cmd):
+        # Remove 'sudo' wherever it starts a command (e.g. 'sudo mv', '&& sudo rm', '| sudo tee')
+        if self.use_sudo:
+            return cmd
+        return re.sub(r"(^|[\s;&|(`'\"])sudo\s+", r"\1", cmd)
@@ -0,0 +1,105 @@
+import logging
+from collections import OrderedDict
+
+from PackedProcessor import PackedProcessor
+from ResourceAdmission import ResourceRequest
+
+class ProcessorPacker(object):
+    # Runs small tasks in slots on shared processors so each small task doesn't need a processor of its own
+    # Tasks needing at most PACK_TASK_MAX_NR_CPUS cpus and PACK_TASK_MAX_MEM GB mem are packed (0 disables packing)
+    # Caller must hold the platform lock unless stated otherwise
+    def __init__(self, platform):
+        self.platform = platform
+
+        # Processors shared by small tasks and the packed processor each small task has a slot on
+        self.__packed_processors    = OrderedDict()
+        self.__packed_tasks         = {}
+
+    def is_packable(self, request):
+        # Small tasks share packed processors if packing is enabled
+        platform = self.platform
+        return platform.PACK_TASK_MAX_NR_CPUS > 0 \
+               and request.nr_cpus <= min(platform.PACK_TASK_MAX_NR_CPUS, platform.PACK_NR_CPUS) \
+               and request.mem <= min(platform.PACK_TASK_MAX_MEM, platform.PACK_MEM) \
+               and request.disk_space <= platform.PACK_DISK_SPACE
+
+    def get_packed_processor_request(self, request):
+        # Admission request for a new packed processor made on behalf of a small task
+        platform = self.platform
+        return ResourceRequest(request.task_id, platform.PACK_NR_CPUS, platform.PACK_MEM, platform.PACK_DISK_SPACE,
+                               request.priority, request.seq)
+
+    def reserve_slot(self, request):
+        # Reserve resources for small task on a packed processor with enough room
+        # Reserve resources for a new packed processor if there isn't room on existing packed processors
+        # Return True if slot was reserved
+        platform = self.platform
+
+        # Use the fullest packed processor with enough room so that emptier ones can be reclaimed
+        packed = None
+        for candidate in self.__packed_processors.itervalues():
+            if not candidate.can_fit(request.nr_cpus, request.mem, request.disk_space):
+                continue
+            if packed is None or candidate.get_usage()[0] > packed.get_usage()[0]:
+                packed = candidate
+
+        if packed is None:
+            packed_request = self.get_packed_processor_request(request)
+            if not platform.admission.can_admit(packed_request):
+                return False
+            name = "pack-%s-%s" % (platform.name[:20], platform.generate_unique_id())
+            packed = PackedProcessor(name, platform.PACK_NR_CPUS, platform.PACK_MEM, platform.PACK_DISK_SPACE)
+            platform.admission.reserve(packed.reservation_id, platform.PACK_NR_CPUS, platform.PACK_MEM, platform.PACK_DISK_SPACE)
+            self.__packed_processors[packed.name] = packed
+            logging.debug("(%s) Reserved resources for new packed processor '%s'!" % (request.task_id, name))
+
+        packed.reserve(request.task_id, request.nr_cpus, request.mem, request.disk_space)
+        self.__packed_tasks[request.task_id] = packed
+        logging.debug("(%s) Reserved slot on packed processor '%s'!" % (request.task_id, packed.name))
+        return True
+
+    def get_packed_processor(self, task_id):
+        # Return packed processor task has a slot on or None if task isn't packed
+        return self.__packed_tasks.get(task_id, None)
+
+    def get_slot(self, task_id, packed):
+        # Return a processor slot for a small task on its packed processor
+        # Caller must not hold the platform lock as the packed processor may need to be created
+        platform = self.platform
+
+        # Initialize host processor the first time a slot is used
+        with packed.create_lock:
+            if packed.get_processor() is None:
+                logging.info("Creating packed processor '%s'..." % packed.name)
+                host = platform.init_task_processor(packed.name, packed.nr_cpus, packed.mem, packed.disk_space)
+                packed.set_processor(host)
+                with platform.platform_lock:
+                    platform.processors[packed.reservation_id] = host
+
+        host = packed.get_processor()
+        name = "slot-%s-%s" % (task_id[:25], platform.generate_unique_id())
+        slot = packed.get_slot(task_id, name, wrk_dir=host.wrk_dir, cmd_retries=host.default_num_cmd_retries)
+        logging.info("Running task '%s' in slot '%s' on packed processor '%s'..." % (task_id, name, host.get_name()))
+
+        with platform.platform_lock:
+            if task_id in platform.processors:
+                logging.error("Platform cannot create task processor with duplicate id: '%s'!" % task_id)
+                raise RuntimeError("Platform attempted to create duplicate task processor!")
+            platform.processors[task_id] = slot
+        return slot
+
+    def release_slot(self, task_id):
+        # Free up task's slot on its packed processor
+        # Return the packed processor or None if task wasn't packed
+        packed = self.__packed_tasks.pop(task_id, None)
+        if packed is not None:
+            packed.release(task_id)
+            logging.debug("(%s) Released slot on packed processor '%s'!" % (task_id, packed.name))
+        return packed
+
+    def get_empty_processors(self):
+        return [packed for packed in self.__packed_processors.itervalues() if packed.is_empty()]
+
+    def remove(self, packed):
+        # Stop packing tasks onto a processor (e.g. it's being destroyed)
+        self.__packed_processors.pop(packed.name, None)
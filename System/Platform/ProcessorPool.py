@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from PackedProcessor import PackedProcessor
+from TransferQueue import TransferQueue
+
+class ProcessorPool(object):
+    # Processors of finished tasks kept idle for reuse by later tasks with the same shape (cpus, mem, docker image)
+    # Idle processors keep their resources reserved. They're destroyed once they've been idle for longer than the TTL
+    # or when their resources are needed to admit a task. Empty packed processors are expired and evicted the same way.
+    # Caller must hold the platform lock unless stated otherwise
+    def __init__(self, platform, ttl):
+        self.platform = platform
+
+        # Seconds that finished task processors are kept idle for reuse by later tasks (0 disables reuse)
+        self.ttl = ttl
+
+        # Idle processors available for reuse ordered from least to most recently returned
+        self.__idle_processors  = OrderedDict()
+
+        # Threads destroying idle processors to make room for new processors
+        self.__eviction_threads = []
+
+        # Thread destroying processors that have been idle for longer than the TTL
+        self.__reaper_thread    = None
+
+    def is_enabled(self):
+        return self.ttl > 0
+
+    def add(self, task_id, processor, last_task_id):
+        # Move processor and the resources reserved by a task into the pool of idle processors
+        admission = self.platform.admission
+        pooled = PooledProcessor(processor, last_task_id, admission.get_shape(task_id), admission.get_reservation(task_id)[2])
+        admission.transfer(task_id, pooled.reservation_id)
+        self.platform.processors[pooled.reservation_id] = processor
+        self.__idle_processors[processor.get_name()] = pooled
+        TransferQueue.remove_queue(processor)
+
+        # Waiting requests might be able to use the processor
+        admission.cv.notify_all()
+
+        # Start destroying processors that have been idle for too long
+        self.start_reaper()
+
+    def claim(self, request):
+        # Remove and return an idle processor that can run the request. Return None if there isn't one.
+        # Processors that ran one of the request's parent tasks are preferred
+        claimed = None
+        for pooled in self.__idle_processors.itervalues():
+            if not pooled.can_run(request):
+                continue
+            if claimed is None or pooled.last_task_id in request.parent_ids:
+                claimed = pooled
+            if pooled.last_task_id in request.parent_ids:
+                break
+
+        if claimed is not None:
+            self.__idle_processors.pop(claimed.processor.get_name())
+            self.platform.processors.pop(claimed.reservation_id, None)
+        return claimed
+
+    def evict(self, request):
+        # Destroy the least recently used idle processors if that frees up enough resources to admit request
+        # Resources stay reserved until processors are destroyed
+        idle_processors = self.get_idle_processors()
+        if len(idle_processors) == 0:
+            return
+
+        admission = self.platform.admission
+        cpu, mem, disk_space = admission.get_admission_usage(request)
+        to_evict = []
+        for pooled in idle_processors:
+            if admission.fits(cpu, mem, disk_space, request.nr_cpus, request.mem, request.disk_space):
+                break
+            res_cpus, res_mem, res_disk_space = admission.get_reservation(pooled.reservation_id)
+            cpu         -= res_cpus
+            mem         -= res_mem
+            disk_space  -= res_disk_space
+            to_evict.append(pooled)
+
+        # Don't destroy anything if request still wouldn't fit
+        if not admission.fits(cpu, mem, disk_space, request.nr_cpus, request.mem, request.disk_space):
+            return
+
+        for pooled in to_evict:
+            logging.debug("(%s) Evicting idle processor '%s' to make room for task!" %
+                          (request.task_id, pooled.reservation_id))
+            self.destroy_idle(pooled)
+
+    def clean(self, task_id, processor):
+        # Remove task files from processor so the next task starts with an empty workspace
+        # Return True if processor was cleaned. Caller must not hold the platform lock.
+        platform_wrk_dir = self.platform.wrk_dir
+        try:
+            wrk_dir = processor.wrk_dir
+            if wrk_dir.rstrip("/") != platform_wrk_dir.rstrip("/") and wrk_dir.startswith(platform_wrk_dir):
+                processor.run("recycle", "sudo rm -rf %s" % wrk_dir)
+                processor.wait_process("recycle")
+        except RuntimeError:
+            logging.warning("(%s) Unable to clean workspace of processor '%s'! Processor won't be reused." %
+                            (task_id, processor.get_name()))
+            return False
+
+        processor.clear_processes()
+        processor.set_wrk_dir(platform_wrk_dir)
+        processor.set_log_dir(None)
+        return True
+
+    def start_reaper(self):
+        # Start thread that destroys idle processors once they expire
+        if self.is_enabled() and self.__reaper_thread is None:
+            self.__reaper_thread = threading.Thread(target=self.__reap_idle_processors)
+            self.__reaper_thread.daemon = True
+            self.__reaper_thread.start()
+
+    def get_idle_processors(self):
+        # Return idle pooled processors and empty packed processors from least to most recently used
+        idle_processors = list(self.__idle_processors.itervalues())
+        idle_processors.extend(self.platform.packer.get_empty_processors())
+        idle_processors.sort(key=lambda idle: idle.idle_since)
+        return idle_processors
+
+    def get_eviction_threads(self):
+        return list(self.__eviction_threads)
+
+    def destroy_idle(self, pooled):
+        # Remove idle or empty packed processor from platform and destroy it in the background
+        if isinstance(pooled, PackedProcessor):
+            self.platform.packer.remove(pooled)
+        else:
+            self.__idle_processors.pop(pooled.processor.get_name(), None)
+        eviction_thread = threading.Thread(target=self.__destroy_processor, args=(pooled,))
+        eviction_thread.daemon = True
+        self.__eviction_threads.append(eviction_thread)
+        eviction_thread.start()
+
+    def __reap_idle_processors(self):
+        # Destroy processors that have been idle for longer than the TTL
+        # Reaper quits while the platform is locked and is started again when the platform is unlocked
+        with self.platform.admission.cv:
+            try:
+                while not self.platform.is_locked():
+                    now = time.time()
+                    for pooled in self.get_idle_processors():
+                        if now - pooled.idle_since >= self.ttl:
+                            logging.debug("Idle processor '%s' expired!" % pooled.reservation_id)
+                            self.destroy_idle(pooled)
+
+                    # Sleep until the next idle processor expires
+                    next_expiration = now + self.ttl
+                    for pooled in self.get_idle_processors():
+                        next_expiration = min(next_expiration, pooled.idle_since + self.ttl)
+                    self.platform.admission.cv.wait(max(next_expiration - now, 1))
+            finally:
+                self.__reaper_thread = None
+
+    def __destroy_processor(self, pooled):
+        # Destroy idle processor and return its resources to the platform
+        try:
+            # Packed processors that never ran a task don't have a processor to destroy
+            if pooled.processor is not None:
+                pooled.processor.destroy(wait=True)
+        except BaseException, e:
+            logging.warning("Unable to destroy idle processor '%s'!" % pooled.processor.get_name())
+            if e.message != "":
+                logging.warning("Received the following error:\n%s" % e.message)
+        finally:
+            self.platform.release_resources(pooled.reservation_id)
+            with self.platform.platform_lock:
+                self.__eviction_threads.remove(threading.current_thread())
+
+
+class PooledProcessor(object):
+    # Idle processor waiting to be reused by a later task
+    def __init__(self, processor, last_task_id, shape, disk_space):
+        self.processor      = processor
+        self.last_task_id   = last_task_id
+        # Shape (cpus, mem, docker image) requested by the task the processor was created for
+        # Platforms can adjust processor cpus/mem when the processor is created so the requested values are used
+        self.shape          = shape
+        self.disk_space     = disk_space
+        self.idle_since     = time.time()
+        # Key under which processor's resources stay reserved while it's idle
+        self.reservation_id = "pool-%s" % processor.get_name()
+
+    def can_run(self, request):
+        # Processor can be reused if it has the same shape and docker image and enough disk space
+        return self.shape == request.get_shape() and self.disk_space >= request.disk_space
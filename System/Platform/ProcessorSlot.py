@@ -0,0 +1,149 @@
+import os
+import logging
+
+from Processor import Processor
+from TransferQueue import TransferQueue
+
+class ProcessorSlot(Processor):
+    # Share of a packed processor used to run a single task alongside other tasks
+    # Commands are run on the host processor under job names prefixed by the slot name
+    # Each slot has its own working/log directories and is charged for its share of the host
+
+    def __init__(self, name, nr_cpus, mem, disk_space, packed_processor, **kwargs):
+        # Call super constructor
+        super(ProcessorSlot, self).__init__(name, nr_cpus, mem, disk_space, **kwargs)
+
+        # Packed processor that owns the host processor
+        self.packed_processor   = packed_processor
+
+        # Base workspace directory. Task working directories are created underneath it.
+        self.base_wrk_dir       = self.wrk_dir
+
+    def get_host(self):
+        return self.packed_processor.get_processor()
+
+    def get_status(self):
+        # Slot status mirrors the host while the slot is in use
+        with self.status_lock:
+            if self.status == Processor.OFF:
+                return Processor.OFF
+        return self.get_host().get_status()
+
+    def create(self):
+
+        if self.is_locked():
+            logging.error("(%s) Failed to create processor slot. Processor locked!" % self.name)
+            raise RuntimeError("Cannot create processor while locked!")
+
+        # Create host if this is the first slot to be used
+        self.packed_processor.create()
+
+        self.set_start_time()
+        self.set_status(Processor.AVAILABLE)
+        logging.debug("(%s) Processor slot ready to run commands on '%s'!" % (self.name, self.get_host().get_name()))
+
+    def destroy(self, wait=True):
+
+        # Return if slot has already been released
+        if self.get_status() == Processor.OFF:
+            return
+
+        # Kill anything still running in the slot
+        self.stop()
+        TransferQueue.remove_queue(self)
+
+        # Remove task working directory so the host doesn't run out of disk space
+        host = self.get_host()
+        if self.wrk_dir.rstrip("/") != self.base_wrk_dir.rstrip("/") and self.wrk_dir.startswith(self.base_wrk_dir) \
+                and host.get_status() == Processor.AVAILABLE and not host.is_locked():
+            host.run(self.__get_host_job_name("destroy"), "sudo rm -rf %s" % self.wrk_dir, quiet_failure=True)
+            self.processes["destroy"] = host.processes[self.__get_host_job_name("destroy")]
+            if wait:
+                self.wait_process("destroy")
+        else:
+            self.__release()
+
+    def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False, output_parser=None):
+
+        # Throw error if attempting to run command on stopped slot
+        if self.is_locked():
+            logging.error("(%s) Attempt to run process'%s' on locked processor!" % (self.name, job_name))
+            raise RuntimeError("Attempt to run command on locked processor!")
+
+        if num_retries is None:
+            num_retries = self.default_num_cmd_retries
+
+        # Write logs to slot's log directory instead of the host's
+        if "!LOG" in cmd:
+            log_file = "%s.log" % job_name
+            if self.log_dir is not None:
+                log_file = os.path.join(self.log_dir, log_file)
+            cmd = cmd.replace("!LOG0!", " >>/dev/null 2>&1 ")
+            cmd = cmd.replace("!LOG1!", " >>%s " % log_file)
+            cmd = cmd.replace("!LOG2!", " 2>>%s " % log_file)
+            cmd = cmd.replace("!LOG3!", " >>%s 2>&1 " % log_file)
+
+        host = self.get_host()
+        host_job_name = self.__get_host_job_name(job_name)
+        host.run(host_job_name, cmd, num_retries=num_retries, docker_image=docker_image, quiet_failure=quiet_failure,
+                 output_parser=output_parser)
+        self.processes[job_name] = host.processes[host_job_name]
+
+    def wait_process(self, proc_name):
+
+        # Slots that were never used or couldn't be cleaned don't have a destroy process
+        if proc_name == "destroy" and proc_name not in self.processes:
+            return "", ""
+
+        # Host handles retries and failures
+        host_job_name = self.__get_host_job_name(proc_name)
+        try:
+            out, err = self.get_host().wait_process(host_job_name)
+        except RuntimeError:
+            # Slot is released even if its workspace couldn't be removed
+            if proc_name != "destroy":
+                raise
+            out, err = self.get_host().processes[host_job_name].get_output()
+        finally:
+            # Retried processes replace the original process on the host
+            self.processes[proc_name] = self.get_host().processes[host_job_name]
+
+        if proc_name == "destroy":
+            self.__release()
+
+        return out, err
+
+    def stop(self):
+        # Lock so that no new processes can be run in slot
+        self.lock()
+
+        # Kill all processes belonging to slot without touching other slots on host
+        host = self.get_host()
+        for proc_name, proc_obj in self.processes.iteritems():
+            if not proc_obj.is_complete() and proc_name.lower() != "destroy":
+                host.stop_process(self.__get_host_job_name(proc_name))
+
+    def mark_durable(self, proc_names):
+        # Host decides what to re-run when it's reset
+        super(ProcessorSlot, self).mark_durable(proc_names)
+        self.get_host().mark_durable([self.__get_host_job_name(proc_name) for proc_name in proc_names])
+
+    def add_checkpoint(self, marker_path, proc_names):
+        # Host decides what to re-run when it's reset
+        super(ProcessorSlot, self).add_checkpoint(marker_path, proc_names)
+        self.get_host().add_checkpoint(marker_path, [self.__get_host_job_name(proc_name) for proc_name in proc_names])
+
+    def compute_cost(self):
+        # Charge slot for its share of the host's cpus or memory (whichever is larger)
+        return self.get_host().price * self.get_runtime() / 3600 * self.packed_processor.get_share(self)
+
+    def adapt_cmd(self, cmd):
+        return self.get_host().adapt_cmd(cmd)
+
+    def __get_host_job_name(self, job_name):
+        # Namespace job names so slots on the same host can't overwrite each other's processes
+        return "%s.%s" % (self.name, job_name)
+
+    def __release(self):
+        self.set_stop_time()
+        self.set_status(Processor.OFF)
@@ -0,0 +1,146 @@
+import itertools
+import threading
+
+class ResourceAdmission(object):
+    # Resources reserved on a platform and the queue of resource requests from tasks waiting to be admitted
+    # Requests are admitted in order of priority (FIFO among equal priorities)
+    # Resources are set aside for every request ahead in the queue so large tasks aren't starved by small ones
+    # Caller must hold the platform lock
+    def __init__(self, platform):
+        self.platform = platform
+
+        # Waiters are woken up whenever resources are released or the wait queue changes
+        self.cv = threading.Condition(platform.platform_lock)
+
+        # Resources (cpus, mem, disk space) currently reserved by each task or processor
+        self.__reservations = {}
+
+        # Requested shape (cpus, mem, docker image) of each task reservation. Idle processors are only reused for the same shape.
+        self.__shapes       = {}
+
+        # Resource requests from tasks waiting to be admitted
+        self.__requests     = {}
+
+        # Waiting requests that were withdrawn before being admitted
+        self.__withdrawn    = set()
+
+        # Arrival order of requests
+        self.__counter      = itertools.count()
+
+    def add_request(self, task_id, nr_cpus, mem, disk_space, priority, docker_image=None, parent_ids=None):
+        # Add request to the wait queue and return it
+        request = ResourceRequest(task_id, nr_cpus, mem, disk_space, priority, next(self.__counter),
+                                  docker_image=docker_image, parent_ids=parent_ids)
+        self.__requests[task_id] = request
+        return request
+
+    def remove_request(self, task_id):
+        # Removing a request from the queue can allow lower priority requests to be admitted
+        self.__requests.pop(task_id, None)
+        self.__withdrawn.discard(task_id)
+        self.cv.notify_all()
+
+    def update_priority(self, task_id, priority):
+        if task_id in self.__requests:
+            self.__requests[task_id].priority = priority
+            self.cv.notify_all()
+
+    def withdraw(self, task_id):
+        # Only requests still in the queue are withdrawn so ids of tasks that aren't waiting are never kept
+        if task_id in self.__requests:
+            self.__withdrawn.add(task_id)
+            self.cv.notify_all()
+
+    def is_withdrawn(self, task_id):
+        return task_id in self.__withdrawn
+
+    def can_admit(self, request):
+        # Determine whether request fits after setting aside resources for all requests ahead of it in the queue
+        cpu, mem, disk_space = self.get_admission_usage(request)
+        return self.fits(cpu, mem, disk_space, request.nr_cpus, request.mem, request.disk_space)
+
+    def get_admission_usage(self, request):
+        # Return resources reserved on the platform plus resources set aside for requests ahead of request
+        cpu, mem, disk_space = self.get_usage()
+        for other in self.__requests.itervalues():
+            if other.task_id != request.task_id and other.is_ahead_of(request):
+                cpu         += other.nr_cpus
+                mem         += other.mem
+                disk_space  += other.disk_space
+        return cpu, mem, disk_space
+
+    def get_usage(self):
+        # Return total cpus, mem, disk space currently reserved on platform
+        cpu = 0
+        mem = 0
+        disk_space = 0
+        for res_cpus, res_mem, res_disk_space in self.__reservations.itervalues():
+            cpu += res_cpus
+            mem += res_mem
+            disk_space += res_disk_space
+        return cpu, mem, disk_space
+
+    def fits(self, cpu, mem, disk_space, req_cpus, req_mem, req_disk_space):
+        cpu_overload    = cpu + req_cpus > self.platform.TOTAL_NR_CPUS
+        mem_overload    = mem + req_mem > self.platform.TOTAL_MEM
+        disk_overload   = disk_space + req_disk_space > self.platform.TOTAL_DISK_SPACE
+        return (not cpu_overload) and (not mem_overload) and (not disk_overload)
+
+    def reserve(self, owner_id, nr_cpus, mem, disk_space, shape=None):
+        self.__reservations[owner_id] = (nr_cpus, mem, disk_space)
+        if shape is not None:
+            self.__shapes[owner_id] = shape
+
+    def resize(self, owner_id, nr_cpus, mem, disk_space):
+        # Reserve the resources a processor was actually created with (platforms can round up requested cpus/mem)
+        if owner_id in self.__reservations:
+            self.__reservations[owner_id] = (nr_cpus, mem, disk_space)
+            self.cv.notify_all()
+
+    def has_reservation(self, owner_id):
+        return owner_id in self.__reservations
+
+    def get_reservation(self, owner_id):
+        return self.__reservations[owner_id]
+
+    def get_shape(self, owner_id):
+        return self.__shapes[owner_id]
+
+    def transfer(self, from_id, to_id):
+        # Move reserved resources to a new owner without releasing them
+        self.__reservations[to_id] = self.__reservations.pop(from_id)
+        if from_id in self.__shapes:
+            self.__shapes[to_id] = self.__shapes.pop(from_id)
+
+    def release(self, owner_id):
+        # Return reserved resources to the platform. Return True if owner had reserved resources.
+        self.__shapes.pop(owner_id, None)
+        if self.__reservations.pop(owner_id, None) is None:
+            return False
+        self.cv.notify_all()
+        return True
+
+
+class ResourceRequest(object):
+    # Request for platform resources made by a task waiting to be admitted
+    def __init__(self, task_id, nr_cpus, mem, disk_space, priority, seq, docker_image=None, parent_ids=None):
+        self.task_id    = task_id
+        self.nr_cpus    = nr_cpus
+        self.mem        = mem
+        self.disk_space = disk_space
+        self.priority   = priority
+        # Arrival order used to break ties between requests with the same priority
+        self.seq        = seq
+        # Docker image the task runs in. Used to match request with idle processors that already have the image.
+        self.docker_image = docker_image
+        # Tasks whose processors are preferred for reuse
+        self.parent_ids = parent_ids if parent_ids is not None else []
+
+    def get_shape(self):
+        return self.nr_cpus, self.mem, self.docker_image
+
+    def is_ahead_of(self, other):
+        # Return True if request should be admitted before another request
+        if self.priority != other.priority:
+            return self.priority > other.priority
+        return self.seq < other.seq
@@ -0,0 +1,114 @@
+import os
+import logging
+import hashlib
+import tempfile
+import threading
+import subprocess as sp
+
+class SSHConnection(object):
+    # Persistent multiplexed SSH connection to a remote host
+    # A single master connection is opened per host and every command is run as a new session over it
+    # Commands don't pay for a new SSH handshake. If the master goes away, they fall back to connecting directly.
+
+    def __init__(self, name, host, user, key_file=None, **kwargs):
+        self.name           = name
+        self.host           = host
+        self.user           = user
+        self.key_file       = None if key_file is None else os.path.expanduser(key_file)
+
+        # Executable used to open connections. Can be replaced with a fake transport for testing.
+        self.ssh_exe        = kwargs.pop("ssh_exe",         "ssh")
+        self.port           = kwargs.pop("port",            None)
+        self.connect_timeout= kwargs.pop("connect_timeout", 30)
+
+        # Directory holding master connection control sockets
+        # Socket names are hashed because unix socket paths are limited to ~100 characters
+        control_dir         = kwargs.pop("control_dir",     os.path.join(tempfile.gettempdir(), "gap_ssh"))
+        socket_id           = hashlib.sha1("%s@%s:%s" % (self.user, self.host, self.name)).hexdigest()[:16]
+        self.control_path   = os.path.join(control_dir, "%s.sock" % socket_id)
+
+        # Lock ensuring only one thread opens/closes the master connection
+        self.lock           = threading.Lock()
+
+    def open(self):
+        # Open master connection if it isn't already open. Return True if connection is usable.
+        with self.lock:
+            if self.__check():
+                return True
+
+            control_dir = os.path.dirname(self.control_path)
+            if not os.path.isdir(control_dir):
+                os.makedirs(control_dir, 0700)
+
+            # Master goes to the background once authenticated and persists until it's closed
+            # Output goes to /dev/null so the backgrounded master doesn't hold pipes of the calling process open
+            logging.debug("(%s) Opening SSH master connection to %s@%s." % (self.name, self.user, self.host))
+            cmd = "%s -M -N -f -o ControlPersist=yes %s" % (self.__get_base_cmd(), self.__get_target())
+            with open(os.devnull, "w") as devnull:
+                ret_code = sp.call(cmd, stdout=devnull, stderr=devnull, shell=True)
+
+            if ret_code != 0 or not self.__check():
+                logging.warning("(%s) Unable to open SSH master connection to %s@%s!" % (self.name, self.user, self.host))
+                return False
+
+            logging.debug("(%s) SSH master connection open." % self.name)
+            return True
+
+    def close(self):
+        # Close master connection. Sessions still running over the connection are terminated.
+        with self.lock:
+            if not os.path.exists(self.control_path):
+                return
+            cmd = "%s -O exit %s" % (self.__get_base_cmd(), self.__get_target())
+            with open(os.devnull, "w") as devnull:
+                sp.call(cmd, stdout=devnull, stderr=devnull, shell=True)
+            if os.path.exists(self.control_path):
+                os.remove(self.control_path)
+            logging.debug("(%s) SSH master connection closed." % self.name)
+
+    def is_open(self):
+        with self.lock:
+            return self.__check()
+
+    def adapt_cmd(self, cmd):
+        # Adapt command for running on host over the master connection
+        # Never start a master from here as a backgrounded master would keep the process' output pipes open
+        cmd = cmd.replace("'", "'\"'\"'")
+        return "%s -o ControlMaster=no %s -- '%s'" % (self.__get_base_cmd(), self.__get_target(), cmd)
+
+    def get_host(self):
+        return self.host
+
+    def get_control_path(self):
+        return self.control_path
+
+    def __check(self):
+        # Return True if master connection is running
+        if not os.path.exists(self.control_path):
+            return False
+        cmd = "%s -O check %s" % (self.__get_base_cmd(), self.__get_target())
+        with open(os.devnull, "w") as devnull:
+            return sp.call(cmd, stdout=devnull, stderr=devnull, shell=True) == 0
+
+    def __get_target(self):
+        return "%s@%s" % (self.user, self.host)
+
+    def __get_base_cmd(self):
+        args = [self.ssh_exe]
+
+        # Hosts are short-lived and addresses get re-used so don't check or remember host keys
+        args.append("-o StrictHostKeyChecking=no")
+        args.append("-o UserKnownHostsFile=/dev/null")
+        args.append("-o LogLevel=ERROR")
+        args.append("-o BatchMode=yes")
+        args.append("-o ConnectTimeout=%d" % self.connect_timeout)
+        args.append("-o ServerAliveInterval=30")
+        args.append("-o ControlPath=%s" % self.control_path)
+
+        if self.key_file is not None:
+            args.append("-i %s" % self.key_file)
+
+        if self.port is not None:
+            args.append("-p %s" % self.port)
+
+        return " ".join(args)
@@ -0,0 +1,87 @@
+import abc
+import logging
+import threading
+import time
+
+class StatusCache(object):
+    __metaclass__ = abc.ABCMeta
+
+    # Platform-wide cache of resource states shared by all processors on a platform
+    # Every entry is refreshed at once with a single batched call (e.g. one 'gcloud list', one 'squeue')
+    # so that status checks are served from memory instead of polling once per processor
+    def __init__(self, refresh_interval):
+
+        # Max age (seconds) of cached entries before they are refreshed
+        self.refresh_interval = refresh_interval
+
+        # Cached entries indexed by resource id
+        self.__entries = {}
+
+        # Time when the most recent refresh started
+        self.__last_refresh = None
+
+        # Time when the whole cache was last marked as out of date
+        self.__invalidated_at = 0
+
+        # Times when single entries were marked as out of date (e.g. a resource was created/destroyed/failed)
+        self.__invalidated_entries = {}
+
+        # Lock protecting cache contents
+        self.__data_lock = threading.Lock()
+
+        # Lock ensuring that only one thread refreshes the cache at a time
+        self.__refresh_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def fetch_entries(self):
+        # Return dictionary of the current state of every cached resource indexed by resource id
+        pass
+
+    def get_entry(self, key):
+        # Return cached entry of a resource or None if the resource doesn't exist
+        self.__refresh_if_stale(key)
+        with self.__data_lock:
+            return self.__entries.get(key, None)
+
+    def remove_entry(self, key):
+        # Remove a resource from the cache
+        with self.__data_lock:
+            self.__entries.pop(key, None)
+
+    def invalidate(self, key=None):
+        # Force next read of an entry to refresh the cache. Other entries are still served from the cache.
+        # Invalidate every entry if none is specified.
+        with self.__data_lock:
+            if key is None:
+                self.__invalidated_at = time.time()
+            else:
+                self.__invalidated_entries[key] = time.time()
+
+    def __is_fresh(self, key):
+        with self.__data_lock:
+            if self.__last_refresh is None or self.__last_refresh <= self.__invalidated_at:
+                return False
+            if self.__last_refresh <= self.__invalidated_entries.get(key, 0):
+                return False
+            return time.time() - self.__last_refresh < self.refresh_interval
+
+    def __refresh_if_stale(self, key):
+        if self.__is_fresh(key):
+            return
+
+        with self.__refresh_lock:
+            # Another thread may have refreshed the cache while this one was waiting
+            if self.__is_fresh(key):
+                return
+
+            refresh_start = time.time()
+            entries = self.fetch_entries()
+            logging.debug("(%s) Refreshed state of %d entries." % (self.__class__.__name__, len(entries)))
+
+            with self.__data_lock:
+                self.__entries = entries
+                self.__last_refresh = refresh_start
+
+                # Entries invalidated before the refresh started are now up to date
+                self.__invalidated_entries = dict([(k, t) for k, t in self.__invalidated_entries.iteritems()
+                                                   if t >= refresh_start])
@@ -1,4 +1,7 @@
+import pipes
 import logging
+import fnmatch
+from collections import OrderedDict
 
 from Platform import Platform
 
@@ -8,6 +11,9 @@ class InvalidStorageTypeError(Exception):
 class StorageHelper(object):
     # Class designed to facilitate remote file manipulations for a processor
 
+    # Max number of paths listed by a single command
+    MAX_BATCH_PATHS = 500
+
     def __init__(self, proc):
         self.proc = proc
 
@@ -29,6 +35,79 @@ class StorageHelper(object):
             self.proc.wait_process(job_name)
         return job_name
 
+    def mv_batch(self, src_paths, dest_path, job_name=None, log=True, wait=False, **kwargs):
+        # Transfer multiple files or dirs sharing the same storage protocol to dest_path with a single command
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(src_paths[0], dest_path)
+        cmd = cmd_generator.mv_batch(src_paths, dest_path)
+
+        job_name = "mv_batch_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging
+        cmd = "%s !LOG3!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
+    def cp(self, src_path, dest_path, job_name=None, log=True, wait=False, **kwargs):
+        # Copy file or dir from src_path to dest_path without removing the source
+        # Log the transfer unless otherwise specified
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(src_path, dest_path)
+        cmd = cmd_generator.cp(src_path, dest_path)
+
+        job_name = "cp_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging
+        cmd = "%s !LOG3!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
+    def cp_batch(self, src_paths, dest_path, job_name=None, log=True, wait=False, **kwargs):
+        # Copy multiple files or dirs sharing the same storage protocol to dest_path with a single command
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(src_paths[0], dest_path)
+        cmd = cmd_generator.cp_batch(src_paths, dest_path)
+
+        job_name = "cp_batch_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging
+        cmd = "%s !LOG3!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
+    def link(self, src_paths, dest_path, fallback_src_paths, job_name=None, log=True, wait=False, **kwargs):
+        # Hard-link files or dirs already on processor into dest_path
+        # Each file is copied from its fallback path instead if it can't be linked (e.g. it's since been removed)
+        cmds = []
+        for src_path, fallback_src_path in zip(src_paths, fallback_src_paths):
+            cmd_generator = StorageHelper.__get_storage_cmd_generator(fallback_src_path, dest_path)
+            link_cmd = LocalStorageCmdGenerator.link(src_path, dest_path)
+            cp_cmd = cmd_generator.cp(fallback_src_path, dest_path)
+
+            # Optionally add logging
+            if log:
+                link_cmd = "%s !LOG2!" % link_cmd
+                cp_cmd = "%s !LOG3!" % cp_cmd
+            cmds.append("( %s || %s )" % (link_cmd, cp_cmd))
+        cmd = " && ".join(cmds)
+
+        job_name = "link_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
     def mkdir(self, dir_path, job_name=None, log=False, wait=False, **kwargs):
         # Makes a directory if it doesn't already exists
         cmd_generator = StorageHelper.__get_storage_cmd_generator(dir_path)
@@ -88,6 +167,59 @@ class StorageHelper(object):
                 logging.error("Received the following msg:\n%s" % e.message)
             raise
 
+    def get_file_sizes(self, paths, job_name=None, **kwargs):
+        # Return {path: file size in gigabytes} for many paths at once. Paths that don't exist have a size of None.
+        file_stats = self.get_file_stats(paths, job_name=job_name, **kwargs)
+        return dict([(path, None if stats is None else stats[0]) for path, stats in file_stats.iteritems()])
+
+    def get_file_stats(self, paths, job_name=None, **kwargs):
+        # Return {path: (file size in gigabytes, version)} for many paths with one listing command per storage protocol
+        # Version changes whenever a file is re-written (latest modification time or object creation time)
+        # Paths that don't exist have stats of None
+        job_name = "get_sizes_%s" % Platform.generate_unique_id() if job_name is None else job_name
+        paths = list(OrderedDict.fromkeys(paths))
+        file_stats = dict.fromkeys(paths)
+
+        # Group paths by the storage protocol used to list them
+        protocol_paths = OrderedDict()
+        for path in paths:
+            cmd_generator = StorageHelper.__get_storage_cmd_generator(path)
+            protocol_paths.setdefault(cmd_generator, []).append(path)
+
+        job_count = 0
+        for cmd_generator, gen_paths in protocol_paths.iteritems():
+            for i in xrange(0, len(gen_paths), StorageHelper.MAX_BATCH_PATHS):
+                batch = gen_paths[i:i+StorageHelper.MAX_BATCH_PATHS]
+                job_count += 1
+                batch_job_name = "%s_%d" % (job_name, job_count)
+                self.proc.run(batch_job_name, cmd_generator.list_files(batch), **kwargs)
+
+                try:
+                    # Every line of the listing is needed even if it was too large to hold in memory
+                    self.proc.wait_process(batch_job_name)
+                    out, err = self.proc.read_output(batch_job_name)
+                except BaseException, e:
+                    logging.error("Unable to get size of %d paths!" % len(batch))
+                    if e.message != "":
+                        logging.error("Received the following msg:\n%s" % e.message)
+                    raise
+
+                # Files listed for more than one path (e.g. path and a wildcard matching it) are only counted once
+                listed = {}
+                for listed_path, bytes, version in cmd_generator.parse_listing(out):
+                    listed[listed_path.rstrip("/")] = (bytes, version)
+
+                # Add up sizes of files listed for each path (can be several if wildcard or directory)
+                # Path's version is the version of its most recently written file
+                for listed_path, (bytes, version) in listed.iteritems():
+                    for path in batch:
+                        if not cmd_generator.is_listed(listed_path, path.rstrip("/")):
+                            continue
+                        size, path_version = (0, version) if file_stats[path] is None else file_stats[path]
+                        file_stats[path] = (size + bytes/(1024**3.0), max(version, path_version))
+
+        return file_stats
+
     def rm(self, path, job_name=None, log=True, wait=False, **kwargs):
         # Delete file from file system
         # Log the transfer unless otherwise specified
@@ -152,6 +284,11 @@ class StorageHelper(object):
 class StorageCmdGenerator(object):
     PROTOCOL = None
 
+    @staticmethod
+    def is_listed(listed_path, path):
+        # Return True if a path printed by list_files() belongs to a path (or wildcard) that was listed
+        return listed_path == path or fnmatch.fnmatchcase(listed_path, path)
+
 
 class LocalStorageCmdGenerator(StorageCmdGenerator):
 
@@ -162,6 +299,28 @@ class LocalStorageCmdGenerator(StorageCmdGenerator):
         # Move a file from one directory to another
         return "sudo mv %s %s" % (src_path, dest_dir)
 
+    @staticmethod
+    def mv_batch(src_paths, dest_dir):
+        # Move multiple files to the same directory
+        return "sudo mv %s %s" % (" ".join(src_paths), dest_dir)
+
+    @staticmethod
+    def cp(src_path, dest_dir):
+        # Hard-link file or dir into another directory so the source isn't consumed (e.g. user input files)
+        # Fall back to a full copy if source and destination are on different filesystems
+        return "( sudo cp -al %s %s 2>/dev/null || sudo cp -r --remove-destination %s %s )" % \
+               (src_path, dest_dir, src_path, dest_dir)
+
+    @staticmethod
+    def cp_batch(src_paths, dest_dir):
+        # Hard-link or copy multiple files to the same directory
+        return LocalStorageCmdGenerator.cp(" ".join(src_paths), dest_dir)
+
+    @staticmethod
+    def link(src_path, dest_dir):
+        # Hard-link file or dir into another directory
+        return "sudo cp -al %s %s" % (src_path, dest_dir)
+
     @staticmethod
     def mkdir(dir_path):
         # Makes a directory if it doesn't already exists
@@ -172,6 +331,23 @@ class LocalStorageCmdGenerator(StorageCmdGenerator):
         # Return cmd for getting file size in bytes
         return "sudo du -sh --apparent-size --bytes %s" % path
 
+    @staticmethod
+    def list_files(paths):
+        # Return cmd printing size in bytes, latest modification time and path of each path that exists
+        # Hard links are counted for every path so paths inside other paths are listed too
+        return "sudo du -sl --apparent-size --bytes --time --time-style=+%%s %s 2>/dev/null || true" % " ".join(paths)
+
+    @staticmethod
+    def parse_listing(out):
+        # Return (path, size in bytes, modification time) of each path printed by list_files()
+        listing = []
+        for line in out.split("\n"):
+            if line.strip() == "":
+                continue
+            bytes, mtime, listed_path = line.split(None, 2)
+            listing.append((listed_path.strip(), int(bytes), mtime))
+        return listing
+
     @staticmethod
     def ls(path):
         return "sudo ls %s" % path
@@ -192,6 +368,22 @@ class GoogleStorageCmdGenerator(StorageCmdGenerator):
         options_fast = '-m -o "GSUtil:sliced_object_download_max_components=200"'
         return "sudo gsutil %s cp -r %s %s" % (options_fast, src_path, dest_dir)
 
+    @staticmethod
+    def mv_batch(src_paths, dest_dir):
+        # Copy multiple files to the same directory with one parallel gsutil call reading paths from stdin
+        # Paths are quoted arguments of printf so they're never read as its format string or expanded by the shell
+        quoted_paths = " ".join([pipes.quote(src_path) for src_path in src_paths])
+        return "printf '%%s\\n' %s | sudo gsutil -m cp -r -I %s" % (quoted_paths, dest_dir)
+
+    @staticmethod
+    def cp(src_path, dest_dir):
+        # Transfers from a bucket never remove the source
+        return GoogleStorageCmdGenerator.mv(src_path, dest_dir)
+
+    @staticmethod
+    def cp_batch(src_paths, dest_dir):
+        return GoogleStorageCmdGenerator.mv_batch(src_paths, dest_dir)
+
     @staticmethod
     def mkdir(dir_path):
         # Makes a directory if it doesn't already exists
@@ -202,6 +394,27 @@ class GoogleStorageCmdGenerator(StorageCmdGenerator):
         # Return cmd for getting file size in bytes
         return "gsutil du -s %s" % path
 
+    @staticmethod
+    def list_files(paths):
+        # Return cmd printing size in bytes, creation time and url of every object under the paths
+        return "gsutil ls -lr %s 2>/dev/null || true" % " ".join(paths)
+
+    @staticmethod
+    def parse_listing(out):
+        # Return (url, size in bytes, creation time) of each object printed by list_files()
+        # Directory headers and the total line are skipped
+        listing = []
+        for line in out.split("\n"):
+            fields = line.split()
+            if len(fields) == 3 and fields[0].isdigit() and fields[2].startswith("gs://"):
+                listing.append((fields[2], int(fields[0]), fields[1]))
+        return listing
+
+    @staticmethod
+    def is_listed(listed_path, path):
+        # Objects are listed individually so objects inside a listed directory belong to the directory
+        return StorageCmdGenerator.is_listed(listed_path, path) or listed_path.startswith(path + "/")
+
     @staticmethod
     def ls(path):
         return "gsutil ls %s" % path
@@ -0,0 +1,142 @@
+import io
+import os
+import logging
+import tempfile
+import threading
+from collections import deque
+
+class StreamCapture(object):
+    # Reads the output stream of a running process line by line in a background thread
+    # Recent lines are kept in a bounded buffer for logging
+    # Full output is kept only if requested, and is spilled to a temp file once it gets too large to hold in memory
+    # Lines can be handed to a parser as they're read so output doesn't need to be kept at all
+
+    # Max size (bytes) of output held in memory before it's spilled to disk
+    MAX_MEMORY_SIZE = 64 * 1024
+
+    # Number of recent lines kept for logging
+    TAIL_LINES      = 200
+
+    # Size (bytes) of chunks read from streams that aren't parsed line by line
+    CHUNK_SIZE      = 64 * 1024
+
+    def __init__(self, stream, keep_output=True, line_handler=None):
+        # Process pipes are unbuffered so lines are read through a buffered reader on the same file descriptor
+        self.stream         = stream
+        self.reader_stream  = io.open(stream.fileno(), "rb", closefd=False)
+        self.keep_output    = keep_output
+        self.line_handler   = line_handler
+
+        # Most recent lines of output
+        self.tail           = deque(maxlen=self.TAIL_LINES)
+
+        # Output held in memory until it gets larger than MAX_MEMORY_SIZE
+        self.buffer         = []
+        self.buffer_size    = 0
+
+        # Temp file holding output after it got too large to hold in memory
+        self.spill_file     = None
+        self.__spill        = None
+
+        # Error raised by line handler. Re-raised once the process has finished.
+        self.handler_error  = None
+
+        self.reader = threading.Thread(target=self.__read)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def join(self):
+        # Wait until the whole stream has been read
+        self.reader.join()
+        if self.__spill is not None:
+            self.__spill.close()
+            self.__spill = None
+        if self.handler_error is not None:
+            raise self.handler_error
+
+    def get_output(self):
+        # Return output held in memory: full output unless it was spilled to disk or not kept, otherwise the most recent lines
+        if not self.keep_output or self.spill_file is not None:
+            return self.get_tail()
+        return "".join(self.buffer)
+
+    def read_output(self):
+        # Return full output if it was kept, reading it back from disk if it was spilled
+        # Only for callers that need all of the output as it may be too large to hold in memory
+        if self.keep_output and self.spill_file is not None:
+            with open(self.spill_file, "r") as spill:
+                return spill.read()
+        return self.get_output()
+
+    def get_tail(self):
+        return "".join(self.tail)
+
+    def is_spilled(self):
+        return self.spill_file is not None
+
+    def close(self):
+        # Remove output spilled to disk
+        self.buffer = []
+        if self.spill_file is not None and os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
+        self.spill_file = None
+
+    def __del__(self):
+        self.close()
+
+    def __read(self):
+        if self.line_handler is None:
+            self.__read_chunks()
+        else:
+            self.__read_lines()
+        self.reader_stream.close()
+        self.stream.close()
+
+    def __read_lines(self):
+        for line in iter(self.reader_stream.readline, ""):
+            self.tail.append(line)
+
+            if self.keep_output:
+                self.__keep(line)
+
+            # Stop parsing after the first error but keep draining the stream so the process doesn't block
+            if self.handler_error is None:
+                try:
+                    self.line_handler(line)
+                except BaseException, e:
+                    self.handler_error = e
+
+    def __read_chunks(self):
+        # Output that isn't parsed is read in large chunks as splitting it into lines is only needed for the tail
+        partial_line = ""
+        for chunk in iter(lambda: self.reader_stream.read1(self.CHUNK_SIZE), ""):
+            if self.keep_output:
+                self.__keep(chunk)
+
+            lines = (partial_line + chunk).splitlines(True)
+            partial_line = "" if lines[-1].endswith("\n") else lines.pop()
+
+            # Output without newlines is added to the tail a chunk at a time so the partial line stays bounded
+            if len(partial_line) > self.CHUNK_SIZE:
+                lines.append(partial_line)
+                partial_line = ""
+            self.tail.extend(lines[-self.TAIL_LINES:])
+
+        if partial_line != "":
+            self.tail.append(partial_line)
+
+    def __keep(self, data):
+        if self.__spill is not None:
+            self.__spill.write(data)
+            return
+
+        self.buffer.append(data)
+        self.buffer_size += len(data)
+
+        # Move output to disk once it's too large to hold in memory
+        if self.buffer_size > self.MAX_MEMORY_SIZE:
+            fd, self.spill_file = tempfile.mkstemp(prefix="gap_output_", suffix=".txt")
+            logging.debug("Output larger than %d bytes. Spilling to disk: %s" % (self.MAX_MEMORY_SIZE, self.spill_file))
+            self.__spill = os.fdopen(fd, "w")
+            self.__spill.write("".join(self.buffer))
+            self.buffer = []
@@ -0,0 +1,175 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from StorageHelper import StorageHelper
+from TransferQueue import TransferQueue
+
+class TransferManager(object):
+    # Stages task input files into a processor's working directory
+    # Small files sharing a storage protocol are transferred together with a single command
+    # Files already staged on the same host by another task are hard-linked instead of being transferred again
+    # Hard-linked files share their contents, so commands must never modify their input files in place
+    # Transfers running on a host are bounded so tasks sharing a host don't overload its network or disk
+
+    # Files smaller than this (GB) are batched together
+    BATCH_FILE_SIZE = 1
+
+    # Max number of files transferred by a single batch command
+    MAX_BATCH_FILES = 100
+
+    # Max number of transfers running at once on a host
+    MAX_CONCURRENT_TRANSFERS = 8
+
+    # Paths of files staged on each host: {host name: {source path: staged path}}
+    __staged        = {}
+
+    # Semaphore bounding the number of transfers running on each host
+    __host_slots    = {}
+
+    # Lock protecting staged files and host semaphores
+    __lock          = threading.Lock()
+
+    def __init__(self, task_id, processor, max_concurrent=None):
+        self.task_id        = task_id
+        self.processor      = processor
+        self.storage_helper = StorageHelper(self.processor)
+
+        # Name of machine the transfers run on. Processor slots share their host's disk.
+        host = self.processor.get_host() if hasattr(self.processor, "get_host") else self.processor
+        self.host_name      = host.get_name()
+
+        max_concurrent      = self.MAX_CONCURRENT_TRANSFERS if max_concurrent is None else max_concurrent
+        with TransferManager.__lock:
+            if self.host_name not in TransferManager.__host_slots:
+                TransferManager.__host_slots[self.host_name] = threading.BoundedSemaphore(max_concurrent)
+            self.host_slots = TransferManager.__host_slots[self.host_name]
+
+        # Transfer jobs started but not yet waited on, oldest first
+        self.running        = OrderedDict()
+
+        # Number of jobs started by the manager. Used to create unique job names.
+        self.job_count      = 0
+
+        # Directory files are currently being staged into
+        self.dest_dir       = None
+
+    def stage(self, inputs, dest_dir, local_dir=None):
+        # Transfer input files to dest_dir and wait for all transfers to complete
+        # Files under local_dir are already on the processor and are hard-linked instead of transferred
+        # Returns list of unique source paths that were staged
+        self.dest_dir = dest_dir
+        src_paths   = OrderedDict()
+        for task_input in inputs:
+            src_path = task_input.get_transferrable_path()
+            if src_path not in src_paths:
+                src_paths[src_path] = task_input
+                logging.debug("Input path: %s, transfer path: %s" % (task_input.get_path(), src_path))
+
+        # Split inputs into files already on host, small files to batch, and files to transfer on their own
+        linked      = []
+        batches     = OrderedDict()
+        single      = []
+        staged      = self.__get_staged()
+        for src_path, task_input in src_paths.iteritems():
+            if local_dir is not None and src_path.startswith(local_dir):
+                staged[src_path] = src_path
+                linked.append(src_path)
+            elif src_path in staged:
+                linked.append(src_path)
+            elif task_input.size_known() and task_input.get_size() < self.BATCH_FILE_SIZE:
+                protocol = task_input.get_protocol()
+                if protocol not in batches:
+                    batches[protocol] = []
+                batches[protocol].append(src_path)
+            else:
+                single.append(src_path)
+
+        # Inputs still being uploaded by an earlier task need to finish before they can be staged
+        TransferQueue.wait_for(src_paths.keys())
+
+        try:
+            # Link files staged by other tasks
+            for i in xrange(0, len(linked), self.MAX_BATCH_FILES):
+                batch = linked[i:i+self.MAX_BATCH_FILES]
+                logging.debug("(%s) Linking %d inputs already on '%s'" % (self.task_id, len(batch), self.host_name))
+                self.__start("link_input", batch,
+                             lambda job_name, paths=batch: self.storage_helper.link([staged[path] for path in paths],
+                                                                                    dest_dir, paths,
+                                                                                    job_name=job_name))
+
+            # Transfer small files in batches
+            for protocol_paths in batches.itervalues():
+                for i in xrange(0, len(protocol_paths), self.MAX_BATCH_FILES):
+                    batch = protocol_paths[i:i+self.MAX_BATCH_FILES]
+                    if len(batch) == 1:
+                        single.append(batch[0])
+                        continue
+                    self.__start("load_input_batch", batch,
+                                 lambda job_name, paths=batch: self.storage_helper.cp_batch(paths, dest_dir,
+                                                                                            job_name=job_name))
+
+            # Transfer large files on their own
+            for src_path in single:
+                self.__start("load_input", [src_path],
+                             lambda job_name, path=src_path: self.storage_helper.cp(path, dest_dir, job_name=job_name))
+
+            # Wait for remaining transfers
+            while len(self.running) > 0:
+                self.__wait_oldest()
+
+        finally:
+            # Free host transfer slots held by transfers that failed or weren't waited on
+            for _ in xrange(len(self.running)):
+                self.host_slots.release()
+            self.running = OrderedDict()
+
+        return src_paths.keys()
+
+    @staticmethod
+    def forget_host(host_name):
+        # Remove record of files staged on a host and its transfer slots
+        # Called when the host is destroyed or reset as files staged on it may no longer exist
+        with TransferManager.__lock:
+            TransferManager.__staged.pop(host_name, None)
+            TransferManager.__host_slots.pop(host_name, None)
+
+    def __start(self, job_prefix, src_paths, start_job):
+        # Start transfer job once host has a free transfer slot
+        while not self.host_slots.acquire(False):
+            if len(self.running) == 0:
+                # Wait for transfers started by other tasks
+                self.host_slots.acquire()
+                break
+            # Wait for one of this task's own transfers so that tasks waiting on each other can't deadlock
+            self.__wait_oldest()
+
+        self.job_count += 1
+        job_name = "%s_%s_%d" % (job_prefix, self.task_id, self.job_count)
+        try:
+            start_job(job_name)
+        except:
+            self.host_slots.release()
+            raise
+        self.running[job_name] = src_paths
+
+    def __wait_oldest(self):
+        # Wait for oldest running transfer and record files it staged
+        job_name, src_paths = self.running.popitem(last=False)
+        try:
+            self.processor.wait_process(job_name)
+        finally:
+            self.host_slots.release()
+        self.__add_staged(src_paths)
+
+    def __get_staged(self):
+        with TransferManager.__lock:
+            return dict(TransferManager.__staged.get(self.host_name, {}))
+
+    def __add_staged(self, src_paths):
+        # Record files that are now on host so later tasks can link them
+        with TransferManager.__lock:
+            host_staged = TransferManager.__staged.setdefault(self.host_name, {})
+            for src_path in src_paths:
+                host_staged[src_path] = os.path.join(self.dest_dir, os.path.basename(src_path.rstrip("/")))
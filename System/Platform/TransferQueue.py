@@ -0,0 +1,117 @@
+import logging
+import threading
+import Queue
+
+class TransferQueue(object):
+    # Runs file uploads on a processor in the background
+    # Transfers start in the order they're queued and at most MAX_CONCURRENT_TRANSFERS run at once on a processor
+    # Each transfer returns a future so tasks can carry on and only wait for the files they actually need
+    # Downloads are staged separately by the TransferManager so uploads never wait behind them
+
+    # Max number of uploads running at once on a processor
+    MAX_CONCURRENT_TRANSFERS = 8
+
+    # Upload queue of each processor: {processor name: TransferQueue}
+    __queues        = {}
+
+    # Futures of unfinished uploads indexed by destination path
+    __pending       = {}
+
+    # Lock protecting processor queues and pending uploads
+    __lock          = threading.Lock()
+
+    def __init__(self, processor, max_concurrent=None):
+        self.processor      = processor
+        self.max_concurrent = self.MAX_CONCURRENT_TRANSFERS if max_concurrent is None else max_concurrent
+
+        # Transfers waiting to be started
+        self.queue          = Queue.Queue()
+
+        # Number of threads currently starting and waiting on transfers
+        self.num_workers    = 0
+        self.worker_lock    = threading.Lock()
+
+    @staticmethod
+    def get_queue(processor):
+        # Return upload queue of a processor. Tasks reusing a processor share its queue.
+        with TransferQueue.__lock:
+            if processor.get_name() not in TransferQueue.__queues:
+                TransferQueue.__queues[processor.get_name()] = TransferQueue(processor)
+            return TransferQueue.__queues[processor.get_name()]
+
+    @staticmethod
+    def remove_queue(processor):
+        # Forget upload queue of a processor that was destroyed or returned to the pool of idle processors
+        # Uploads already queued keep running until they're done
+        with TransferQueue.__lock:
+            TransferQueue.__queues.pop(processor.get_name(), None)
+
+    @staticmethod
+    def wait_for(paths):
+        # Wait for any unfinished uploads to the given paths
+        with TransferQueue.__lock:
+            futures = [TransferQueue.__pending[path] for path in paths if path in TransferQueue.__pending]
+        for future in futures:
+            future.wait()
+
+    def submit(self, job_name, start_job, dest_path):
+        # Queue transfer and return its future
+        # start_job is called with the job name once there's a free transfer slot and must start the transfer job
+        future = TransferFuture(job_name, dest_path)
+        with TransferQueue.__lock:
+            TransferQueue.__pending[dest_path] = future
+        self.queue.put((future, start_job))
+
+        # Start another worker if there are free transfer slots
+        with self.worker_lock:
+            if self.num_workers < self.max_concurrent:
+                self.num_workers += 1
+                worker = threading.Thread(target=self.__transfer)
+                worker.daemon = True
+                worker.start()
+        return future
+
+    def __transfer(self):
+        # Start and wait on queued transfers until the queue is empty
+        while True:
+            with self.worker_lock:
+                try:
+                    future, start_job = self.queue.get_nowait()
+                except Queue.Empty:
+                    self.num_workers -= 1
+                    return
+
+            error = None
+            try:
+                start_job(future.job_name)
+                self.processor.wait_process(future.job_name)
+            except BaseException, e:
+                logging.error("(%s) Transfer '%s' failed!" % (self.processor.get_name(), future.job_name))
+                error = e
+            finally:
+                with TransferQueue.__lock:
+                    if TransferQueue.__pending.get(future.dest_path, None) is future:
+                        TransferQueue.__pending.pop(future.dest_path)
+                future.set_done(error)
+
+
+class TransferFuture(object):
+    # Completion of a transfer queued on a TransferQueue
+    def __init__(self, job_name, dest_path):
+        self.job_name   = job_name
+        self.dest_path  = dest_path
+        self.__done     = threading.Event()
+        self.__error    = None
+
+    def set_done(self, error=None):
+        self.__error = error
+        self.__done.set()
+
+    def done(self):
+        return self.__done.is_set()
+
+    def wait(self):
+        # Wait for transfer to finish. Re-raise error if it failed.
+        self.__done.wait()
+        if self.__error is not None:
+            raise self.__error
@@ -1,6 +1,16 @@
+from StreamCapture import StreamCapture
 from Process import Process
 from Processor import Processor
+from ProcessorSlot import ProcessorSlot
+from StatusCache import StatusCache
+from PackedProcessor import PackedProcessor
+from ResourceAdmission import ResourceAdmission
+from ProcessorPacker import ProcessorPacker
+from ProcessorPool import ProcessorPool
+from HandoffManager import HandoffManager
 from Platform import Platform
 from StorageHelper import StorageHelper
 from DockerHelper import DockerHelper
-
+from TransferManager import TransferManager
+from TransferQueue import TransferQueue
+from SSHConnection import SSHConnection
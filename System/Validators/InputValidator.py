@@ -30,12 +30,19 @@ class InputValidator(Validator):
         # Check sample data paths
         inputs["sample"] = self.__get_sample_data_paths()
 
-        # Validate all files by adding them to thread pool's queue
+        # Validate docker images by adding them to thread pool's queue
+        files = []
         for input_file_src in inputs:
             for input_file in inputs[input_file_src]:
                 input_desc = self.__get_input_desc(input_file, input_source=input_file_src)
                 logging.info("Validating %s..." % input_desc)
-                self.thread_pool.add_task(input_file, input_desc)
+                if isinstance(input_file, GAPFile):
+                    files.append(input_file)
+                else:
+                    self.thread_pool.add_task(input_file, input_desc)
+
+        # Validate all files at once while docker images are being validated
+        self.__validate_files(files)
 
         # Wait for all tasks to finish
         self.thread_pool.wait_completion()
@@ -75,6 +82,34 @@ class InputValidator(Validator):
 
         return has_errors
 
+    def __validate_files(self, files):
+        # Check existence and size of all input files with a single batched command
+        # Existence of files in containing directories is checked on the file itself but size is of the whole directory
+        paths = []
+        for input_obj in files:
+            InputWorker.reset_flags(input_obj)
+            paths.append(self.__get_path_to_check(input_obj))
+            paths.append(input_obj.get_transferrable_path())
+
+        try:
+            file_sizes = self.storage_helper.get_file_sizes(paths, job_name="get_size_inputs")
+        except BaseException:
+            # Command failed for a reason other than a file not existing
+            logging.error("Unable to validate input files!")
+            for input_obj in files:
+                input_obj.flag("validation_failed")
+            return
+
+        for input_obj in files:
+            # Unset missing flag and set size if path exists
+            if file_sizes[self.__get_path_to_check(input_obj)] is not None:
+                input_obj.unflag("missing")
+                input_obj.set_size(file_sizes[input_obj.get_transferrable_path()])
+
+    @staticmethod
+    def __get_path_to_check(input_obj):
+        return input_obj.get_transferrable_path() if input_obj.is_prefix() else input_obj.get_path()
+
     @staticmethod
     def __get_input_desc(input_obj, input_source):
         # Return an informative description about an input
@@ -115,7 +150,8 @@ class InputValidator(Validator):
 
 
 class InputWorker(PoolWorker):
-    # ThreadPool worker for determining whether a single input (docker images/files, etc.) exists
+    # ThreadPool worker for determining whether a single docker image exists
+    # Input files are checked together by the InputValidator
     def __init__(self, task_queue, storage_helper=None, docker_helper=None):
 
         # Docker and storage helpers used to check existence of inputs
@@ -132,21 +168,11 @@ class InputWorker(PoolWorker):
     def task(self, input_obj, input_desc):
 
         # Reset object size, existence attributes
-        input_obj.flag("validated")
-        input_obj.set_size(None)
-        input_obj.flag("missing")
-        input_obj.unflag("validation_failed")
+        self.reset_flags(input_obj)
 
         try:
-            # Validate File object (Input type is meant to be ResourceKit, SampleSheet, etc.)
-            if isinstance(input_obj, GAPFile):
-                #input_name = "%s file '%s' of type '%s' with path: %s" % (input_type, input_obj.get_file_id(), input_obj.get_type(), input_obj)
-                self.validate_file(input_obj)
-
             # Validate DockerImage object
-            else:
-                #input_name = "Docker image %s" % input_obj.get_image_name()
-                self.validate_docker_image(input_obj)
+            self.validate_docker_image(input_obj)
 
         except BaseException, e:
             # Raise error because a command failed for a reason other than a file not existing
@@ -154,19 +180,13 @@ class InputWorker(PoolWorker):
             logging.error("Unable to validate %s!" % input_desc)
             raise
 
-    def validate_file(self, input_obj):
-        # Check whether input file exists
-        path_to_check = input_obj.get_transferrable_path() if input_obj.is_prefix() else input_obj.get_path()
-
-        # Unset missing flag if path exists
-        job_name = "check_exists_%s" % input_obj.get_file_id()
-        if self.storage_helper.path_exists(path_to_check, job_name=job_name):
-            input_obj.unflag("missing")
-
-            # Get/set size of input file
-            job_name = "get_size_%s" % input_obj.get_file_id()
-            file_size = self.storage_helper.get_file_size(input_obj.get_transferrable_path(), job_name=job_name)
-            input_obj.set_size(file_size)
+    @staticmethod
+    def reset_flags(input_obj):
+        # Reset object size, existence attributes before validating it
+        input_obj.flag("validated")
+        input_obj.set_size(None)
+        input_obj.flag("missing")
+        input_obj.unflag("validation_failed")
 
     def validate_docker_image(self, docker_obj):
         # Check whether Docker image exists
@@ -181,3 +201,8 @@ class InputWorker(PoolWorker):
             job_name = "get_size_%s" % docker_obj.get_ID()
             image_size = self.docker_helper.get_image_size(image_name, job_name=job_name)
             docker_obj.set_size(image_size)
+
+            # Get/set digest of docker image so cached task results are tied to the exact image
+            job_name = "get_digest_%s" % docker_obj.get_ID()
+            image_digest = self.docker_helper.get_image_digest(image_name, job_name=job_name)
+            docker_obj.set_digest(image_digest)
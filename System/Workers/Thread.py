@@ -2,7 +2,6 @@ import threading
 import Queue
 import logging
 import sys
-import time
 import abc
 
 class Thread(threading.Thread):
@@ -49,8 +48,8 @@ class Thread(threading.Thread):
 
     def finalize(self):
 
-        while not self.is_done():
-            time.sleep(2)
+        # Wait for thread to finish running
+        self.join()
 
         # If exception queue is empty at this point, then the thread has been finalized already
         if not self.exception_queue.empty():
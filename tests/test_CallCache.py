@@ -0,0 +1,149 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from System.Datastore import GAPFile, CallCache
+
+class FakeArgument(object):
+    def __init__(self, value):
+        self.value = value
+
+    def get_value(self):
+        return self.value
+
+class FakeModule(object):
+    def __init__(self, args, output=None):
+        self.args = args
+        self.output = output
+
+    def get_arguments(self):
+        return OrderedDict([(arg_name, FakeArgument(value)) for arg_name, value in self.args.iteritems()])
+
+    def get_output(self):
+        return self.output
+
+class FakeTask(object):
+    def __init__(self, task_id, args, output=None):
+        self.task_id = task_id
+        self.module = FakeModule(args, output)
+
+    def get_ID(self):
+        return self.task_id
+
+    def get_module(self):
+        return self.module
+
+class FakeDockerImage(object):
+    def __init__(self, image_name, digest):
+        self.image_name = image_name
+        self.digest = digest
+
+    def get_image_name(self):
+        return self.image_name
+
+    def get_digest(self):
+        return self.digest
+
+class FakeStorageHelper(object):
+    # Storage where file (size, version) is looked up from a dictionary. Copies are recorded instead of run.
+    def __init__(self):
+        self.file_stats = {}
+        self.copies = []
+
+    def get_file_stats(self, paths, job_name=None):
+        return dict([(path, self.file_stats.get(path, None)) for path in paths])
+
+    def mkdir(self, dir_path, job_name=None, wait=False):
+        pass
+
+    def cp_batch(self, src_paths, dest_dir, job_name=None, wait=False):
+        self.copies.append((src_paths, dest_dir))
+        for src_path in src_paths:
+            self.file_stats[os.path.join(dest_dir, os.path.basename(src_path))] = self.file_stats[src_path]
+
+class FakeWorkspace(object):
+    def __init__(self, output_dir, tmp_output_dir):
+        self.output_dir = output_dir
+        self.tmp_output_dir = tmp_output_dir
+
+    def get_output_dir(self):
+        return self.output_dir
+
+    def get_tmp_output_dir(self):
+        return self.tmp_output_dir
+
+class TestCallCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.storage_helper = FakeStorageHelper()
+        self.storage_helper.file_stats["/data/s1.bam"] = (1.5, "v1")
+        self.call_cache = CallCache(self.cache_dir)
+        self.call_cache.set_storage_helper(self.storage_helper)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, True)
+
+    def get_key(self, path="/data/s1.bam", size=1.5, docker_digest="sha256:aaa", nr_cpus=4, task_id="index"):
+        bam = GAPFile("bam_1", "bam", path, file_size=size)
+        task = FakeTask(task_id, {"bam": bam, "nr_cpus": nr_cpus, "region": "chr1"})
+        return self.call_cache.get_key(task, FakeDockerImage("samtools:1.9", docker_digest))
+
+    def test_same_call_same_key(self):
+        self.assertEqual(self.get_key(), self.get_key())
+
+        # Resources and task ids don't change what a task produces
+        self.assertEqual(self.get_key(), self.get_key(nr_cpus=8, task_id="index_again"))
+
+    def test_input_path_changes_key(self):
+        self.storage_helper.file_stats["/data/s2.bam"] = (1.5, "v1")
+        self.assertNotEqual(self.get_key(), self.get_key(path="/data/s2.bam"))
+
+    def test_input_size_changes_key(self):
+        self.assertNotEqual(self.get_key(), self.get_key(size=2.0))
+
+    def test_input_version_changes_key(self):
+        key = self.get_key()
+
+        # File re-written in place
+        self.storage_helper.file_stats["/data/s1.bam"] = (1.5, "v2")
+        self.assertNotEqual(key, self.get_key())
+
+    def test_docker_digest_changes_key(self):
+        self.assertNotEqual(self.get_key(), self.get_key(docker_digest="sha256:bbb"))
+
+    def test_lookup_rejects_changed_output(self):
+        output = {"bai": GAPFile("bai_1", "bai", "/out/s1.bam.bai", file_size=0.1)}
+        self.storage_helper.file_stats["/out/s1.bam.bai"] = (0.1, "v1")
+        key = self.get_key()
+        self.call_cache.store(key, FakeTask("index", {}, output))
+        self.assertEqual(self.call_cache.lookup(key, "index")["bai"].get_path(), "/out/s1.bam.bai")
+
+        self.storage_helper.file_stats["/out/s1.bam.bai"] = (0.1, "v2")
+        self.assertIsNone(self.call_cache.lookup(key, "index"))
+
+        del self.storage_helper.file_stats["/out/s1.bam.bai"]
+        self.assertIsNone(self.call_cache.lookup(key, "index"))
+
+    def test_copied_output_keeps_downstream_key(self):
+        cached_bam = GAPFile("bam_1", "bam", "/run1/out/s1.bam", file_size=1.5)
+        self.storage_helper.file_stats["/run1/out/s1.bam"] = (1.5, "v1")
+        downstream_key = self.call_cache.get_key(FakeTask("index", {"bam": cached_bam}))
+
+        # Cached output copied into the output dir of a later run
+        output = {"bam": GAPFile("bam_1", "bam", "/run1/out/s1.bam", file_size=1.5)}
+        self.call_cache.copy_output(output, FakeWorkspace("/run2/out/", "/run2/tmp/"), ["bam"], "align")
+        self.assertEqual(output["bam"].get_path(), "/run2/out/s1.bam")
+        self.assertEqual(self.storage_helper.copies, [(["/run1/out/s1.bam"], "/run2/out/")])
+
+        # Tasks using the copy are still found in the cache
+        self.assertEqual(self.call_cache.get_key(FakeTask("index", {"bam": output["bam"]})), downstream_key)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import copy
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from System.Datastore import GAPFile, GAPFileView
+from System.Datastore.GAPFile import GAPFileMetadataError
+
+class TestGAPFile(unittest.TestCase):
+
+    def get_file(self, path="/data/sample1/reads.bam", **kwargs):
+        return GAPFile("bam_1", "bam", path, **kwargs)
+
+    def test_flag_bits(self):
+        gap_file = self.get_file()
+        for flag_type in GAPFile.FLAG_BITS:
+            self.assertFalse(gap_file.is_flagged(flag_type))
+            gap_file.flag(flag_type)
+            self.assertTrue(gap_file.is_flagged(flag_type))
+
+        # Flags without a bit are kept alongside bit flags
+        gap_file.flag("custom")
+        gap_file.flag("custom")
+        self.assertEqual(sorted(gap_file.flags), sorted(GAPFile.FLAG_BITS.keys() + ["custom"]))
+
+        gap_file.unflag("validated")
+        gap_file.unflag("custom")
+        self.assertFalse(gap_file.is_flagged("validated"))
+        self.assertFalse(gap_file.is_flagged("custom"))
+        self.assertTrue(gap_file.is_flagged("docker"))
+        self.assertEqual(sorted(gap_file.flags), ["docker", "missing", "validation_failed"])
+
+    def test_dict_round_trip(self):
+        gap_file = self.get_file("/ref/bwa_index*", file_size=2.5, sample_name="s1")
+        gap_file.flag("docker")
+        gap_file.flag("validated")
+        gap_file.flag("custom")
+
+        restored = GAPFile.from_dict(gap_file.to_dict())
+        self.assertEqual(restored.to_dict(), gap_file.to_dict())
+        self.assertTrue(restored.is_prefix())
+        self.assertEqual(restored.get_transferrable_path(), "/ref/bwa_index*")
+        self.assertEqual(restored.get_size(), 2.5)
+        self.assertEqual(restored.get_metadata("sample_name"), "s1")
+        self.assertEqual(sorted(restored.flags), ["custom", "docker", "validated"])
+
+        in_dir = self.get_file("/data/out_dir/reads.bam", containing_dir="/data/out_dir")
+        restored = GAPFile.from_dict(in_dir.to_dict())
+        self.assertEqual(restored.get_containing_dir(), "/data/out_dir/")
+        self.assertEqual(restored.get_path(), "/data/out_dir/reads.bam")
+
+    def test_lazy_filename_and_protocol(self):
+        gap_file = self.get_file("gs://bucket/sample1/reads.bam")
+
+        # Derived values aren't computed until they're used
+        self.assertIsNone(gap_file._GAPFile__filename)
+        self.assertIsNone(gap_file._GAPFile__protocol)
+        self.assertEqual(gap_file.filename, "reads.bam")
+        self.assertEqual(gap_file.get_protocol(), "gs")
+
+        # Derived values follow path changes
+        gap_file.update_path("/data/sample1/")
+        self.assertIsNone(gap_file._GAPFile__filename)
+        self.assertEqual(gap_file.get_path(), "/data/sample1/reads.bam")
+        self.assertEqual(gap_file.get_protocol(), "Local")
+        gap_file.set_path("s3://bucket/other.bam")
+        self.assertEqual(gap_file.filename, "other.bam")
+        self.assertEqual(gap_file.get_protocol(), "s3")
+
+    def test_copy_is_independent(self):
+        gap_file = self.get_file(sample_name="s1")
+        gap_file.flag("custom")
+        gap_file_copy = copy.copy(gap_file)
+
+        gap_file_copy.set_metadata("sample_name", "s2")
+        gap_file_copy.flag("other")
+        gap_file_copy.flag("validated")
+        gap_file_copy.update_path("/tmp/")
+        self.assertEqual(gap_file.get_metadata("sample_name"), "s1")
+        self.assertEqual(gap_file.flags, ["custom"])
+        self.assertEqual(gap_file.get_path(), "/data/sample1/reads.bam")
+
+    def test_view_reads_through_to_shared_file(self):
+        gap_file = self.get_file(file_size=1.0, sample_name="s1")
+        view = GAPFileView(gap_file)
+
+        self.assertEqual(view.get_path(), gap_file.get_path())
+        self.assertEqual(view.filename, "reads.bam")
+        self.assertEqual(view.get_metadata("sample_name"), "s1")
+        self.assertRaises(GAPFileMetadataError, view.get_metadata, "missing")
+
+        # Changes to the shared file are seen by views that haven't been modified
+        gap_file.set_size(3.0)
+        self.assertEqual(view.get_size(), 3.0)
+        self.assertFalse(view.is_copied())
+
+    def test_view_copy_on_write(self):
+        gap_file = self.get_file(file_size=1.0, sample_name="s1")
+        view = GAPFileView(gap_file)
+        other_view = GAPFileView(gap_file)
+
+        view.update_path("/wrk/task1/")
+        view.set_metadata("sample_name", "s2")
+        view.flag("validated")
+        view.set_size(2.0)
+        self.assertTrue(view.is_copied())
+        self.assertEqual(view.get_path(), "/wrk/task1/reads.bam")
+        self.assertEqual(view.get_metadata("sample_name"), "s2")
+        self.assertTrue(view.is_flagged("validated"))
+
+        # Shared file and other views are never modified
+        for unchanged in [gap_file, other_view]:
+            self.assertEqual(unchanged.get_path(), "/data/sample1/reads.bam")
+            self.assertEqual(unchanged.get_metadata("sample_name"), "s1")
+            self.assertFalse(unchanged.is_flagged("validated"))
+            self.assertEqual(unchanged.get_size(), 1.0)
+        self.assertFalse(other_view.is_copied())
+
+        # Modified view no longer follows the shared file
+        gap_file.set_size(5.0)
+        self.assertEqual(view.get_size(), 2.0)
+        self.assertEqual(other_view.get_size(), 5.0)
+
+if __name__ == "__main__":
+    unittest.main()
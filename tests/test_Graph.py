@@ -0,0 +1,140 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Tests are run from the repository root so config specs resolve correctly
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+for module_dir in ["Modules/Tools/", "Modules/Splitters/", "Modules/Mergers/"]:
+    sys.path.insert(1, os.path.join(REPO_DIR, module_dir))
+
+from System.Graph import Graph
+
+class TestGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.orig_dir = os.getcwd()
+        os.chdir(REPO_DIR)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        os.chdir(self.orig_dir)
+        shutil.rmtree(self.tmp_dir, True)
+
+    def get_graph(self, config):
+        config_file = os.path.join(self.tmp_dir, "graph.config")
+        with open(config_file, "w") as graph_config:
+            graph_config.write(config)
+        return Graph(config_file)
+
+    @staticmethod
+    def get_task_config(task_id, parents=None, module="Utils", submodule="IndexVCF"):
+        config = "[%s]\nmodule = %s\n" % (task_id, module)
+        if submodule is not None:
+            config += "submodule = %s\n" % submodule
+        if parents is not None:
+            config += "input_from = %s\n" % ", ".join(parents)
+        return config
+
+    def get_split_graph(self):
+        # Splitter whose subgraph is closed by a merger. Task 'c' also depends on 'e' which is outside the subgraph.
+        return self.get_graph(self.get_task_config("e") +
+                              self.get_task_config("split", module="RefSplitter", submodule=None) +
+                              self.get_task_config("b", ["split"]) +
+                              self.get_task_config("c", ["b", "e"]) +
+                              self.get_task_config("m", ["c"], module="VCFMergers", submodule="VCFMerger") +
+                              self.get_task_config("d", ["m"]))
+
+    def assert_topological_order(self, graph):
+        order = graph.get_topological_order()
+        self.assertEqual(sorted(order), sorted(graph.get_tasks().keys()))
+        position = dict([(task_id, i) for i, task_id in enumerate(order)])
+        for task_id in order:
+            for parent_id in graph.get_parents(task_id):
+                self.assertLess(position[parent_id], position[task_id])
+
+    def test_cycle_in_config_rejected(self):
+        self.assertRaises(IOError, self.get_graph, self.get_task_config("a", ["c"]) +
+                                                   self.get_task_config("b", ["a"]) +
+                                                   self.get_task_config("c", ["b"]))
+
+    def test_dependency_creating_cycle_rejected(self):
+        graph = self.get_graph(self.get_task_config("a") +
+                               self.get_task_config("b", ["a"]) +
+                               self.get_task_config("c", ["b"]))
+        self.assertRaises(RuntimeError, graph.add_dependency, "a", "c")
+
+        # Graph is left unchanged
+        self.assertEqual(graph.get_parents("a"), [])
+        self.assertEqual(graph.get_children("c"), [])
+        self.assert_topological_order(graph)
+
+    def test_order_updated_after_add_dependency(self):
+        graph = self.get_graph(self.get_task_config("x1") +
+                               self.get_task_config("x2", ["x1"]) +
+                               self.get_task_config("y1") +
+                               self.get_task_config("y2", ["y1"]))
+
+        # Make the first chain in the current order depend on the end of the other chain
+        first, last = ("x", "y") if graph.get_topological_order()[0].startswith("x") else ("y", "x")
+        graph.add_dependency("%s1" % first, "%s2" % last)
+
+        order = graph.get_topological_order()
+        self.assertEqual(order, ["%s1" % last, "%s2" % last, "%s1" % first, "%s2" % first])
+        self.assert_topological_order(graph)
+
+        # Existing dependencies don't change the order
+        graph.add_dependency("%s2" % first, "%s1" % first)
+        self.assertEqual(graph.get_topological_order(), order)
+
+    def test_order_updated_after_add_task(self):
+        graph = self.get_graph(self.get_task_config("a") +
+                               self.get_task_config("b", ["a"]))
+
+        # New tasks go at the end of the order until they're given a child
+        split_task = graph.get_tasks("a").split("a", "split1", None)
+        graph.add_task(split_task)
+        self.assertEqual(graph.get_topological_order()[-1], "a.split1")
+        graph.add_dependency("a", "a.split1")
+        self.assert_topological_order(graph)
+
+    def test_split_graph(self):
+        graph = self.get_split_graph()
+        splitter = graph.get_tasks("split").get_module()
+        for split_id in ["chr1", "chr2"]:
+            splitter.make_split(split_id)
+        graph.split_graph("split")
+
+        # Tasks in the subgraph are replaced by one task per split. Merger collects every split.
+        for split_id in ["chr1", "chr2"]:
+            self.assertEqual(graph.get_parents("b.%s" % split_id), ["split"])
+            self.assertEqual(sorted(graph.get_parents("c.%s" % split_id)), ["b.%s" % split_id, "e"])
+            self.assertIn("c.%s" % split_id, graph.get_parents("m"))
+        for task_id in ["b", "c"]:
+            self.assertTrue(graph.get_tasks(task_id).is_deprecated())
+            self.assertTrue(graph.get_tasks(task_id).is_complete())
+        self.assertFalse(graph.get_tasks("m").is_deprecated())
+        self.assertEqual(graph.get_parents("d"), ["m"])
+        self.assert_topological_order(graph)
+
+    def test_split_graph_validates_affected_tasks(self):
+        graph = self.get_split_graph()
+        graph.get_tasks("split").get_module().make_split("chr1")
+
+        # Merger receives input from the new split tasks so its inputs are re-checked
+        graph.adj_list["m"]["missing"] = None
+        self.assertRaises(RuntimeError, graph.split_graph, "split")
+
+    def test_split_graph_skips_unaffected_tasks(self):
+        graph = self.get_split_graph()
+        graph.get_tasks("split").get_module().make_split("chr1")
+
+        # Tasks outside the split subgraph aren't re-checked
+        graph.adj_list["d"]["missing"] = None
+        graph.split_graph("split")
+        self.assertEqual(graph.get_parents("c.chr1"), ["b.chr1", "e"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from System.Datastore import GAPFile, RunJournal
+
+class FakeModule(object):
+    def __init__(self, output):
+        self.output = output
+
+    def get_output(self):
+        return self.output
+
+class FakeTask(object):
+    def __init__(self, task_id, output):
+        self.task_id = task_id
+        self.module = FakeModule(output)
+
+    def get_ID(self):
+        return self.task_id
+
+    def get_module(self):
+        return self.module
+
+class TestRunJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.journal_file = os.path.join(self.tmp_dir, "journal", "run.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, True)
+
+    @staticmethod
+    def get_output(sample_name):
+        # Module output with files, split outputs and plain values
+        bam = GAPFile("bam_1", "bam", "gs://bucket/%s.bam" % sample_name, file_size=1.5)
+        bam.flag("validated")
+        index = GAPFile("bwa_1", "bwa_idx", "/ref/genome*")
+        return OrderedDict([("bam", bam),
+                            ("bwa_idx", index),
+                            ("splits", OrderedDict([("chr1", [bam, "chr1"]), ("chr2", [bam, "chr2"])])),
+                            ("nr_reads", 1000),
+                            ("sample_name", sample_name)])
+
+    def assert_output_equal(self, restored, expected):
+        if isinstance(expected, GAPFile):
+            self.assertIsInstance(restored, GAPFile)
+            self.assertEqual(restored.to_dict(), expected.to_dict())
+        elif isinstance(expected, dict):
+            self.assertEqual(restored.keys(), expected.keys())
+            for key in expected:
+                self.assert_output_equal(restored[key], expected[key])
+        elif isinstance(expected, list):
+            self.assertEqual(len(restored), len(expected))
+            for restored_val, expected_val in zip(restored, expected):
+                self.assert_output_equal(restored_val, expected_val)
+        else:
+            self.assertEqual(restored, expected)
+            self.assertEqual(type(restored), type(expected))
+
+    def test_round_trip(self):
+        journal = RunJournal(self.journal_file, "pipeline1")
+        self.assertFalse(journal.exists())
+        journal.start()
+        tasks = [FakeTask("align_s1", self.get_output("s1")), FakeTask("align_s2", self.get_output("s2"))]
+        for task in tasks:
+            journal.record_task(task)
+        journal.close()
+        self.assertTrue(journal.exists())
+
+        # Tasks are restored in the order they were completed
+        entries = RunJournal(self.journal_file, "pipeline1").load()
+        self.assertEqual([task_id for task_id, output in entries], ["align_s1", "align_s2"])
+        for (task_id, output), task in zip(entries, tasks):
+            self.assert_output_equal(output, task.get_module().get_output())
+
+    def test_resume_rewrites_restored_tasks(self):
+        journal = RunJournal(self.journal_file, "pipeline1")
+        journal.start()
+        journal.record_task(FakeTask("align_s1", self.get_output("s1")))
+        journal.record_task(FakeTask("align_s2", self.get_output("s2")))
+        journal.close()
+
+        # Resumed run only carries forward tasks that were restored and then records new tasks
+        resumed = RunJournal(self.journal_file, "pipeline1")
+        entries = resumed.load()
+        resumed.start(entries[:1])
+        resumed.record_task(FakeTask("merge", self.get_output("merged")))
+        resumed.close()
+
+        entries = RunJournal(self.journal_file, "pipeline1").load()
+        self.assertEqual([task_id for task_id, output in entries], ["align_s1", "merge"])
+        self.assert_output_equal(entries[0][1], self.get_output("s1"))
+
+    def test_truncated_record_ignored(self):
+        journal = RunJournal(self.journal_file, "pipeline1")
+        journal.start()
+        journal.record_task(FakeTask("align_s1", self.get_output("s1")))
+        journal.close()
+
+        # GAP killed while writing a record
+        with open(self.journal_file, "a") as journal_file:
+            journal_file.write('{"task_id": "align_s2", "output": {"ba')
+
+        entries = RunJournal(self.journal_file, "pipeline1").load()
+        self.assertEqual([task_id for task_id, output in entries], ["align_s1"])
+
+    def test_journal_of_other_pipeline_rejected(self):
+        journal = RunJournal(self.journal_file, "pipeline1")
+        journal.start()
+        journal.close()
+        self.assertRaises(RuntimeError, RunJournal(self.journal_file, "pipeline2").load)
+
+    def test_missing_journal_rejected(self):
+        self.assertRaises(IOError, RunJournal(self.journal_file, "pipeline1").load)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Tests are run from the repository root so config specs resolve correctly
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+for module_dir in ["Modules/Tools/", "Modules/Splitters/", "Modules/Mergers/"]:
+    sys.path.insert(1, os.path.join(REPO_DIR, module_dir))
+
+from System.Graph import Graph
+from System.Graph.TaskWorker import TaskWorker
+import System.Graph.Scheduler
+scheduler_module = sys.modules["System.Graph.Scheduler"]
+
+class FakeTaskWorker(TaskWorker):
+    # Task worker that finishes as soon as it's started without running anything
+    # Splitter tasks create one split per id in SPLIT_IDS. Tasks in FAILED_TASKS fail.
+    SPLIT_IDS = []
+    FAILED_TASKS = set()
+    launched = []
+
+    def __init__(self, task, datastore, platform, **kwargs):
+        super(FakeTaskWorker, self).__init__(task, datastore, platform, **kwargs)
+        FakeTaskWorker.launched.append((task.get_ID(), kwargs.get("priority")))
+
+    def work(self):
+        try:
+            if self.task.is_splitter_task():
+                for split_id in self.SPLIT_IDS:
+                    self.task.get_module().make_split(split_id)
+            self._TaskWorker__err = self.task.get_ID() in self.FAILED_TASKS
+        finally:
+            self.set_status(TaskWorker.COMPLETE)
+            self.completion_queue.put(self.task.get_ID())
+
+    def get_runtime(self):
+        return 1.0
+
+class FakePlatform(object):
+    def lock(self):
+        pass
+
+    def update_request_priority(self, task_id, priority):
+        pass
+
+    def withdraw_request(self, task_id):
+        pass
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.orig_dir = os.getcwd()
+        os.chdir(REPO_DIR)
+        self.tmp_dir = tempfile.mkdtemp()
+
+        # Run tasks with fake task workers
+        self.orig_task_worker = scheduler_module.TaskWorker
+        scheduler_module.TaskWorker = FakeTaskWorker
+        FakeTaskWorker.SPLIT_IDS = []
+        FakeTaskWorker.FAILED_TASKS = set()
+        FakeTaskWorker.launched = []
+
+    def tearDown(self):
+        scheduler_module.TaskWorker = self.orig_task_worker
+        os.chdir(self.orig_dir)
+        shutil.rmtree(self.tmp_dir, True)
+
+    def get_graph(self, config):
+        config_file = os.path.join(self.tmp_dir, "graph.config")
+        with open(config_file, "w") as graph_config:
+            graph_config.write(config)
+        return Graph(config_file)
+
+    @staticmethod
+    def get_task_config(task_id, parents=None, module="Utils", submodule="IndexVCF"):
+        config = "[%s]\nmodule = %s\n" % (task_id, module)
+        if submodule is not None:
+            config += "submodule = %s\n" % submodule
+        if parents is not None:
+            config += "input_from = %s\n" % ", ".join(parents)
+        return config
+
+    def run_scheduler(self, graph):
+        scheduler_module.Scheduler(graph, None, FakePlatform()).run()
+        return [task_id for task_id, priority in FakeTaskWorker.launched]
+
+    def test_tasks_launched_after_parents(self):
+        graph = self.get_graph(self.get_task_config("a") +
+                               self.get_task_config("b", ["a"]) +
+                               self.get_task_config("c", ["a"]) +
+                               self.get_task_config("d", ["b", "c"]))
+        launched = self.run_scheduler(graph)
+
+        self.assertEqual(sorted(launched), ["a", "b", "c", "d"])
+        for task_id in ["b", "c", "d"]:
+            for parent_id in graph.get_parents(task_id):
+                self.assertLess(launched.index(parent_id), launched.index(task_id))
+        self.assertTrue(graph.is_complete())
+
+    def test_completed_tasks_not_relaunched(self):
+        graph = self.get_graph(self.get_task_config("a") +
+                               self.get_task_config("b", ["a"]) +
+                               self.get_task_config("c", ["b"]))
+        graph.get_tasks("a").set_complete(True)
+
+        # Tasks whose parents finished in an earlier run are ready right away
+        self.assertEqual(self.run_scheduler(graph), ["b", "c"])
+
+    def test_critical_path_launched_first(self):
+        # Both children become ready when 'a' completes. 'c' heads the longer path so it gets a higher priority.
+        graph = self.get_graph(self.get_task_config("a") +
+                               self.get_task_config("b", ["a"]) +
+                               self.get_task_config("c", ["a"]) +
+                               self.get_task_config("d", ["c"]) +
+                               self.get_task_config("e", ["d"]))
+        self.run_scheduler(graph)
+
+        priorities = dict(FakeTaskWorker.launched)
+        self.assertEqual(priorities["a"], 4)
+        self.assertEqual(priorities["c"], 3)
+        self.assertEqual(priorities["b"], 1)
+        launched = [task_id for task_id, priority in FakeTaskWorker.launched]
+        self.assertLess(launched.index("c"), launched.index("b"))
+
+    def test_long_chain_priorities(self):
+        # Chains longer than the recursion limit still get ranked
+        # Head of the chain fails so the pipeline stops once it has been ranked
+        nr_tasks = sys.getrecursionlimit() + 100
+        config = self.get_task_config("t0")
+        for i in range(1, nr_tasks):
+            config += self.get_task_config("t%d" % i, ["t%d" % (i-1)])
+        graph = self.get_graph(config)
+        FakeTaskWorker.FAILED_TASKS = set(["t0"])
+        self.assertRaises(RuntimeError, self.run_scheduler, graph)
+
+        self.assertEqual(FakeTaskWorker.launched, [("t0", nr_tasks)])
+
+    def test_split_tasks_launched(self):
+        FakeTaskWorker.SPLIT_IDS = ["chr1", "chr2"]
+        graph = self.get_graph(self.get_task_config("split", module="RefSplitter", submodule=None) +
+                               self.get_task_config("b", ["split"]) +
+                               self.get_task_config("c", ["b"]))
+        launched = self.run_scheduler(graph)
+
+        # Tasks downstream of the splitter are replaced by one task per split
+        self.assertEqual(launched[0], "split")
+        self.assertEqual(sorted(launched[1:]), ["b.chr1", "b.chr2", "c.chr1", "c.chr2"])
+        for split_id in FakeTaskWorker.SPLIT_IDS:
+            self.assertLess(launched.index("b.%s" % split_id), launched.index("c.%s" % split_id))
+        self.assertTrue(graph.get_tasks("b").is_deprecated())
+        self.assertTrue(graph.is_complete())
+
+    def test_fused_tasks_run_by_head_task(self):
+        graph = self.get_graph(self.get_task_config("a") +
+                               self.get_task_config("b", ["a"]) +
+                               self.get_task_config("c", ["b"]) +
+                               self.get_task_config("d", ["b"]))
+        self.assertEqual(graph.fuse_linear_chains(), [["a", "b"]])
+        launched = self.run_scheduler(graph)
+
+        # Fused task completes along with the task it's fused into and releases its own children
+        self.assertEqual(launched[0], "a")
+        self.assertNotIn("b", launched)
+        self.assertEqual(sorted(launched[1:]), ["c", "d"])
+        self.assertTrue(graph.get_tasks("b").is_complete())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Tests are run from the repository root so config specs resolve correctly
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from System.Platform import Processor
+from System.Platform.Hardac import SlurmPlatform
+
+# Stub SLURM commands backed by one state file per job in $SLURM_STUB_DIR/jobs
+STUB_CMDS = {
+    "sbatch": """#!/bin/bash
+echo "$@" >> $SLURM_STUB_DIR/sbatch.log
+id=$((1000 + $(ls $SLURM_STUB_DIR/jobs | wc -l)))
+echo RUNNING > $SLURM_STUB_DIR/jobs/$id
+echo "$id;stub_cluster"
+""",
+    "squeue": """#!/bin/bash
+echo "$@" >> $SLURM_STUB_DIR/squeue.log
+for f in $SLURM_STUB_DIR/jobs/*; do
+    [ -e "$f" ] || continue
+    state=$(cat $f)
+    case $state in PENDING|RUNNING) echo "$(basename $f)|$state";; esac
+done
+""",
+    "sacct": """#!/bin/bash
+ids=${@: -1}; ids=${ids#--jobs=}
+for id in ${ids//,/ }; do echo "$id|$(cat $SLURM_STUB_DIR/jobs/$id) by 0"; done
+""",
+    "scancel": """#!/bin/bash
+for id in "$@"; do echo CANCELLED > $SLURM_STUB_DIR/jobs/$id; done
+""",
+    "srun": """#!/bin/bash
+if [ "$1" == "--version" ]; then echo "slurm $SLURM_STUB_VERSION"; exit 0; fi
+echo "$@" >> $SLURM_STUB_DIR/srun.log
+while [[ "$1" == --* ]]; do shift; done
+exec "$@"
+""",
+    "sudo": """#!/bin/bash
+echo "sudo not allowed" >&2
+exit 1
+"""}
+
+class TestSlurmPlatform(unittest.TestCase):
+
+    def setUp(self):
+        self.orig_dir = os.getcwd()
+        self.orig_env = dict(os.environ)
+        os.chdir(REPO_DIR)
+
+        # Put stub SLURM commands at the front of the PATH
+        self.stub_dir = tempfile.mkdtemp()
+        bin_dir = os.path.join(self.stub_dir, "bin")
+        os.makedirs(bin_dir)
+        os.makedirs(os.path.join(self.stub_dir, "jobs"))
+        for cmd_name, script in STUB_CMDS.iteritems():
+            cmd_path = os.path.join(bin_dir, cmd_name)
+            with open(cmd_path, "w") as cmd_file:
+                cmd_file.write(script)
+            os.chmod(cmd_path, 0755)
+        os.environ["PATH"] = "%s:%s" % (bin_dir, os.environ["PATH"])
+        os.environ["SLURM_STUB_DIR"] = self.stub_dir
+        os.environ["SLURM_STUB_VERSION"] = "20.11.8"
+
+        self.config_file = os.path.join(self.stub_dir, "SlurmPlatform.config")
+        self.write_config()
+
+    def tearDown(self):
+        os.chdir(self.orig_dir)
+        os.environ.clear()
+        os.environ.update(self.orig_env)
+        shutil.rmtree(self.stub_dir, True)
+
+    def write_config(self, extra=""):
+        with open(self.config_file, "w") as config_file:
+            config_file.write("PLAT_MAX_NR_CPUS = 64\n"
+                              "PLAT_MAX_MEM = 256\n"
+                              "PLAT_MAX_DISK_SPACE = 1000\n"
+                              "PROC_MAX_NR_CPUS = 16\n"
+                              "PROC_MAX_MEM = 64\n"
+                              "PROC_MAX_DISK_SPACE = 100\n"
+                              "workspace_dir = %s/wrk/\n"
+                              "status_refresh_interval = 1\n"
+                              "cmd_retries = 0\n%s" % (self.stub_dir, extra))
+
+    def get_platform(self):
+        platform = SlurmPlatform("test", self.config_file, os.path.join(self.stub_dir, "out"))
+        platform.validate()
+        return platform
+
+    def read_log(self, cmd_name):
+        log_file = os.path.join(self.stub_dir, "%s.log" % cmd_name)
+        if not os.path.isfile(log_file):
+            return []
+        with open(log_file) as log:
+            return log.read().strip().split("\n")
+
+    def test_resources_mapped_to_sbatch_request(self):
+        platform = self.get_platform()
+        proc = platform.get_processor("proc1", 4, 12, 50)
+        proc.create()
+
+        sbatch_args = self.read_log("sbatch")[0]
+        for arg in ["--cpus-per-task=4", "--mem=12G", "--tmp=50G", "--nodes=1", "--time=3-00:00:00"]:
+            self.assertIn(arg, sbatch_args)
+        self.assertEqual(proc.get_status(), Processor.AVAILABLE)
+        platform.clean_up()
+
+    def test_commands_run_as_job_steps(self):
+        platform = self.get_platform()
+        proc = platform.get_processor("proc1", 2, 4, 10)
+        proc.create()
+
+        proc.run("hello", "echo 'hello world'")
+        out, err = proc.wait_process("hello")
+        self.assertEqual(out.strip(), "hello world")
+        self.assertIn("--jobid=%s --overlap" % proc.job_id, self.read_log("srun")[0])
+
+        proc.run("fail", "exit 3")
+        self.assertRaises(RuntimeError, proc.wait_process, "fail")
+        platform.clean_up()
+        self.assertEqual(proc.get_status(), Processor.OFF)
+
+    def test_job_states_polled_once_per_refresh(self):
+        platform = self.get_platform()
+        procs = [platform.get_processor("proc%d" % i, 1, 1, 1) for i in range(5)]
+        for proc in procs:
+            proc.create()
+
+        nr_calls = len(self.read_log("squeue"))
+        for _ in range(10):
+            for proc in procs:
+                self.assertEqual(proc.get_status(), Processor.AVAILABLE)
+
+        # Every status check is served from the same cached squeue listing
+        self.assertEqual(len(self.read_log("squeue")), nr_calls)
+        platform.clean_up()
+
+    def test_invalidating_job_keeps_other_jobs_cached(self):
+        platform = self.get_platform()
+        failed_proc = platform.get_processor("proc1", 1, 1, 1)
+        other_proc = platform.get_processor("proc2", 1, 1, 1)
+        failed_proc.create()
+        other_proc.create()
+        self.assertEqual(other_proc.get_status(), Processor.AVAILABLE)
+
+        # Other jobs are still served from the cache after a job is invalidated (e.g. one of its steps failed)
+        nr_calls = len(self.read_log("squeue"))
+        platform.job_cache.invalidate(failed_proc.job_id)
+        self.assertEqual(other_proc.get_status(), Processor.AVAILABLE)
+        self.assertEqual(len(self.read_log("squeue")), nr_calls)
+
+        # Invalidated job is refreshed on its next status check
+        self.assertEqual(failed_proc.get_status(), Processor.AVAILABLE)
+        self.assertEqual(len(self.read_log("squeue")), nr_calls + 1)
+        platform.clean_up()
+
+    def test_commands_run_without_sudo(self):
+        platform = self.get_platform()
+        proc = platform.get_processor("proc1", 1, 1, 1)
+        proc.create()
+
+        proc.run("mkdir", "sudo mkdir -p %s/wrk/test && sudo echo done" % self.stub_dir)
+        out, err = proc.wait_process("mkdir")
+        self.assertEqual(out.strip(), "done")
+        platform.clean_up()
+
+    def test_sudo_enabled_by_config(self):
+        self.write_config("use_sudo = True\n")
+        platform = self.get_platform()
+        proc = platform.get_processor("proc1", 1, 1, 1)
+        proc.create()
+
+        proc.run("mkdir", "sudo echo done")
+        self.assertRaises(RuntimeError, proc.wait_process, "mkdir")
+        platform.clean_up()
+
+    def test_old_slurm_version_rejected(self):
+        os.environ["SLURM_STUB_VERSION"] = "20.02.7"
+        self.assertRaises(RuntimeError, self.get_platform)
+
+if __name__ == "__main__":
+    unittest.main()